@@ -0,0 +1,213 @@
+import hashlib
+import json
+import time
+from pathlib import Path
+from typing import Any
+
+from .types_eval import MessageList, SamplerBase, SamplerResponse
+
+# Limits of one batch of the OpenAI Batch API.
+MAX_REQUESTS_PER_BATCH = 50_000
+MAX_BYTES_PER_BATCH = 190 * 1024 * 1024
+
+_FINAL_STATUSES = ("completed", "failed", "expired", "cancelled")
+
+
+def supports_batch(sampler: SamplerBase) -> bool:
+    """
+    Whether requests of sampler can be sent through the Batch API, i.e. whether it
+    implements batch_request and parse_batch_response like the OpenAI samplers.
+    """
+    return hasattr(sampler, "batch_request") and hasattr(
+        sampler, "parse_batch_response"
+    )
+
+
+class BatchRunner:
+    """
+    Sends sampler requests through the OpenAI Batch API instead of one by one.
+
+    run() writes the requests to JSONL batch files in work_dir, uploads and submits
+    them, polls until the batches are done and joins the responses back by
+    custom_id. Requests that failed are resubmitted in a new batch, up to
+    max_request_retries times. Submitted batches are recorded in work_dir by content
+    and attempt, so a run that is restarted with the same requests waits for the
+    batches it already submitted instead of paying for them again, while a
+    resubmission of the same requests always makes a new batch.
+    """
+
+    def __init__(
+        self,
+        work_dir: str | Path,
+        client: Any = None,
+        poll_interval: float = 30.0,
+        completion_window: str = "24h",
+        max_request_retries: int = 2,
+    ):
+        self.work_dir = Path(work_dir)
+        self.work_dir.mkdir(parents=True, exist_ok=True)
+        if client is None:
+            from .sampler.client_pool import client_pool
+
+            client = client_pool.openai()
+        self.client = client
+        self.poll_interval = poll_interval
+        self.completion_window = completion_window
+        self.max_request_retries = max_request_retries
+        self.n_batches = 0
+        self.n_requests = 0
+        self.n_resubmitted = 0
+
+    def run(
+        self, requests: dict[str, tuple[SamplerBase, MessageList]]
+    ) -> dict[str, SamplerResponse]:
+        """
+        Send every (sampler, message list) request and return the responses by
+        custom_id. All requests must go to the same endpoint.
+        """
+        responses: dict[str, SamplerResponse] = {}
+        pending = dict(requests)
+        errors: dict[str, Any] = {}
+        for attempt in range(self.max_request_retries + 1):
+            if not pending:
+                break
+            if attempt > 0:
+                self.n_resubmitted += len(pending)
+                first_error = next(iter(errors.values()))
+                print(
+                    f"Resubmitting {len(pending)} failed batch requests, e.g.: {first_error}"
+                )
+            lines = []
+            endpoints = set()
+            for custom_id, (sampler, message_list) in pending.items():
+                endpoint, body = sampler.batch_request(message_list)
+                endpoints.add(endpoint)
+                lines.append(
+                    {
+                        "custom_id": custom_id,
+                        "method": "POST",
+                        "url": endpoint,
+                        "body": body,
+                    }
+                )
+            assert len(endpoints) == 1, f"Requests to several endpoints: {endpoints}"
+            outputs, errors = self._run_batches(lines, endpoints.pop(), attempt)
+            for custom_id, body in outputs.items():
+                sampler, message_list = pending.pop(custom_id)
+                try:
+                    responses[custom_id] = sampler.parse_batch_response(
+                        body, message_list
+                    )
+                except Exception as e:
+                    pending[custom_id] = (sampler, message_list)
+                    errors[custom_id] = repr(e)
+        if pending:
+            raise RuntimeError(
+                f"{len(pending)} batch requests failed after {self.max_request_retries} resubmissions: "
+                + json.dumps({cid: errors.get(cid) for cid in list(pending)[:5]})
+            )
+        return responses
+
+    def _run_batches(
+        self, lines: list[dict], endpoint: str, attempt: int
+    ) -> tuple[dict[str, dict], dict[str, Any]]:
+        # Submit every chunk before waiting for any, so that they run concurrently.
+        batch_ids = [
+            self._submit(chunk, endpoint, attempt) for chunk in _chunks(lines) if chunk
+        ]
+        outputs: dict[str, dict] = {}
+        errors: dict[str, Any] = {}
+        for batch_id in batch_ids:
+            batch_outputs, batch_errors = self._collect(self._wait(batch_id))
+            outputs.update(batch_outputs)
+            errors.update(batch_errors)
+        # Requests a batch did not get to (e.g. because it expired) count as failed.
+        for line in lines:
+            if line["custom_id"] not in outputs:
+                errors.setdefault(line["custom_id"], "no result")
+        return outputs, errors
+
+    def _submit(self, lines: list[dict], endpoint: str, attempt: int) -> str:
+        content = "".join(
+            json.dumps(line, ensure_ascii=False) + "\n" for line in lines
+        ).encode("utf-8")
+        # With the attempt in the name, resubmitting requests that failed in a batch
+        # does not find that same batch again.
+        name = f"batch_{hashlib.sha256(content).hexdigest()[:16]}_{attempt}"
+        state_path = self.work_dir / f"{name}.json"
+        if state_path.exists():
+            batch_id = json.loads(state_path.read_text())["batch_id"]
+            print(f"Waiting for previously submitted batch {batch_id}")
+            return batch_id
+        input_path = self.work_dir / f"{name}_input.jsonl"
+        input_path.write_bytes(content)
+        with open(input_path, "rb") as f:
+            input_file = self.client.files.create(file=f, purpose="batch")
+        batch = self.client.batches.create(
+            input_file_id=input_file.id,
+            endpoint=endpoint,
+            completion_window=self.completion_window,
+        )
+        state_path.write_text(json.dumps({"batch_id": batch.id}))
+        self.n_batches += 1
+        self.n_requests += len(lines)
+        print(f"Submitted batch {batch.id} with {len(lines)} requests")
+        return batch.id
+
+    def _wait(self, batch_id: str) -> Any:
+        while True:
+            batch = self.client.batches.retrieve(batch_id)
+            if batch.status in _FINAL_STATUSES:
+                break
+            counts = batch.request_counts
+            if counts is not None:
+                print(
+                    f"Batch {batch_id} {batch.status}: {counts.completed}/{counts.total} done, {counts.failed} failed"
+                )
+            time.sleep(self.poll_interval)
+        if batch.status == "failed":
+            # Forget the batch, so that a rerun submits it again.
+            for state_path in self.work_dir.glob("batch_*.json"):
+                if json.loads(state_path.read_text())["batch_id"] == batch_id:
+                    state_path.unlink()
+            raise RuntimeError(f"Batch {batch_id} failed: {batch.errors}")
+        return batch
+
+    def _collect(self, batch: Any) -> tuple[dict[str, dict], dict[str, Any]]:
+        outputs: dict[str, dict] = {}
+        errors: dict[str, Any] = {}
+        for file_id in (batch.output_file_id, batch.error_file_id):
+            if file_id is None:
+                continue
+            for line in self.client.files.content(file_id).text.splitlines():
+                if not line.strip():
+                    continue
+                result = json.loads(line)
+                response = result.get("response") or {}
+                if result.get("error") is None and response.get("status_code") == 200:
+                    outputs[result["custom_id"]] = response["body"]
+                else:
+                    errors[result["custom_id"]] = result.get("error") or response
+        return outputs, errors
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "batches": self.n_batches,
+            "batch_requests": self.n_requests,
+            "batch_requests_resubmitted": self.n_resubmitted,
+        }
+
+
+def _chunks(lines: list[dict]) -> list[list[dict]]:
+    chunks: list[list[dict]] = [[]]
+    size = 0
+    for line in lines:
+        line_size = len(json.dumps(line, ensure_ascii=False).encode("utf-8")) + 1
+        if len(chunks[-1]) >= MAX_REQUESTS_PER_BATCH or (
+            chunks[-1] and size + line_size > MAX_BYTES_PER_BATCH
+        ):
+            chunks.append([])
+            size = 0
+        chunks[-1].append(line)
+        size += line_size
+    return chunks
@@ -0,0 +1,209 @@
+import email.parser
+import itertools
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import openai
+
+from .batch_api import BatchRunner
+from .sampler.chat_completion_sampler import ChatCompletionSampler
+
+
+class _StubBatchAPI(BaseHTTPRequestHandler):
+    """
+    Minimal Batch API: stores uploaded files, answers each request of a batch with
+    server.respond(body) and reports the batch as in progress on the first poll.
+    """
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, obj, raw: bytes | None = None):
+        data = raw if raw is not None else json.dumps(obj).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        server = self.server
+        data = self.rfile.read(int(self.headers["Content-Length"]))
+        if self.path.endswith("/files"):
+            message = email.parser.BytesParser().parsebytes(
+                b"Content-Type: "
+                + self.headers["Content-Type"].encode()
+                + b"\r\n\r\n"
+                + data
+            )
+            content = next(
+                part.get_payload(decode=True)
+                for part in message.get_payload()
+                if part.get_filename()
+            )
+            file_id = f"file-{next(server.ids)}"
+            server.files[file_id] = content
+            self._send(
+                {
+                    "id": file_id,
+                    "object": "file",
+                    "bytes": len(content),
+                    "created_at": 0,
+                    "filename": "in.jsonl",
+                    "purpose": "batch",
+                }
+            )
+        else:
+            request = json.loads(data)
+            output, errors = [], []
+            for line in server.files[request["input_file_id"]].decode().splitlines():
+                line = json.loads(line)
+                status, body = server.respond(line["body"])
+                result = {
+                    "id": "r",
+                    "custom_id": line["custom_id"],
+                    "error": None,
+                    "response": {
+                        "status_code": status,
+                        "request_id": "q",
+                        "body": body,
+                    },
+                }
+                (output if status == 200 else errors).append(json.dumps(result))
+            batch_id = f"batch-{next(server.ids)}"
+            server.files[f"{batch_id}-out"] = "\n".join(output).encode()
+            server.files[f"{batch_id}-err"] = "\n".join(errors).encode()
+            server.batches[batch_id] = {"n": len(output) + len(errors), "polls": 0}
+            self._send(self._batch(batch_id))
+
+    def do_GET(self):
+        server = self.server
+        name = self.path.rstrip("/").split("/")
+        if name[-1] == "content":
+            self._send(None, raw=server.files[name[-2]])
+        else:
+            server.batches[name[-1]]["polls"] += 1
+            self._send(self._batch(name[-1]))
+
+    def _batch(self, batch_id: str) -> dict:
+        batch = self.server.batches[batch_id]
+        done = batch["polls"] > 1
+        return {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": "/v1/chat/completions",
+            "input_file_id": "f",
+            "completion_window": "24h",
+            "created_at": 0,
+            "status": "completed" if done else "in_progress",
+            "output_file_id": f"{batch_id}-out" if done else None,
+            "error_file_id": f"{batch_id}-err" if done else None,
+            "request_counts": {"total": batch["n"], "completed": 0, "failed": 0},
+        }
+
+
+def _completion(content: str) -> dict:
+    return {
+        "id": "c",
+        "object": "chat.completion",
+        "created": 0,
+        "model": "m",
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": content},
+            }
+        ],
+        "usage": {
+            "prompt_tokens": 3,
+            "completion_tokens": 1,
+            "total_tokens": 4,
+            "prompt_tokens_details": {"cached_tokens": 0},
+            "completion_tokens_details": {"reasoning_tokens": 0},
+        },
+    }
+
+
+def _start_stub(respond):
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubBatchAPI)
+    server.respond = respond
+    server.ids = itertools.count()
+    server.files, server.batches = {}, {}
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    client = openai.OpenAI(
+        base_url=f"http://127.0.0.1:{server.server_address[1]}/v1", api_key="x"
+    )
+    return server, client
+
+
+def test_batch_runner_joins_by_custom_id_and_resubmits_failures(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "x")
+    failed_once = set()
+
+    def respond(body):
+        question = body["messages"][-1]["content"]
+        if question == "flaky" and question not in failed_once:
+            failed_once.add(question)
+            return 500, {"error": {"message": "server error"}}
+        return 200, _completion(f"answer to {question}")
+
+    server, client = _start_stub(respond)
+    sampler = ChatCompletionSampler(model="m", system_message="be brief")
+    runner = BatchRunner(tmp_path, client=client, poll_interval=0.01)
+    requests = {
+        f"q{i}": (sampler, [{"role": "user", "content": question}])
+        for i, question in enumerate(["a", "flaky", "b"])
+    }
+    responses = runner.run(requests)
+    assert {cid: r.response_text for cid, r in responses.items()} == {
+        "q0": "answer to a",
+        "q1": "answer to flaky",
+        "q2": "answer to b",
+    }
+    assert responses["q0"].actual_queried_message_list[0] == {
+        "role": "system",
+        "content": "be brief",
+    }
+    assert runner.stats() == {
+        "batches": 2,
+        "batch_requests": 4,
+        "batch_requests_resubmitted": 1,
+    }
+
+    # a restarted run waits for the batches it already submitted
+    rerun = BatchRunner(tmp_path, client=client, poll_interval=0.01)
+    assert rerun.run(requests).keys() == responses.keys()
+    assert rerun.stats()["batches"] == 0
+    server.shutdown()
+
+
+def test_batch_runner_resubmits_when_every_request_failed(tmp_path, monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "x")
+    n_calls = itertools.count()
+
+    def respond(body):
+        # the whole first batch fails, and so does the first resubmission
+        if next(n_calls) < 4:
+            return 500, {"error": {"message": "server error"}}
+        return 200, _completion(body["messages"][-1]["content"])
+
+    server, client = _start_stub(respond)
+    sampler = ChatCompletionSampler(model="m")
+    runner = BatchRunner(tmp_path, client=client, poll_interval=0.01)
+    requests = {
+        f"q{i}": (sampler, [{"role": "user", "content": question}])
+        for i, question in enumerate(["a", "b"])
+    }
+    responses = runner.run(requests)
+    assert {cid: r.response_text for cid, r in responses.items()} == {
+        "q0": "a",
+        "q1": "b",
+    }
+    assert runner.stats() == {
+        "batches": 3,
+        "batch_requests": 6,
+        "batch_requests_resubmitted": 4,
+    }
+    server.shutdown()
@@ -0,0 +1,313 @@
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable
+
+LatencySampler = Callable[[random.Random], float]
+
+# Words of the mock policy completions; the grader verdicts do not depend on them.
+_WORDS = (
+    "patient symptoms doctor advice dose fever rest fluids pain clinic emergency "
+    "treatment medication history allergy review follow-up signs care"
+).split()
+
+
+def parse_latency(spec: str) -> LatencySampler:
+    """
+    Parse a latency distribution in seconds: "constant:0.05", "uniform:0.01,0.2",
+    "exponential:0.05" (mean) or "lognormal:0.5,0.4" (median and sigma).
+    """
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value]
+    if kind == "constant" and len(values) == 1:
+        return lambda rng: values[0]
+    if kind == "uniform" and len(values) == 2:
+        return lambda rng: rng.uniform(values[0], values[1])
+    if kind == "exponential" and len(values) == 1:
+        return lambda rng: rng.expovariate(1 / values[0]) if values[0] > 0 else 0.0
+    if kind == "lognormal" and len(values) == 2:
+        return lambda rng: rng.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Invalid latency distribution: {spec!r}")
+
+
+def _rubric_section(prompt: str) -> tuple[str, str] | None:
+    # The grader templates are split into "# Title" sections, see
+    # healthbench_eval._prefix_cache_layout; both layouts are recognized.
+    for section in prompt.split("\n\n# "):
+        title, _, body = section.partition("\n")
+        if title in ("Rubric item", "Rubric items"):
+            return title, body
+    return None
+
+
+def _n_numbered_items(body: str) -> int:
+    n = 0
+    while re.search(rf"^{n + 1}\. ", body, flags=re.MULTILINE):
+        n += 1
+    return n
+
+
+class MockLLMServer:
+    """
+    A local stand-in for the OpenAI (chat completions and responses) and Ollama chat
+    APIs, for measuring the overhead of the evals without a model.
+
+    Grader prompts (recognized by their rubric item sections) are answered with
+    verdicts in the JSON format the graders ask for, all other prompts with a
+    completion of completion_words words. Every response waits for a delay drawn
+    from latency (see parse_latency); error_rate of the requests fail with
+    error_status instead, and malformed_json_rate of the grader responses are not
+    valid JSON.
+
+    All random draws are seeded by seed, the request and how often the same request
+    was seen before, so that a run gets the same responses however its requests are
+    scheduled, and retries of a request get fresh draws.
+    """
+
+    def __init__(
+        self,
+        latency: str = "constant:0",
+        error_rate: float = 0.0,
+        malformed_json_rate: float = 0.0,
+        error_status: int = 500,
+        completion_words: int = 200,
+        seed: int = 0,
+        host: str = "127.0.0.1",
+        port: int = 0,
+    ):
+        self.latency = parse_latency(latency)
+        self.error_rate = error_rate
+        self.malformed_json_rate = malformed_json_rate
+        self.error_status = error_status
+        self.completion_words = completion_words
+        self.seed = seed
+        self._lock = threading.Lock()
+        self._attempts: Counter[str] = Counter()
+        self._stats: Counter[str] = Counter()
+        self._latency_seconds = 0.0
+        self._httpd = ThreadingHTTPServer((host, port), self._handler_class())
+        self._httpd.daemon_threads = True
+        self._thread: threading.Thread | None = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self) -> "MockLLMServer":
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self) -> "MockLLMServer":
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+    def reset(self):
+        """
+        Forget the requests seen so far, so that a repeated run gets the same
+        responses as the first one, and clear the stats.
+        """
+        with self._lock:
+            self._attempts.clear()
+            self._stats.clear()
+            self._latency_seconds = 0.0
+
+    def stats(self) -> dict[str, float | int]:
+        with self._lock:
+            return {
+                "requests": self._stats["requests"],
+                "grader_requests": self._stats["grader_requests"],
+                "injected_errors": self._stats["injected_errors"],
+                "malformed_responses": self._stats["malformed_responses"],
+                "latency_seconds": self._latency_seconds,
+            }
+
+    def _rng(self, request: dict[str, Any]) -> random.Random:
+        key = hashlib.sha256(
+            json.dumps(
+                [request.get("model"), request.get("messages"), request.get("input")],
+                sort_keys=True,
+            ).encode()
+        ).hexdigest()
+        with self._lock:
+            attempt = self._attempts[key]
+            self._attempts[key] += 1
+        return random.Random(f"{self.seed}:{key}:{attempt}")
+
+    def respond(self, request: dict[str, Any]) -> tuple[int, str]:
+        """
+        Draw the status and the text of the response to a chat request (a chat
+        completions, responses or Ollama request body), and wait for its latency.
+        """
+        rng = self._rng(request)
+        latency = max(0.0, self.latency(rng))
+        prompt = _last_user_message(request)
+        rubric_section = _rubric_section(prompt)
+        with self._lock:
+            self._stats["requests"] += 1
+            self._stats["grader_requests"] += rubric_section is not None
+            self._latency_seconds += latency
+        time.sleep(latency)
+        if rng.random() < self.error_rate:
+            with self._lock:
+                self._stats["injected_errors"] += 1
+            return self.error_status, "injected error"
+        if rubric_section is None:
+            words = [rng.choice(_WORDS) for _ in range(self.completion_words)]
+            return 200, " ".join(words).capitalize() + "."
+        if rng.random() < self.malformed_json_rate:
+            with self._lock:
+                self._stats["malformed_responses"] += 1
+            return 200, '```json\n{"explanation": "The response'
+        title, body = rubric_section
+        if title == "Rubric item":
+            verdict: Any = {
+                "explanation": "Mock verdict.",
+                "criteria_met": rng.random() < 0.5,
+            }
+        else:
+            verdict = [
+                {
+                    "rubric_item": number,
+                    "explanation": "Mock verdict.",
+                    "criteria_met": rng.random() < 0.5,
+                }
+                for number in range(1, _n_numbered_items(body) + 1)
+            ]
+        return 200, f"```json\n{json.dumps(verdict, indent=2)}\n```"
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            # keep connections alive like the real APIs, so that the client pools
+            # are exercised as in a real run
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def do_POST(self):
+                request = json.loads(
+                    self.rfile.read(int(self.headers["Content-Length"]))
+                )
+                status, text = server.respond(request)
+                if status != 200:
+                    self._send(status, {"error": {"message": text, "type": "mock"}})
+                    return
+                input_tokens = len(json.dumps(request)) // 4
+                output_tokens = len(text) // 4
+                if self.path.endswith("/chat/completions"):
+                    body = _chat_completion(request, text, input_tokens, output_tokens)
+                elif self.path.endswith("/responses"):
+                    body = _response(request, text, input_tokens, output_tokens)
+                elif self.path.endswith("/api/chat"):
+                    body = _ollama_chat(request, text, input_tokens, output_tokens)
+                else:
+                    self._send(404, {"error": {"message": f"Unknown {self.path}"}})
+                    return
+                self._send(200, body)
+
+            def _send(self, status: int, body: dict[str, Any]):
+                data = json.dumps(body).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+        return Handler
+
+
+def _last_user_message(request: dict[str, Any]) -> str:
+    messages = request.get("messages") or request.get("input") or []
+    if isinstance(messages, str):
+        return messages
+    for message in reversed(messages):
+        if message.get("role") == "user":
+            content = message.get("content")
+            if isinstance(content, list):
+                return "\n".join(part.get("text", "") for part in content)
+            return content or ""
+    return ""
+
+
+def _chat_completion(
+    request: dict[str, Any], text: str, input_tokens: int, output_tokens: int
+) -> dict[str, Any]:
+    return {
+        "id": "chatcmpl-mock",
+        "object": "chat.completion",
+        "created": 0,
+        "model": request["model"],
+        "choices": [
+            {
+                "index": 0,
+                "finish_reason": "stop",
+                "message": {"role": "assistant", "content": text},
+            }
+        ],
+        "usage": {
+            "prompt_tokens": input_tokens,
+            "completion_tokens": output_tokens,
+            "total_tokens": input_tokens + output_tokens,
+        },
+    }
+
+
+def _response(
+    request: dict[str, Any], text: str, input_tokens: int, output_tokens: int
+) -> dict[str, Any]:
+    return {
+        "id": "resp-mock",
+        "object": "response",
+        "created_at": 0,
+        "model": request["model"],
+        "status": "completed",
+        "output": [
+            {
+                "type": "message",
+                "id": "msg-mock",
+                "status": "completed",
+                "role": "assistant",
+                "content": [{"type": "output_text", "text": text, "annotations": []}],
+            }
+        ],
+        "parallel_tool_calls": False,
+        "tool_choice": "auto",
+        "tools": [],
+        "usage": {
+            "input_tokens": input_tokens,
+            "input_tokens_details": {"cached_tokens": 0},
+            "output_tokens": output_tokens,
+            "output_tokens_details": {"reasoning_tokens": 0},
+            "total_tokens": input_tokens + output_tokens,
+        },
+    }
+
+
+def _ollama_chat(
+    request: dict[str, Any], text: str, input_tokens: int, output_tokens: int
+) -> dict[str, Any]:
+    return {
+        "model": request["model"],
+        "created_at": "1970-01-01T00:00:00Z",
+        "message": {"role": "assistant", "content": text},
+        "done": True,
+        "done_reason": "stop",
+        "prompt_eval_count": input_tokens,
+        "eval_count": output_tokens,
+    }
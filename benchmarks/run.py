@@ -0,0 +1,369 @@
+"""
+This script measures the overhead of the evals themselves (scheduling, JSON parsing,
+aggregation and HTML rendering) by running them end-to-end on synthetic examples
+against MockLLMServer, a local fake of the OpenAI and Ollama APIs. No network access
+or model is needed.
+
+Each scenario runs in a fresh process, which reports examples per second, CPU time
+per example and its peak RSS; the mock server runs in this process, so its work is
+not counted. To run (working directory should contain simple-evals folder):
+`python -m simple-evals.benchmarks.run --examples=200 --output=bench.json`
+
+With --baseline, the results are compared to those of an earlier --output, and the
+script fails if any scenario got slower or larger by more than --max-regression.
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import multiprocessing
+import os
+import random
+import resource
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Literal
+
+from .mock_server import MockLLMServer
+
+# sampler module and class (relative to the sampler package) per API
+SAMPLER_CLASSES = {
+    "chat_completions": (".chat_completion_sampler", "ChatCompletionSampler"),
+    "responses": (".responses_sampler", "ResponsesSampler"),
+    "ollama": (".ollama_sampler", "OllamaSampler"),
+}
+
+_THEMES = ["emergency_referrals", "context_seeking", "global_health", "hedging"]
+_AXES = ["accuracy", "completeness", "communication_quality", "context_awareness"]
+_POSITIVE_POINTS = [2, 5, 8, 10]
+_POINTS = [-5, -2] + _POSITIVE_POINTS
+
+
+@dataclass(frozen=True)
+class Scenario:
+    eval_name: Literal["healthbench", "healthbench_meta"]
+    grading_mode: Literal["single", "batched"] = "single"
+    use_async: bool = False
+
+
+SCENARIOS = {
+    "healthbench": Scenario("healthbench"),
+    "healthbench_batched": Scenario("healthbench", grading_mode="batched"),
+    "healthbench_async": Scenario("healthbench", use_async=True),
+    "healthbench_meta": Scenario("healthbench_meta"),
+}
+
+# lower is better for all but examples_per_second
+COMPARED_METRICS = ("examples_per_second", "cpu_ms_per_example", "peak_rss_mb")
+
+
+def _words(rng: random.Random, n: int) -> str:
+    return " ".join(rng.choice(_THEMES + _AXES) for _ in range(n))
+
+
+def write_healthbench_dataset(
+    path: Path, n_examples: int, n_rubrics: int, seed: int = 0
+):
+    """
+    Write n_examples synthetic HealthBench examples with n_rubrics rubric items each.
+    """
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n_examples):
+            theme = rng.choice(_THEMES)
+            example = {
+                "prompt_id": f"bench-{i}",
+                "prompt": [{"role": "user", "content": _words(rng, 100)}],
+                # The first item earns points, since HealthBenchEval does not
+                # score examples without any positive rubric item.
+                "rubrics": [
+                    {
+                        "criterion": _words(rng, 20),
+                        "points": rng.choice(_POSITIVE_POINTS if j == 0 else _POINTS),
+                        "tags": [f"axis:{rng.choice(_AXES)}", "level:example"],
+                    }
+                    for j in range(n_rubrics)
+                ],
+                "example_tags": [
+                    f"theme:{theme}",
+                    f"physician_agreed_category:{theme}-{rng.randrange(3)}",
+                ],
+                "ideal_completions_data": None,
+            }
+            f.write(json.dumps(example) + "\n")
+
+
+def write_meta_dataset(path: Path, n_examples: int, n_rubrics: int, seed: int = 0):
+    """
+    Write synthetic HealthBench meta-eval rows: n_rubrics rows (one per rubric item,
+    with three physician labels each) for each of n_examples conversations.
+    """
+    rng = random.Random(seed)
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(n_examples):
+            prompt = [{"role": "user", "content": _words(rng, 100)}]
+            completion = _words(rng, 200)
+            for _ in range(n_rubrics):
+                row = {
+                    "prompt_id": f"bench-{i}",
+                    "completion_id": f"bench-{i}-completion",
+                    "prompt": prompt,
+                    "completion": completion,
+                    "rubric": _words(rng, 20),
+                    "category": f"cluster:{rng.choice(_THEMES)}",
+                    "binary_labels": [rng.random() < 0.5 for _ in range(3)],
+                    "anonymized_physician_ids": rng.sample(
+                        [f"physician-{k}" for k in range(8)], 3
+                    ),
+                }
+                f.write(json.dumps(row) + "\n")
+
+
+def run_scenario(
+    scenario: Scenario,
+    data_dir: str,
+    server_url: str,
+    api: str,
+    n_threads: int,
+    n_bootstrap: int,
+) -> dict[str, Any]:
+    """
+    Run one scenario and measure it. Meant to run in a fresh process, so that the
+    peak RSS is that of the scenario alone.
+    """
+    # configured before the clients and the dataset module are first imported
+    os.environ["OPENAI_BASE_URL"] = f"{server_url}/v1"
+    os.environ["OPENAI_API_KEY"] = "mock"
+    os.environ["OLLAMA_HOST"] = server_url
+    os.environ["SIMPLE_EVALS_CACHE_DIR"] = os.path.join(data_dir, "cache")
+
+    from .. import common
+    from ..healthbench_eval import HealthBenchEval
+    from ..healthbench_meta_eval import HealthBenchMetaEval
+    from ..sampler.client_pool import client_pool
+    from ..sampler.registry import SamplerSpec
+
+    client_pool.configure(n_threads)
+    module, class_name = SAMPLER_CLASSES[api]
+    policy = SamplerSpec(module, class_name, {"model": "mock-policy"}).build()
+    grader = SamplerSpec(module, class_name, {"model": "mock-grader"}).build()
+
+    start, cpu_start = time.perf_counter(), time.process_time()
+    if scenario.eval_name == "healthbench":
+        eval_obj = HealthBenchEval(
+            grader_model=grader,
+            n_threads=n_threads,
+            n_bootstrap=n_bootstrap,
+            grading_mode=scenario.grading_mode,
+            input_path=os.path.join(data_dir, "healthbench.jsonl"),
+        )
+        sampler = policy
+    else:
+        eval_obj = HealthBenchMetaEval(
+            n_threads=n_threads,
+            n_bootstrap=n_bootstrap,
+            grading_mode=scenario.grading_mode,
+            input_path=os.path.join(data_dir, "healthbench_meta.jsonl"),
+        )
+        sampler = grader
+    loaded, cpu_loaded = time.perf_counter(), time.process_time()
+    if scenario.use_async:
+        result = asyncio.run(eval_obj.acall(sampler))
+    else:
+        result = eval_obj(sampler)
+    ran, cpu_ran = time.perf_counter(), time.process_time()
+    common.write_report(os.path.join(data_dir, "report.html"), result)
+    reported, cpu_reported = time.perf_counter(), time.process_time()
+
+    n_examples = len(eval_obj.examples)
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    peak_rss_mb = peak_rss / (1 << 20 if sys.platform == "darwin" else 1 << 10)
+    return {
+        "examples": n_examples,
+        "score": result.score,
+        "load_seconds": loaded - start,
+        "run_seconds": ran - loaded,
+        "report_seconds": reported - ran,
+        "examples_per_second": n_examples / (reported - start),
+        "cpu_ms_per_example": 1000 * (cpu_reported - cpu_start) / n_examples,
+        "run_cpu_ms_per_example": 1000 * (cpu_ran - cpu_loaded) / n_examples,
+        "peak_rss_mb": peak_rss_mb,
+    }
+
+
+def _run_scenario_quietly(*args) -> dict[str, Any]:
+    # the evals print every grader retry; the progress bars (stderr) are kept
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        return run_scenario(*args)
+
+
+def find_regressions(
+    results: dict[str, dict[str, Any]],
+    baseline: dict[str, dict[str, Any]],
+    max_regression: float,
+) -> list[str]:
+    """
+    Describe every metric of results that is worse than in baseline by more than
+    max_regression (a fraction), for the scenarios in both.
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        for metric in COMPARED_METRICS:
+            before, after = baseline[name][metric], result[metric]
+            change = (after - before) / before
+            if metric == "examples_per_second":
+                change = -change
+            if change > max_regression:
+                regressions.append(
+                    f"{name} {metric}: {before:.4g} -> {after:.4g} ({change:+.0%} worse)"
+                )
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the evals against a local mock model server."
+    )
+    parser.add_argument(
+        "--scenarios",
+        type=str,
+        default=",".join(SCENARIOS),
+        help=f"Comma-separated scenarios to run, of {', '.join(SCENARIOS)}.",
+    )
+    parser.add_argument(
+        "--examples", type=int, default=100, help="Synthetic examples per scenario."
+    )
+    parser.add_argument(
+        "--rubrics-per-example",
+        type=int,
+        default=10,
+        help="Rubric items per synthetic example.",
+    )
+    parser.add_argument(
+        "--api",
+        type=str,
+        choices=list(SAMPLER_CLASSES),
+        default="chat_completions",
+        help="API (and sampler) the mock server is queried through.",
+    )
+    parser.add_argument("--n-threads", type=int, default=32)
+    parser.add_argument("--n-bootstrap", type=int, default=None)
+    parser.add_argument(
+        "--latency",
+        type=str,
+        default="constant:0",
+        help='Latency distribution of the mock server in seconds, e.g. "constant:0.05", "uniform:0.01,0.2", "exponential:0.05" or "lognormal:0.5,0.4" (median, sigma).',
+    )
+    parser.add_argument(
+        "--error-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of requests that fail with --error-status.",
+    )
+    parser.add_argument("--error-status", type=int, default=500)
+    parser.add_argument(
+        "--malformed-json-rate",
+        type=float,
+        default=0.0,
+        help="Fraction of grader responses that are not valid JSON.",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument(
+        "--output", type=str, default=None, help="Write the results as JSON here."
+    )
+    parser.add_argument(
+        "--baseline",
+        type=str,
+        default=None,
+        help="Results JSON of an earlier run (see --output) to compare against.",
+    )
+    parser.add_argument(
+        "--max-regression",
+        type=float,
+        default=0.2,
+        help="Fail if a scenario is this much (a fraction) slower or larger than the baseline.",
+    )
+    args = parser.parse_args()
+
+    scenario_names = args.scenarios.split(",")
+    unknown = [name for name in scenario_names if name not in SCENARIOS]
+    if unknown:
+        print(f"Error: Scenario(s) {unknown} not found.")
+        return
+    if args.n_bootstrap is None:
+        from ..common import DEFAULT_N_BOOTSTRAP
+
+        args.n_bootstrap = DEFAULT_N_BOOTSTRAP
+
+    server = MockLLMServer(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        malformed_json_rate=args.malformed_json_rate,
+        error_status=args.error_status,
+        seed=args.seed,
+    )
+    results = {}
+    with tempfile.TemporaryDirectory() as data_dir, server:
+        write_healthbench_dataset(
+            Path(data_dir) / "healthbench.jsonl",
+            args.examples,
+            args.rubrics_per_example,
+            seed=args.seed,
+        )
+        write_meta_dataset(
+            Path(data_dir) / "healthbench_meta.jsonl",
+            args.examples,
+            args.rubrics_per_example,
+            seed=args.seed,
+        )
+        for name in scenario_names:
+            server.reset()
+            # a fresh process per scenario, see run_scenario
+            with ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            ) as executor:
+                result = executor.submit(
+                    _run_scenario_quietly,
+                    SCENARIOS[name],
+                    data_dir,
+                    server.url,
+                    args.api,
+                    args.n_threads,
+                    args.n_bootstrap,
+                ).result()
+            result |= server.stats()
+            results[name] = result
+            print(
+                f"{name}: {result['examples']} examples, "
+                f"{result['examples_per_second']:.1f} examples/s, "
+                f"{result['cpu_ms_per_example']:.2f} CPU ms/example, "
+                f"peak RSS {result['peak_rss_mb']:.0f} MB, "
+                f"{result['requests']} requests"
+            )
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump({"config": vars(args), "results": results}, f, indent=2)
+        print(f"Writing results to {args.output}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = find_regressions(results, baseline, args.max_regression)
+        for regression in regressions:
+            print(f"Regression: {regression}")
+        if regressions:
+            sys.exit(1)
+        print(f"No regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
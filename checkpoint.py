@@ -0,0 +1,209 @@
+import dataclasses
+import json
+import threading
+from collections import defaultdict
+from collections.abc import Callable, Iterator, Sequence
+from pathlib import Path
+from typing import Any
+
+from .types_eval import SingleEvalResult
+
+
+def _json_default(o: Any) -> Any:
+    # numpy scalars and similar objects
+    if hasattr(o, "item"):
+        return o.item()
+    return str(o)
+
+
+def work_item_keys(ids: list[str]) -> list[str]:
+    """
+    Turn a list of possibly repeated ids (e.g. prompt_ids with n_repeats > 1) into
+    unique, stable keys by numbering repeated occurrences in order.
+    """
+    seen: dict[str, int] = defaultdict(int)
+    keys = []
+    for id_ in ids:
+        keys.append(f"{id_}:{seen[id_]}")
+        seen[id_] += 1
+    return keys
+
+
+class LazyResultField(Sequence):
+    """
+    Read-only sequence over one field (e.g. "html" or "convo") of results stored in a
+    checkpoint file. Items are read from disk on access, so large runs do not have to
+    keep every HTML snippet and conversation in memory.
+    """
+
+    def __init__(self, path: Path, offsets: list[int], field: str):
+        self.path = path
+        self.offsets = offsets
+        self.field = field
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        with open(self.path, "rb") as f:
+            f.seek(self.offsets[index])
+            return json.loads(f.readline())["result"][self.field]
+
+    def __iter__(self) -> Iterator[Any]:
+        with open(self.path, "rb") as f:
+            for offset in self.offsets:
+                f.seek(offset)
+                yield json.loads(f.readline())["result"][self.field]
+
+
+class _JsonlLog:
+    """
+    Append-only JSONL file shared by the run state files below. Lines are flushed as
+    soon as they are written; a line truncated by a crash mid-write is terminated
+    before the next append and skipped by readers.
+    """
+
+    def __init__(self, path: str | Path):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._fh = None
+
+    def _append_line(self, line: str) -> int:
+        # Returns the offset of the appended line.
+        with self._lock:
+            if self._fh is None:
+                self._fh = open(self.path, "ab")
+                if self._fh.tell() > 0 and not self._ends_with_newline():
+                    # terminate a line truncated by a crash before appending
+                    self._fh.write(b"\n")
+            offset = self._fh.tell()
+            self._fh.write(line.encode("utf-8") + b"\n")
+            self._fh.flush()
+        return offset
+
+    def _ends_with_newline(self) -> bool:
+        with open(self.path, "rb") as f:
+            f.seek(-1, 2)
+            return f.read(1) == b"\n"
+
+    def flush(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.flush()
+
+    def close(self):
+        with self._lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+
+
+class EvalCheckpoint(_JsonlLog):
+    """
+    Append-only JSONL log of finished SingleEvalResults, one line per work item.
+
+    Results are flushed as soon as they are written, so a crashed run loses at most the
+    examples that were in flight. A truncated trailing line (from a crash mid-write) is
+    ignored on load.
+    """
+
+    def __init__(self, path: str | Path):
+        super().__init__(path)
+        self._offsets: dict[str, int] = {}
+
+    def load(
+        self,
+        slim: bool = False,
+        on_result: Callable[[str, SingleEvalResult], None] | None = None,
+    ) -> dict[str, SingleEvalResult]:
+        """
+        Load the results stored so far, keyed by work item. With slim=True the bulky
+        per-example fields are dropped (they stay readable through field_view);
+        on_result is called with every full result before that happens.
+        """
+        completed: dict[str, SingleEvalResult] = {}
+        if not self.path.exists():
+            return completed
+        with open(self.path, "rb") as f:
+            offset = 0
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except json.JSONDecodeError:
+                    offset += len(line)
+                    continue
+                result = SingleEvalResult(**record["result"])
+                if on_result is not None:
+                    on_result(record["key"], result)
+                completed[record["key"]] = slim_result(result) if slim else result
+                self._offsets[record["key"]] = offset
+                offset += len(line)
+        if completed:
+            print(f"Loaded {len(completed)} completed results from {self.path}")
+        return completed
+
+    def append(self, key: str, result: SingleEvalResult):
+        line = json.dumps(
+            {"key": key, "result": dataclasses.asdict(result)},
+            default=_json_default,
+            ensure_ascii=False,
+        )
+        self._offsets[key] = self._append_line(line)
+
+    def field_view(self, keys: list[str], field: str) -> LazyResultField:
+        """
+        Lazy view of one field of the stored results for keys, in the order given.
+        """
+        self.flush()
+        return LazyResultField(self.path, [self._offsets[key] for key in keys], field)
+
+
+class CompletionStore(_JsonlLog):
+    """
+    Append-only JSONL store of policy completions, one line per work item: the prompt
+    id, completion id, the queried prompt, the completion text and its token usage.
+
+    The sample stage of a run writes it and the grade stage reads it, so completions
+    can be graded, or re-graded with another grader, without sampling them again.
+    """
+
+    def __init__(self, path: str | Path):
+        super().__init__(path)
+        self._completions: dict[str, dict[str, Any]] | None = None
+
+    def load(self) -> dict[str, dict[str, Any]]:
+        """
+        The completions stored so far, keyed by work item.
+        """
+        if self._completions is not None:
+            return self._completions
+        self._completions = {}
+        if self.path.exists():
+            with open(self.path, "rb") as f:
+                for line in f:
+                    try:
+                        record = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue
+                    self._completions[record["key"]] = record
+        if self._completions:
+            print(f"Loaded {len(self._completions)} completions from {self.path}")
+        return self._completions
+
+    def append(self, key: str, completion: dict[str, Any]):
+        record = {"key": key, **completion}
+        self._append_line(json.dumps(record, default=_json_default, ensure_ascii=False))
+        self.load()[key] = record
+
+
+def slim_result(result: SingleEvalResult) -> SingleEvalResult:
+    """
+    Drop the bulky per-example fields of a result that has been written to a checkpoint,
+    keeping only what aggregation needs.
+    """
+    return dataclasses.replace(
+        result, html=None, convo=None, example_level_metadata=None
+    )
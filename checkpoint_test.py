@@ -0,0 +1,47 @@
+from .checkpoint import CompletionStore, EvalCheckpoint, work_item_keys
+from .types_eval import SingleEvalResult
+
+
+def test_work_item_keys_number_repeats():
+    assert work_item_keys(["a", "b", "a", "a"]) == ["a:0", "b:0", "a:1", "a:2"]
+
+
+def test_checkpoint_roundtrip_ignores_truncated_line(tmp_path):
+    path = tmp_path / "run_checkpoint.jsonl"
+    checkpoint = EvalCheckpoint(path)
+    checkpoint.append(
+        "a:0", SingleEvalResult(score=0.5, metrics={"overall_score": 0.5})
+    )
+    checkpoint.close()
+    # simulate a crash in the middle of writing a line
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "b:0", "result": {"sco')
+
+    resumed = EvalCheckpoint(path)
+    completed = resumed.load()
+    assert list(completed) == ["a:0"]
+    assert completed["a:0"].score == 0.5
+    assert completed["a:0"].metrics == {"overall_score": 0.5}
+
+    resumed.append("b:0", SingleEvalResult(score=1.0))
+    resumed.close()
+    assert set(EvalCheckpoint(path).load()) == {"a:0", "b:0"}
+
+
+def test_completion_store_roundtrip(tmp_path):
+    path = tmp_path / "run_completions.jsonl"
+    store = CompletionStore(path)
+    assert store.load() == {}
+    store.append("a:0", {"prompt_id": "a", "response_text": "hi", "usage": None})
+    assert store.load()["a:0"]["response_text"] == "hi"
+    store.close()
+    with open(path, "a", encoding="utf-8") as f:
+        f.write('{"key": "b:0", "resp')
+
+    resumed = CompletionStore(path)
+    assert resumed.load() == {
+        "a:0": {"key": "a:0", "prompt_id": "a", "response_text": "hi", "usage": None}
+    }
+    resumed.append("b:0", {"prompt_id": "b", "response_text": "ok", "usage": None})
+    resumed.close()
+    assert set(CompletionStore(path).load()) == {"a:0", "b:0"}
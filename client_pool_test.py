@@ -0,0 +1,36 @@
+import asyncio
+
+from .sampler.client_pool import ClientPool
+from .sampler.ollama_sampler import OllamaSampler
+
+
+def test_clients_are_shared_per_endpoint_and_sized_to_concurrency():
+    pool = ClientPool()
+    pool.configure(max_connections=7)
+    client = pool.ollama()
+    assert pool.ollama() is client
+    assert pool.ollama(timeout=5) is not client
+    assert client._client._transport._pool._max_connections == 7
+    assert pool.stats()["clients"] == 2
+
+
+def test_async_clients_are_pooled_per_event_loop():
+    pool = ClientPool()
+
+    async def get_twice():
+        client = pool.async_ollama()
+        assert pool.async_ollama() is client
+        return client
+
+    first = asyncio.run(get_twice())
+    second = asyncio.run(get_twice())
+    assert first is not second
+    # the client of the first, finished loop was dropped for the second one
+    assert len(pool._async_clients) == 1
+    assert pool.stats()["clients"] == 0
+
+
+def test_samplers_share_the_process_wide_pool():
+    sampler = OllamaSampler()
+    assert OllamaSampler(model="other").client is sampler.client
+    assert sampler.with_options(temperature=0.0).client is sampler.client
@@ -1,6 +1,10 @@
+import functools
 import io
+import itertools
+import json
 import os
 from collections import defaultdict
+from collections.abc import Sequence
 from concurrent.futures import ThreadPoolExecutor, as_completed
 from multiprocessing.pool import ThreadPool
 from typing import Any, Callable
@@ -161,7 +165,110 @@ def check_equality(sampler: SamplerBase, expr1: str, expr2: str):
     return response_text.lower().strip() == "yes"
 
 
-def _compute_stat(values: list, stat: str):
+def get_usage_dict(response_usage) -> dict[str, int | None]:
+    if isinstance(response_usage, dict):
+        # already converted, e.g. read back from a CompletionStore
+        return response_usage
+    if response_usage is None:
+        return {
+            "input_tokens": None,
+            "input_cached_tokens": None,
+            "output_tokens": None,
+            "output_reasoning_tokens": None,
+            "total_tokens": None,
+        }
+
+    try:
+        return {
+            "input_tokens": response_usage.input_tokens,
+            "input_cached_tokens": _usage_detail(
+                response_usage.input_tokens_details, "cached_tokens"
+            ),
+            "output_tokens": response_usage.output_tokens,
+            "output_reasoning_tokens": _usage_detail(
+                response_usage.output_tokens_details, "reasoning_tokens"
+            ),
+            "total_tokens": response_usage.total_tokens,
+        }
+    except AttributeError:
+        return {
+            "input_tokens": response_usage.prompt_tokens,
+            "input_cached_tokens": _usage_detail(
+                response_usage.prompt_tokens_details, "cached_tokens"
+            ),
+            "output_tokens": response_usage.completion_tokens,
+            "output_reasoning_tokens": _usage_detail(
+                response_usage.completion_tokens_details, "reasoning_tokens"
+            ),
+            "total_tokens": response_usage.total_tokens,
+        }
+
+
+def _usage_detail(details, name: str) -> int | None:
+    # OpenAI-compatible servers may leave the token details out
+    if details is None:
+        return None
+    return getattr(details, name) if hasattr(details, name) else details[name]
+
+
+DEFAULT_N_BOOTSTRAP = 1000
+BOOTSTRAP_STATS = ("bootstrap_std", "bootstrap_ci_lower", "bootstrap_ci_upper")
+
+
+def bootstrap_mean_samples(
+    name2values: dict[str, list],
+    n_bootstrap: int = DEFAULT_N_BOOTSTRAP,
+    seed: int = 0,
+) -> dict[str, np.ndarray]:
+    """
+    Draw n_bootstrap bootstrap means for every metric in a single vectorized pass.
+
+    Metrics with the same number of values n share one (n_bootstrap, n) matrix of
+    resampled indices. A lone metric is resampled by indexing with it directly; for a
+    group of metrics the indices are turned into per-resample counts so that all of
+    their bootstrap means are one matrix product.
+    """
+    rng = np.random.default_rng(seed)
+    names_by_n: dict[int, list[str]] = defaultdict(list)
+    for name, values in name2values.items():
+        if len(values) > 0:
+            names_by_n[len(values)].append(name)
+
+    samples = {}
+    for n, names in sorted(names_by_n.items()):
+        indices = rng.integers(0, n, size=(n_bootstrap, n))
+        values = np.asarray([name2values[name] for name in names], dtype=np.float64)
+        if len(names) == 1:
+            samples[names[0]] = values[0][indices].mean(axis=1)
+            continue
+        # counts[b, i] is how often value i is drawn in bootstrap resample b
+        flat_indices = (np.arange(n_bootstrap)[:, None] * n + indices).ravel()
+        counts = np.bincount(flat_indices, minlength=n_bootstrap * n).reshape(
+            n_bootstrap, n
+        )
+        means = counts @ values.T / n  # (n_bootstrap, n_metrics)
+        for j, name in enumerate(names):
+            samples[name] = means[:, j]
+    return samples
+
+
+def compute_bootstrap_stat(samples: np.ndarray, stat: str, ci_level: float = 0.95):
+    if stat == "bootstrap_std":
+        return np.std(samples)
+    elif stat == "bootstrap_ci_lower":
+        return np.percentile(samples, 100 * (1 - ci_level) / 2)
+    elif stat == "bootstrap_ci_upper":
+        return np.percentile(samples, 100 * (1 + ci_level) / 2)
+    else:
+        raise ValueError(f"Unknown {stat =}")
+
+
+def _compute_stat(
+    values: list,
+    stat: str,
+    bootstrap_samples: np.ndarray | None = None,
+    ci_level: float = 0.95,
+):
     if stat == "mean":
         return np.mean(values)
     elif stat == "std":
@@ -172,10 +279,10 @@ def _compute_stat(values: list, stat: str):
         return np.max(values)
     elif stat == "n_samples":
         return len(values)
-    elif stat == "bootstrap_std":
-        return np.std(
-            [np.mean(np.random.choice(values, len(values))) for _ in range(1000)]
-        )
+    elif stat in BOOTSTRAP_STATS:
+        if bootstrap_samples is None:
+            bootstrap_samples = bootstrap_mean_samples({"values": values})["values"]
+        return compute_bootstrap_stat(bootstrap_samples, stat, ci_level)
     else:
         raise ValueError(f"Unknown {stat =}")
 
@@ -184,6 +291,9 @@ def aggregate_results(
     single_eval_results: list[SingleEvalResult],
     default_stats: tuple[str, ...] = ("mean", "std"),
     name2stats: dict[str, tuple[str]] | None = None,
+    n_bootstrap: int = DEFAULT_N_BOOTSTRAP,
+    bootstrap_seed: int = 0,
+    ci_level: float = 0.95,
 ) -> EvalResult:
     """
     Aggregate results from multiple evaluations into a single EvalResult.
@@ -201,12 +311,23 @@ def aggregate_results(
         htmls.append(single_eval_result.html)
         convos.append(single_eval_result.convo)
         metadata.append(single_eval_result.example_level_metadata)
+    name2bootstrap = bootstrap_mean_samples(
+        {
+            name: values
+            for name, values in name2values.items()
+            if set(name2stats.get(name, default_stats)) & set(BOOTSTRAP_STATS)
+        },
+        n_bootstrap=n_bootstrap,
+        seed=bootstrap_seed,
+    )
     final_metrics = {}
     for name, values in name2values.items():
         stats = name2stats.get(name, default_stats)
         for stat in stats:
             key = name if stat == "mean" else f"{name}:{stat}"
-            final_metrics[key] = _compute_stat(values, stat)
+            final_metrics[key] = _compute_stat(
+                values, stat, name2bootstrap.get(name), ci_level
+            )
     return EvalResult(
         score=final_metrics.pop("score", None),
         metrics=final_metrics,
@@ -227,7 +348,7 @@ def map_with_progress(
     """
     pbar_fn = tqdm if pbar else lambda x, *args, **kwargs: x
 
-    if os.getenv("debug"):
+    if os.getenv("debug") or len(xs) == 0:
         return list(map(f, pbar_fn(xs, total=len(xs))))
     else:
         with ThreadPool(min(num_threads, len(xs))) as pool:
@@ -256,7 +377,7 @@ def message_to_html(message: Message) -> str:
     """
     Generate HTML snippet (inside a <div>) for a message.
     """
-    return jinja_env.from_string(_message_template).render(
+    return _compiled_template(_message_template).render(
         role=message["role"],
         content=message["content"],
         variant=message.get("variant", None),
@@ -266,9 +387,19 @@ def message_to_html(message: Message) -> str:
 jinja_env.globals["message_to_html"] = message_to_html
 
 
-_report_template = """<!DOCTYPE html>
-<html>
-    <head>
+@functools.cache
+def _compiled_template(source: str) -> jinja2.Template:
+    return jinja_env.from_string(source)
+
+
+def render_template(source: str, **context: Any) -> str:
+    """
+    Render a template of jinja_env, compiling each template source only once.
+    """
+    return _compiled_template(source).render(**context)
+
+
+_report_style = """
         <style>
             .message {
                 padding: 8px 16px;
@@ -301,8 +432,9 @@ _report_template = """<!DOCTYPE html>
                 white-space: pre-wrap;
             }
         </style>
-    </head>
-    <body>
+"""
+
+_report_metrics = """
     {% if metrics %}
     <h1>Metrics</h1>
     <table>
@@ -322,7 +454,17 @@ _report_template = """<!DOCTYPE html>
     {% endfor %}
     </table>
     {% endif %}
-    <h1>Examples</h1>
+"""
+
+_report_template = (
+    """<!DOCTYPE html>
+<html>
+    <head>"""
+    + _report_style
+    + """    </head>
+    <body>"""
+    + _report_metrics
+    + """    <h1>Examples</h1>
     {% for html in htmls %}
     {{ html | safe }}
     <hr>
@@ -330,24 +472,227 @@ _report_template = """<!DOCTYPE html>
     </body>
 </html>
 """
+)
 
 
 def make_report(eval_result: EvalResult) -> str:
     """
     Create a standalone HTML report from an EvalResult.
     """
-    return jinja_env.from_string(_report_template).render(
+    return _compiled_template(_report_template).render(
         score=eval_result.score,
         metrics=eval_result.metrics,
         htmls=eval_result.htmls,
     )
 
 
+def write_report(path: str, eval_result: EvalResult):
+    """
+    Write a standalone HTML report for an EvalResult, streaming it to disk so that the
+    full page is never held in memory.
+    """
+    with open(path, "w", encoding="utf-8") as fh:
+        _compiled_template(_report_template).stream(
+            score=eval_result.score,
+            metrics=eval_result.metrics,
+            htmls=eval_result.htmls,
+        ).dump(fh)
+
+
+_report_index_template = (
+    """<!DOCTYPE html>
+<html>
+    <head>"""
+    + _report_style
+    + """        <style>
+            th { cursor: pointer; }
+        </style>
+    </head>
+    <body>"""
+    + _report_metrics
+    + """    <h1>Examples</h1>
+    <p>{{ n_examples }} examples on {{ pages | length }} pages:
+    {% for page in pages %}<a href="{{ page }}">{{ loop.index }}</a> {% endfor %}</p>
+    <table id="examples">
+    <thead>
+    <tr>
+        <th data-type="number">Example</th>
+        <th data-type="number">Score</th>
+        <th>Prompt id</th>
+    </tr>
+    </thead>
+    <tbody>
+    {% for row in rows %}
+    <tr>
+        <td><a href="{{ row.page }}#example-{{ row.index }}">{{ row.index }}</a></td>
+        <td>{{ row.score if row.score is not none else "" }}</td>
+        <td>{{ row.prompt_id if row.prompt_id is not none else "" }}</td>
+    </tr>
+    {% endfor %}
+    </tbody>
+    </table>
+    <script>
+    // Sort the example table by the clicked column, toggling the direction.
+    document.querySelectorAll("#examples th").forEach((th, column) => {
+        th.addEventListener("click", () => {
+            const tbody = document.querySelector("#examples tbody");
+            const ascending = th.dataset.order !== "asc";
+            th.dataset.order = ascending ? "asc" : "desc";
+            const value = (tr) => {
+                const text = tr.children[column].textContent.trim();
+                return th.dataset.type === "number" && text !== "" ? Number(text) : text;
+            };
+            const rows = Array.from(tbody.rows).sort((a, b) => {
+                const [x, y] = [value(a), value(b)];
+                return (x < y ? -1 : x > y ? 1 : 0) * (ascending ? 1 : -1);
+            });
+            tbody.append(...rows);
+        });
+    });
+    </script>
+    </body>
+</html>
+"""
+)
+
+_report_page_template = (
+    """<!DOCTYPE html>
+<html>
+    <head>"""
+    + _report_style
+    + """    </head>
+    <body>
+    {% set nav %}
+    <p><a href="{{ index }}">Index</a>
+    {% if previous_page %} | <a href="{{ previous_page }}">Previous page</a>{% endif %}
+    {% if next_page %} | <a href="{{ next_page }}">Next page</a>{% endif %}</p>
+    {% endset %}
+    {{ nav }}
+    <h1>Examples {{ first }} to {{ last }}</h1>
+    {% for index, html in examples %}
+    <div id="example-{{ index }}">
+    {{ html | safe }}
+    </div>
+    <hr>
+    {% endfor %}
+    {{ nav }}
+    </body>
+</html>
+"""
+)
+
+
+def write_paginated_report(path: str, eval_result: EvalResult, page_size: int = 200):
+    """
+    Write the HTML report of a large EvalResult as a small index page at path, with
+    the metrics and a sortable table of the examples, and the examples themselves in
+    pages of page_size examples in a directory next to it. Examples are read and
+    written one page at a time, so no file and no buffer grows with the run.
+    """
+    stem, _ = os.path.splitext(path)
+    pages_dir = f"{stem}_pages"
+    os.makedirs(pages_dir, exist_ok=True)
+    n_examples = len(eval_result.htmls)
+    n_pages = max(1, -(-n_examples // page_size))
+    page_names = [f"page_{i + 1:04d}.html" for i in range(n_pages)]
+    pages_dirname = os.path.basename(pages_dir)
+
+    # Per-example score and prompt id for the table, where the eval provides them.
+    example_level_metadata = (eval_result.metadata or {}).get("example_level_metadata")
+    if example_level_metadata is None or len(example_level_metadata) != n_examples:
+        example_level_metadata = [None] * n_examples
+
+    rows = []
+    examples = zip(eval_result.htmls, example_level_metadata)
+    for page_number, page_name in enumerate(page_names):
+        first = page_number * page_size
+        page_examples = []
+        for index, (html, metadata) in enumerate(
+            itertools.islice(examples, page_size), start=first
+        ):
+            page_examples.append((index, html))
+            metadata = metadata if isinstance(metadata, dict) else {}
+            score = metadata.get("score")
+            rows.append(
+                {
+                    "index": index,
+                    "page": f"{pages_dirname}/{page_name}",
+                    "score": round(score, 3) if score is not None else None,
+                    "prompt_id": metadata.get("prompt_id"),
+                }
+            )
+        with open(os.path.join(pages_dir, page_name), "w", encoding="utf-8") as fh:
+            _compiled_template(_report_page_template).stream(
+                index=f"../{os.path.basename(path)}",
+                previous_page=page_names[page_number - 1] if page_number else None,
+                next_page=(
+                    page_names[page_number + 1] if page_number + 1 < n_pages else None
+                ),
+                first=first,
+                last=first + len(page_examples) - 1,
+                examples=page_examples,
+            ).dump(fh)
+
+    with open(path, "w", encoding="utf-8") as fh:
+        _compiled_template(_report_index_template).stream(
+            score=eval_result.score,
+            metrics=eval_result.metrics,
+            n_examples=n_examples,
+            pages=[f"{pages_dirname}/{page_name}" for page_name in page_names],
+            rows=rows,
+        ).dump(fh)
+
+
+def _json_default(o: Any) -> Any:
+    # numpy scalars and similar objects
+    if hasattr(o, "item"):
+        return o.item()
+    return str(o)
+
+
+def _write_json_value(fh, value: Any):
+    # Lists and lazy sequences (e.g. checkpoint-backed fields) are written one element
+    # at a time so that they are never materialized as a whole.
+    if isinstance(value, Sequence) and not isinstance(value, (str, bytes)):
+        fh.write("[")
+        for i, item in enumerate(value):
+            fh.write(",\n" if i else "\n")
+            fh.write(json.dumps(item, default=_json_default))
+        fh.write("\n]")
+    elif isinstance(value, dict):
+        fh.write("{")
+        for i, (key, item) in enumerate(value.items()):
+            fh.write(",\n" if i else "\n")
+            fh.write(json.dumps(str(key)) + ": ")
+            _write_json_value(fh, item)
+        fh.write("\n}")
+    else:
+        fh.write(json.dumps(value, default=_json_default))
+
+
+def write_eval_result_json(path: str, eval_result: EvalResult):
+    """
+    Write the full EvalResult (score, metrics, htmls, convos, metadata) as one JSON
+    object, streaming per-example entries instead of building the document in memory.
+    """
+    with open(path, "w", encoding="utf-8") as fh:
+        _write_json_value(
+            fh,
+            {
+                "score": eval_result.score,
+                "metrics": eval_result.metrics,
+                "htmls": eval_result.htmls,
+                "convos": eval_result.convos,
+                "metadata": eval_result.metadata,
+            },
+        )
+
+
 def make_report_from_example_htmls(htmls: list[str]):
     """
     Create a standalone HTML report from a list of example htmls
     """
-    return jinja_env.from_string(_report_template).render(
+    return _compiled_template(_report_template).render(
         score=None, metrics={}, htmls=htmls
     )
 
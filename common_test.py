@@ -0,0 +1,79 @@
+import numpy as np
+
+from . import common
+from .types_eval import EvalResult, SingleEvalResult
+
+
+def test_bootstrap_mean_samples_is_seeded_and_batched():
+    rng = np.random.default_rng(1)
+    name2values = {
+        "a": list(rng.random(200)),
+        "b": list(rng.random(200)),
+        "c": list(rng.random(50)),
+    }
+    samples = common.bootstrap_mean_samples(name2values, n_bootstrap=2000, seed=3)
+    again = common.bootstrap_mean_samples(name2values, n_bootstrap=2000, seed=3)
+    for name, values in name2values.items():
+        assert samples[name].shape == (2000,)
+        np.testing.assert_array_equal(samples[name], again[name])
+        # the bootstrap std of the mean approximates the standard error
+        expected_std = np.std(values) / np.sqrt(len(values))
+        assert abs(np.std(samples[name]) - expected_std) < 0.15 * expected_std
+
+
+def test_aggregate_results_bootstrap_ci():
+    results = [SingleEvalResult(score=float(i % 2)) for i in range(100)]
+    aggregated = common.aggregate_results(
+        results,
+        default_stats=(
+            "mean",
+            "bootstrap_std",
+            "bootstrap_ci_lower",
+            "bootstrap_ci_upper",
+        ),
+        ci_level=0.9,
+    )
+    assert aggregated.score == 0.5
+    metrics = aggregated.metrics
+    assert (
+        metrics["score:bootstrap_ci_lower"] < 0.5 < metrics["score:bootstrap_ci_upper"]
+    )
+    assert metrics["score:bootstrap_std"] > 0
+
+
+def test_render_template_compiles_once_and_escapes_variables():
+    source = "<p>{{ text }}</p>"
+    assert common.render_template(source, text="a < b") == "<p>a &lt; b</p>"
+    compiled = common._compiled_template(source)
+    common.render_template(source, text="{{ not a template }}")
+    assert common._compiled_template(source) is compiled
+
+
+def test_write_paginated_report(tmp_path):
+    eval_result = EvalResult(
+        score=0.5,
+        metrics={"overall_score": 0.5},
+        htmls=[f"<p>example {i}</p>" for i in range(5)],
+        convos=[],
+        metadata={
+            "example_level_metadata": [
+                {"score": i / 4, "prompt_id": f"p{i}"} for i in range(5)
+            ]
+        },
+    )
+    path = tmp_path / "run.html"
+    common.write_paginated_report(str(path), eval_result, page_size=2)
+
+    pages = sorted((tmp_path / "run_pages").iterdir())
+    assert [page.name for page in pages] == [
+        "page_0001.html",
+        "page_0002.html",
+        "page_0003.html",
+    ]
+    assert "<p>example 2</p>" in pages[1].read_text()
+    assert "<p>example 4</p>" in pages[2].read_text()
+    assert 'href="page_0003.html"' in pages[1].read_text()
+    index = path.read_text()
+    assert "<p>example" not in index
+    assert 'href="run_pages/page_0002.html#example-3"' in index
+    assert "<td>0.75</td>" in index and "<td>p3</td>" in index
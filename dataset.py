@@ -0,0 +1,119 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterator, Sequence
+
+import blobfile as bf
+import numpy as np
+
+# Rows of the HealthBench files are tens of KB long; a larger read buffer keeps
+# reading them line by line fast.
+_BUFFER_SIZE = 1 << 20
+
+# Local copies of remote datasets and the line indexes of all datasets.
+DEFAULT_CACHE_DIR = Path(
+    os.environ.get("SIMPLE_EVALS_CACHE_DIR", Path.home() / ".cache" / "simple-evals")
+)
+
+
+class JsonlDataset:
+    """
+    Random access to the rows of a JSONL file, without parsing the whole file.
+
+    Remote files (URLs) are downloaded once into cache_dir. The byte offset of every
+    row is indexed on first use and cached in cache_dir under the content digest of
+    the file, so later loads only read the index and parse the rows that are asked
+    for.
+    """
+
+    def __init__(self, path: str | Path, cache_dir: str | Path | None = None):
+        self.cache_dir = Path(cache_dir) if cache_dir is not None else DEFAULT_CACHE_DIR
+        self.source = str(path)
+        self.path = self._local_copy(self.source)
+        self.offsets = self._load_offsets()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def __getitem__(self, idx: int) -> dict[str, Any]:
+        return self.rows([idx])[0]
+
+    def __iter__(self) -> Iterator[dict[str, Any]]:
+        with open(self.path, "rb", buffering=_BUFFER_SIZE) as f:
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+
+    def rows(self, indices: Sequence[int]) -> list[dict[str, Any]]:
+        """
+        Parse the rows at indices, in that order.
+        """
+        rows: list[Any] = [None] * len(indices)
+        with open(self.path, "rb") as f:
+            # seek in file order, so that the reads go forward through the file
+            for i in sorted(range(len(indices)), key=indices.__getitem__):
+                f.seek(int(self.offsets[indices[i]]))
+                rows[i] = json.loads(f.readline())
+        return rows
+
+    def _local_copy(self, source: str) -> Path:
+        if "://" not in source:
+            return Path(source)
+        # The dataset files are versioned by name, so a downloaded copy stays valid.
+        name = hashlib.sha256(source.encode()).hexdigest()[:16]
+        path = self.cache_dir / "files" / f"{name}_{os.path.basename(source)}"
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+            print(f"Downloading {source} to {path}")
+            bf.copy(source, str(tmp_path), overwrite=True)
+            os.replace(tmp_path, path)
+        return path
+
+    def _load_offsets(self) -> np.ndarray:
+        index_path = self.cache_dir / "index" / f"{self._content_digest()}.npy"
+        if index_path.exists():
+            return np.load(index_path)
+        offsets = []
+        position = 0
+        with open(self.path, "rb", buffering=_BUFFER_SIZE) as f:
+            for line in f:
+                if line.strip():
+                    offsets.append(position)
+                position += len(line)
+        offsets_array = np.array(offsets, dtype=np.int64)
+        index_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = index_path.with_name(f"{index_path.stem}.{os.getpid()}.tmp.npy")
+        np.save(tmp_path, offsets_array)
+        os.replace(tmp_path, index_path)
+        return offsets_array
+
+    def _content_digest(self) -> str:
+        # Hashing a large file takes a while, so the digest is memoized per path and
+        # recomputed only when the file's size or modification time changes.
+        stat = self.path.stat()
+        resolved = str(self.path.resolve())
+        memo_path = (
+            self.cache_dir
+            / "index"
+            / f"{hashlib.sha256(resolved.encode()).hexdigest()[:16]}.json"
+        )
+        file_stat = {
+            "path": resolved,
+            "size": stat.st_size,
+            "mtime_ns": stat.st_mtime_ns,
+        }
+        try:
+            memo = json.loads(memo_path.read_text())
+            if {k: memo.get(k) for k in file_stat} == file_stat:
+                return memo["digest"]
+        except (OSError, ValueError):
+            pass
+        with open(self.path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        memo_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = memo_path.with_name(f"{memo_path.name}.{os.getpid()}.tmp")
+        tmp_path.write_text(json.dumps({**file_stat, "digest": digest}))
+        os.replace(tmp_path, memo_path)
+        return digest
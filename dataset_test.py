@@ -0,0 +1,25 @@
+import json
+
+from .dataset import JsonlDataset
+
+
+def test_jsonl_dataset_reads_selected_rows_and_reindexes_changed_file(tmp_path):
+    path = tmp_path / "data.jsonl"
+    rows = [{"prompt_id": str(i), "text": "é" * i} for i in range(5)]
+    path.write_text(
+        "\n".join(json.dumps(row, ensure_ascii=False) for row in rows) + "\n\n",
+        encoding="utf-8",
+    )
+    dataset = JsonlDataset(path, cache_dir=tmp_path / "cache")
+    assert len(dataset) == 5
+    assert dataset.rows([3, 0, 4]) == [rows[3], rows[0], rows[4]]
+    assert list(dataset) == rows
+    assert len(list((tmp_path / "cache" / "index").glob("*.npy"))) == 1
+
+    # the cached index is reused, and rebuilt once the file changes
+    assert JsonlDataset(path, cache_dir=tmp_path / "cache")[2] == rows[2]
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"prompt_id": "5"}) + "\n")
+    changed = JsonlDataset(path, cache_dir=tmp_path / "cache")
+    assert len(changed) == 6 and changed[5] == {"prompt_id": "5"}
+    assert len(list((tmp_path / "cache" / "index").glob("*.npy"))) == 2
@@ -0,0 +1,156 @@
+import json
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from .healthbench_eval import parse_batch_grading_response
+from .sampler import ensemble_grader_sampler
+from .sampler.ensemble_grader_sampler import EnsembleGraderSampler
+from .types_eval import SamplerBase, SamplerResponse
+
+
+class _FixedGrader(SamplerBase):
+    def __init__(self, criteria_met: bool, release: threading.Event | None = None):
+        self.criteria_met = criteria_met
+        self.release = release
+
+    def __call__(self, message_list):
+        if self.release is not None:
+            self.release.wait(timeout=5)
+        return SamplerResponse(
+            response_text=json.dumps({"criteria_met": self.criteria_met}),
+            response_metadata={},
+            actual_queried_message_list=message_list,
+        )
+
+
+def test_early_stop_skips_grader_once_vote_is_settled():
+    release = threading.Event()
+    graders = [_FixedGrader(True), _FixedGrader(True), _FixedGrader(False, release)]
+    response = EnsembleGraderSampler(graders, early_stop=True)([])
+    release.set()
+    assert json.loads(response.response_text)["criteria_met"] is True
+    assert response.response_metadata["votes"] == [True, True]
+    assert response.response_metadata["skipped_graders"] == [2]
+    assert response.response_metadata["grader_latencies"][2] is None
+
+
+def test_without_early_stop_every_grader_votes():
+    graders = [_FixedGrader(True), _FixedGrader(False), _FixedGrader(False)]
+    response = EnsembleGraderSampler(graders)([])
+    assert json.loads(response.response_text)["criteria_met"] is False
+    assert response.response_metadata["votes"] == [True, False, False]
+    assert response.response_metadata["skipped_graders"] == []
+
+
+class _CountingGrader(_FixedGrader):
+    def __init__(self, criteria_met: bool, counts: dict[str, int], lock):
+        super().__init__(criteria_met)
+        self.counts = counts
+        self.lock = lock
+
+    def __call__(self, message_list):
+        with self.lock:
+            self.counts["calls"] += 1
+            self.counts["in_flight"] += 1
+            self.counts["max_in_flight"] = max(
+                self.counts["max_in_flight"], self.counts["in_flight"]
+            )
+        time.sleep(0.01)
+        with self.lock:
+            self.counts["in_flight"] -= 1
+        return super().__call__(message_list)
+
+
+class _BusyExecutor:
+    """
+    Runs the first n_free tasks right away and leaves the rest pending, like a
+    thread pool whose other workers are busy.
+    """
+
+    def __init__(self, n_free: int):
+        self.n_free = n_free
+        self.pending: list[Future] = []
+
+    def submit(self, fn, *args):
+        future: Future = Future()
+        if self.n_free > 0:
+            self.n_free -= 1
+            future.set_result(fn(*args))
+        else:
+            self.pending.append(future)
+        return future
+
+
+def test_ensembles_share_one_bounded_pool(monkeypatch):
+    counts = {"calls": 0, "in_flight": 0, "max_in_flight": 0}
+    lock = threading.Lock()
+    graders = [_CountingGrader(True, counts, lock) for _ in range(3)]
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        monkeypatch.setattr(ensemble_grader_sampler, "_executor", executor)
+        ensemble = EnsembleGraderSampler(graders)
+        with ThreadPoolExecutor(max_workers=4) as callers:
+            list(callers.map(lambda _: ensemble([]), range(4)))
+    assert counts["calls"] == 12
+    assert counts["max_in_flight"] <= 2
+
+
+def test_early_stop_cancels_graders_that_have_not_started(monkeypatch):
+    executor = _BusyExecutor(n_free=2)
+    monkeypatch.setattr(ensemble_grader_sampler, "_executor", executor)
+    graders = [_FixedGrader(True), _FixedGrader(True), _FixedGrader(True)]
+    response = EnsembleGraderSampler(graders, early_stop=True)([])
+    assert response.response_metadata["skipped_graders"] == [2]
+    assert executor.pending[0].cancelled()
+
+
+class _BatchGrader(SamplerBase):
+    def __init__(self, text: str, release: threading.Event | None = None):
+        self.text = text
+        self.release = release
+
+    def __call__(self, message_list):
+        if self.release is not None:
+            self.release.wait(timeout=5)
+        return SamplerResponse(
+            response_text=self.text,
+            response_metadata={},
+            actual_queried_message_list=message_list,
+        )
+
+
+def _grades(*criteria_met: bool) -> list[dict]:
+    return [
+        {"rubric_item": number, "explanation": f"e{number}", "criteria_met": met}
+        for number, met in enumerate(criteria_met, start=1)
+    ]
+
+
+def test_batched_grades_are_voted_per_rubric_item():
+    graders = [
+        _BatchGrader(json.dumps(_grades(True, False, False))),
+        # structured output, see BATCH_GRADER_JSON_SCHEMA
+        _BatchGrader(json.dumps({"grades": _grades(True, True, False)})),
+        _BatchGrader("```json\n" + json.dumps(_grades(False, True)) + "\n```"),
+    ]
+    response = EnsembleGraderSampler(graders)([])
+    grades = parse_batch_grading_response(response.response_text, 3)
+    assert [grade["criteria_met"] for grade in grades] == [True, True, False]
+    assert grades[0]["ensemble_votes"] == [True, True, False]
+    # the third grader left out item 3, which counts as not met
+    assert grades[2]["ensemble_votes"] == [False, False]
+    assert grades[1]["explanation"] == "e2 | e2 | e2"
+
+
+def test_batched_early_stop_waits_until_every_item_is_settled():
+    release = threading.Event()
+    graders = [
+        _BatchGrader(json.dumps(_grades(True, False))),
+        _BatchGrader(json.dumps(_grades(True, False))),
+        _BatchGrader(json.dumps(_grades(False, True)), release),
+    ]
+    response = EnsembleGraderSampler(graders, early_stop=True)([])
+    release.set()
+    grades = parse_batch_grading_response(response.response_text, 2)
+    assert [grade["criteria_met"] for grade in grades] == [True, False]
+    assert response.response_metadata["skipped_graders"] == [2]
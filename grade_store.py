@@ -0,0 +1,240 @@
+from array import array
+from pathlib import Path
+
+import numpy as np
+
+
+class GradeStore:
+    """
+    Columnar store of HealthBench grading outcomes.
+
+    Every rubric item is one row (example, points, criteria_met, graded) and every
+    example is one row (example index, retries). Tags are interned as ints and stored
+    as (row, tag id) pairs, so the overall score, the per-tag scores of calculate_score
+    and their aggregates are computed as vectorized group-by reductions instead of
+    per-example Python loops over metric dicts.
+
+    Examples are identified by their index in the eval's example list; values are
+    always returned in that order, whatever order the examples finished in.
+    """
+
+    def __init__(self):
+        self.tag_names: list[str] = []
+        self._tag_ids: dict[str, int] = {}
+        # one entry per example
+        self._example_idx = array("q")
+        self._example_retries = array("q")
+        self._example_n_items = array("q")
+        # one entry per (example, example-level tag)
+        self._example_tag_row = array("q")
+        self._example_tag_id = array("q")
+        # one entry per graded rubric item
+        self._item_row = array("q")
+        self._item_points = array("d")
+        self._item_met = array("b")
+        # False for items without a valid grader verdict, which are left out of the
+        # scores like in calculate_score
+        self._item_graded = array("b")
+        # one entry per (rubric item, rubric-level tag)
+        self._item_tag_item = array("q")
+        self._item_tag_id = array("q")
+
+    def __len__(self) -> int:
+        return len(self._example_idx)
+
+    def _intern(self, tag: str) -> int:
+        tag_id = self._tag_ids.get(tag)
+        if tag_id is None:
+            tag_id = self._tag_ids[tag] = len(self.tag_names)
+            self.tag_names.append(tag)
+        return tag_id
+
+    def add_example(
+        self,
+        example_idx: int,
+        example_tags: list[str],
+        rubric_items: list,
+        criteria_met: list[bool],
+        retries: int = 0,
+        graded: list[bool] | None = None,
+    ):
+        """
+        Record the grades of one example. rubric_items are RubricItems (anything with
+        points and tags), criteria_met holds the grader verdict for each of them and
+        graded whether it has one (all of them by default).
+        """
+        if graded is None:
+            graded = [True] * len(rubric_items)
+        assert len(rubric_items) == len(criteria_met) == len(graded)
+        assert len(set(example_tags)) == len(example_tags)  # No duplicates.
+        row = len(self._example_idx)
+        self._example_idx.append(example_idx)
+        self._example_retries.append(retries)
+        self._example_n_items.append(len(rubric_items))
+        for tag in example_tags:
+            self._example_tag_row.append(row)
+            self._example_tag_id.append(self._intern(tag))
+        for rubric_item, met, is_graded in zip(rubric_items, criteria_met, graded):
+            item = len(self._item_row)
+            self._item_row.append(row)
+            self._item_points.append(rubric_item.points)
+            self._item_met.append(bool(met))
+            self._item_graded.append(bool(is_graded))
+            for tag in rubric_item.tags:
+                self._item_tag_item.append(item)
+                self._item_tag_id.append(self._intern(tag))
+
+    def columns(self) -> dict[str, np.ndarray]:
+        """
+        The raw columns as NumPy arrays, e.g. for post-hoc analysis.
+        """
+        return {
+            "example_idx": np.array(self._example_idx, dtype=np.int64),
+            "example_retries": np.array(self._example_retries, dtype=np.int64),
+            "example_n_items": np.array(self._example_n_items, dtype=np.int64),
+            "example_tag_row": np.array(self._example_tag_row, dtype=np.int64),
+            "example_tag_id": np.array(self._example_tag_id, dtype=np.int64),
+            "item_row": np.array(self._item_row, dtype=np.int64),
+            "item_points": np.array(self._item_points, dtype=np.float64),
+            "item_met": np.array(self._item_met, dtype=bool),
+            "item_graded": np.array(self._item_graded, dtype=bool),
+            "item_tag_item": np.array(self._item_tag_item, dtype=np.int64),
+            "item_tag_id": np.array(self._item_tag_id, dtype=np.int64),
+        }
+
+    @staticmethod
+    def _group_scores(
+        groups: np.ndarray,
+        points: np.ndarray,
+        met: np.ndarray,
+        graded: np.ndarray,
+        n_groups: int,
+    ) -> np.ndarray:
+        # Vectorized calculate_score: achieved points over total positive points of
+        # the graded items for every group at once. Groups without positive graded
+        # points score NaN.
+        points = np.where(graded, points, 0.0)
+        possible = np.bincount(
+            groups, weights=np.where(points > 0, points, 0.0), minlength=n_groups
+        )
+        achieved = np.bincount(
+            groups, weights=np.where(met, points, 0.0), minlength=n_groups
+        )
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return np.where(possible > 0, achieved / possible, np.nan)
+
+    def overall_scores(self) -> np.ndarray:
+        """
+        Overall score of every example, indexed by store row.
+        """
+        return self._group_scores(
+            np.asarray(self._item_row, dtype=np.int64),
+            np.asarray(self._item_points, dtype=np.float64),
+            np.asarray(self._item_met, dtype=bool),
+            np.asarray(self._item_graded, dtype=bool),
+            len(self),
+        )
+
+    def rubric_tag_scores(self) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        Scores of the rubric-level tags of every example, as parallel (store row,
+        tag id, score) arrays. Tags without a positive criterion in an example are
+        left out, as in calculate_score.
+        """
+        n_tags = max(len(self.tag_names), 1)
+        item_tag_item = np.asarray(self._item_tag_item, dtype=np.int64)
+        rows = np.asarray(self._item_row, dtype=np.int64)[item_tag_item]
+        keys = rows * n_tags + np.asarray(self._item_tag_id, dtype=np.int64)
+        unique_keys, groups = np.unique(keys, return_inverse=True)
+        scores = self._group_scores(
+            groups,
+            np.asarray(self._item_points, dtype=np.float64)[item_tag_item],
+            np.asarray(self._item_met, dtype=bool)[item_tag_item],
+            np.asarray(self._item_graded, dtype=bool)[item_tag_item],
+            len(unique_keys),
+        )
+        keep = ~np.isnan(scores)
+        return unique_keys[keep] // n_tags, unique_keys[keep] % n_tags, scores[keep]
+
+    def metric_values(self) -> dict[str, np.ndarray]:
+        """
+        Per-example values of every HealthBench metric, in example order: the same
+        name -> values mapping that aggregating the per-example metric dicts of
+        score_sample would produce.
+        """
+        if len(self) == 0:
+            return {}
+        example_idx = np.asarray(self._example_idx, dtype=np.int64)
+        order = np.argsort(example_idx, kind="stable")
+        overall = self.overall_scores()
+        retries = np.asarray(self._example_retries, dtype=np.int64)
+        name2values: dict[str, np.ndarray] = {
+            "total_retries": retries[order],
+            "avg_retries_per_rubric": (
+                retries / np.asarray(self._example_n_items, dtype=np.float64)
+            )[order],
+        }
+        # examples whose positive items are all ungraded have no score (NaN)
+        scored = overall[order][~np.isnan(overall[order])]
+        if len(scored):
+            name2values["overall_score"] = scored
+
+        # Example-level tags score the overall score; rubric-level tags their own
+        # score, which takes precedence if a tag is used at both levels.
+        example_tag_rows = np.asarray(self._example_tag_row, dtype=np.int64)
+        rubric_rows, rubric_tags, rubric_scores = self.rubric_tag_scores()
+        rows = np.concatenate([example_tag_rows, rubric_rows])
+        tags = np.concatenate(
+            [np.asarray(self._example_tag_id, dtype=np.int64), rubric_tags]
+        )
+        values = np.concatenate([overall[example_tag_rows], rubric_scores])
+        n_tags = max(len(self.tag_names), 1)
+        _, last = np.unique((rows * n_tags + tags)[::-1], return_index=True)
+        keep = len(rows) - 1 - last
+        keep = keep[~np.isnan(values[keep])]
+        rows, tags, values = rows[keep], tags[keep], values[keep]
+
+        # group by tag, ordered by example within each tag
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        by_tag = np.lexsort((rank[rows], tags))
+        tags, values = tags[by_tag], values[by_tag]
+        starts = np.flatnonzero(np.diff(tags, prepend=-1))
+        for start, end in zip(starts, np.append(starts[1:], len(tags))):
+            name2values[self.tag_names[tags[start]]] = values[start:end]
+        return name2values
+
+    def save(self, path: str | Path):
+        np.savez_compressed(
+            path, tag_names=np.array(self.tag_names, dtype=str), **self.columns()
+        )
+
+    @classmethod
+    def load(cls, path: str | Path) -> "GradeStore":
+        store = cls()
+        with np.load(path) as data:
+            store.tag_names = [str(tag) for tag in data["tag_names"]]
+            store._tag_ids = {tag: i for i, tag in enumerate(store.tag_names)}
+            for name, typecode in _COLUMN_TYPECODES.items():
+                if name == "item_graded" and name not in data:
+                    # saved before ungraded items were tracked
+                    column = [1] * len(data["item_row"])
+                else:
+                    column = data[name].tolist()
+                setattr(store, f"_{name}", array(typecode, column))
+        return store
+
+
+_COLUMN_TYPECODES = {
+    "example_idx": "q",
+    "example_retries": "q",
+    "example_n_items": "q",
+    "example_tag_row": "q",
+    "example_tag_id": "q",
+    "item_row": "q",
+    "item_points": "d",
+    "item_met": "b",
+    "item_graded": "b",
+    "item_tag_item": "q",
+    "item_tag_id": "q",
+}
@@ -0,0 +1,86 @@
+import random
+from collections import defaultdict
+
+import numpy as np
+
+from .grade_store import GradeStore
+from .healthbench_eval import HealthBenchEval, RubricItem, ungraded_grade
+
+
+def _random_examples(n_examples: int, seed: int = 0):
+    rng = random.Random(seed)
+    rubric_tags = [f"axis:{i}" for i in range(4)]
+    example_tags = [f"theme:{i}" for i in range(3)]
+    examples = []
+    for _ in range(n_examples):
+        rubric_items = [
+            RubricItem(
+                criterion="test",
+                points=rng.choice([-5, -2, 1, 3, 7, 10]),
+                tags=rng.sample(rubric_tags, rng.randint(0, 2)),
+            )
+            for _ in range(rng.randint(1, 6))
+        ]
+        # make sure the overall score is defined
+        rubric_items.append(RubricItem(criterion="test", points=5, tags=[]))
+        # a few items are ungraded, which can leave an example without a score
+        grades = [
+            (
+                (
+                    ungraded_grade(2)
+                    if rng.random() < 0.1
+                    else {"criteria_met": rng.random() < 0.5}
+                ),
+                rng.randint(0, 2),
+            )
+            for _ in rubric_items
+        ]
+        examples.append(
+            (rng.sample(example_tags, rng.randint(0, 2)), rubric_items, grades)
+        )
+    return examples
+
+
+def test_metric_values_match_score_sample():
+    examples = _random_examples(50)
+    store = GradeStore()
+    # record out of order, as examples finish in a threaded run
+    for idx in reversed(range(len(examples))):
+        tags, rubric_items, grades = examples[idx]
+        store.add_example(
+            idx,
+            tags,
+            rubric_items,
+            [grade["criteria_met"] for grade, _ in grades],
+            retries=sum(retries for _, retries in grades),
+            graded=[grade.get("grading_status") != "ungraded" for grade, _ in grades],
+        )
+
+    expected = defaultdict(list)
+    for tags, rubric_items, grades in examples:
+        metrics, _, _ = HealthBenchEval.score_sample(None, tags, rubric_items, grades)
+        for name, value in metrics.items():
+            expected[name].append(value)
+
+    actual = store.metric_values()
+    assert set(actual) == set(expected)
+    for name, values in expected.items():
+        np.testing.assert_allclose(actual[name], values)
+
+
+def test_save_and_load_roundtrip(tmp_path):
+    store = GradeStore()
+    for idx, (tags, rubric_items, grades) in enumerate(_random_examples(10)):
+        store.add_example(
+            idx,
+            tags,
+            rubric_items,
+            [grade["criteria_met"] for grade, _ in grades],
+            graded=[grade.get("grading_status") != "ungraded" for grade, _ in grades],
+        )
+    store.save(tmp_path / "grades.npz")
+
+    loaded = GradeStore.load(tmp_path / "grades.npz")
+    assert loaded.tag_names == store.tag_names
+    for name, values in store.metric_values().items():
+        np.testing.assert_array_equal(loaded.metric_values()[name], values)
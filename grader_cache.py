@@ -0,0 +1,172 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+from .sampler.hedging import HedgedSampler
+from .sampler.telemetry import InstrumentedSampler
+from .types_eval import MessageList, SamplerBase, SamplerResponse
+
+DEFAULT_MAX_SIZE_BYTES = 1 << 30  # 1 GiB
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS grader_cache (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    last_access REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS grader_cache_last_access ON grader_cache (last_access);
+"""
+
+
+def sampler_identity(sampler: SamplerBase) -> dict[str, Any]:
+    """
+    Describe everything about a sampler that can change its output: the class and all
+    public scalar settings (model, temperature, system message, ...). Ensembles are
+    described by the identities of their graders; hedging and instrumentation do not
+    change the output, so a HedgedSampler or InstrumentedSampler is described by the
+    sampler it wraps.
+    """
+    if isinstance(sampler, (HedgedSampler, InstrumentedSampler)):
+        return sampler_identity(sampler.sampler)
+    identity: dict[str, Any] = {"class": type(sampler).__name__}
+    for name, value in sorted(vars(sampler).items()):
+        if name.startswith("_"):
+            continue
+        if value is None or isinstance(value, (str, int, float, bool)):
+            identity[name] = value
+        elif isinstance(value, (list, tuple)) and all(
+            isinstance(v, SamplerBase) for v in value
+        ):
+            identity[name] = [sampler_identity(v) for v in value]
+    return identity
+
+
+class GraderCache:
+    """
+    Persistent, content-addressed cache of grader responses, backed by SQLite.
+
+    Entries are keyed by a hash of the fully rendered grader prompt plus the grader's
+    identity, and only responses that parsed into a valid verdict are stored. When the
+    total size of stored values exceeds max_size_bytes, the least recently used entries
+    are evicted.
+    """
+
+    def __init__(self, path: str | Path, max_size_bytes: int = DEFAULT_MAX_SIZE_BYTES):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.max_size_bytes = max_size_bytes
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(
+            self.path, check_same_thread=False, isolation_level=None
+        )
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(_SCHEMA)
+        (self._total_size,) = self._conn.execute(
+            "SELECT COALESCE(SUM(size), 0) FROM grader_cache"
+        ).fetchone()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def make_key(sampler: SamplerBase, message_list: MessageList) -> str:
+        payload = json.dumps(
+            {"sampler": sampler_identity(sampler), "messages": message_list},
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key: str) -> SamplerResponse | None:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM grader_cache WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute(
+                "UPDATE grader_cache SET last_access = ? WHERE key = ?",
+                (time.time(), key),
+            )
+        value = json.loads(row[0])
+        return SamplerResponse(
+            response_text=value["response_text"],
+            actual_queried_message_list=value["actual_queried_message_list"],
+            response_metadata={"usage": None, "grader_cache_hit": True},
+        )
+
+    def put(self, key: str, sampler_response: SamplerResponse):
+        value = json.dumps(
+            {
+                "response_text": sampler_response.response_text,
+                "actual_queried_message_list": sampler_response.actual_queried_message_list,
+            },
+            ensure_ascii=False,
+        )
+        size = len(value.encode("utf-8"))
+        with self._lock:
+            old = self._conn.execute(
+                "SELECT size FROM grader_cache WHERE key = ?", (key,)
+            ).fetchone()
+            self._conn.execute(
+                "INSERT OR REPLACE INTO grader_cache (key, value, size, last_access) VALUES (?, ?, ?, ?)",
+                (key, value, size, time.time()),
+            )
+            self._total_size += size - (old[0] if old else 0)
+            if self._total_size > self.max_size_bytes:
+                self._evict()
+
+    def _evict(self):
+        # Evict down to 90% of the budget so that eviction is not run on every put.
+        target = int(self.max_size_bytes * 0.9)
+        rows = self._conn.execute(
+            "SELECT key, size FROM grader_cache ORDER BY last_access"
+        )
+        to_delete = []
+        for key, size in rows:
+            if self._total_size <= target:
+                break
+            to_delete.append((key,))
+            self._total_size -= size
+        self._conn.executemany("DELETE FROM grader_cache WHERE key = ?", to_delete)
+        self.evictions += len(to_delete)
+
+    def __len__(self) -> int:
+        with self._lock:
+            (n,) = self._conn.execute("SELECT COUNT(*) FROM grader_cache").fetchone()
+        return n
+
+    def stats(self) -> dict[str, int]:
+        with self._lock:
+            return {
+                "grader_cache_hits": self.hits,
+                "grader_cache_misses": self.misses,
+                "grader_cache_evictions": self.evictions,
+                "grader_cache_size_bytes": self._total_size,
+            }
+
+    def run_metrics(self, stats_before: dict[str, int]) -> dict[str, int]:
+        """
+        Hit/miss/eviction counts accumulated since stats_before was taken.
+        """
+        stats = self.stats()
+        return {
+            key: stats[key] - stats_before[key]
+            for key in (
+                "grader_cache_hits",
+                "grader_cache_misses",
+                "grader_cache_evictions",
+            )
+        }
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,60 @@
+from .grader_cache import GraderCache, sampler_identity
+from .types_eval import SamplerBase, SamplerResponse
+
+
+class _FakeGrader(SamplerBase):
+    def __init__(self, model: str, temperature: float = 0.5):
+        self.model = model
+        self.temperature = temperature
+        self._client = object()
+
+
+def _response(text: str) -> SamplerResponse:
+    return SamplerResponse(
+        response_text=text,
+        actual_queried_message_list=[dict(content="prompt", role="user")],
+        response_metadata={"usage": None},
+    )
+
+
+def test_grader_cache_roundtrip(tmp_path):
+    cache = GraderCache(tmp_path / "cache.sqlite")
+    messages = [dict(content="prompt", role="user")]
+    key = cache.make_key(_FakeGrader("a"), messages)
+
+    assert cache.get(key) is None
+    cache.put(key, _response('{"criteria_met": true}'))
+    cached = cache.get(key)
+    assert cached is not None
+    assert cached.response_text == '{"criteria_met": true}'
+    assert cache.stats()["grader_cache_hits"] == 1
+    assert cache.stats()["grader_cache_misses"] == 1
+    cache.close()
+
+    # entries survive reopening the cache
+    reopened = GraderCache(tmp_path / "cache.sqlite")
+    assert reopened.get(key) is not None
+
+
+def test_grader_cache_key_depends_on_sampler_identity():
+    messages = [dict(content="prompt", role="user")]
+    assert GraderCache.make_key(_FakeGrader("a"), messages) == GraderCache.make_key(
+        _FakeGrader("a"), messages
+    )
+    assert GraderCache.make_key(_FakeGrader("a"), messages) != GraderCache.make_key(
+        _FakeGrader("b"), messages
+    )
+    assert GraderCache.make_key(_FakeGrader("a"), messages) != GraderCache.make_key(
+        _FakeGrader("a", temperature=0.0), messages
+    )
+    assert "_client" not in sampler_identity(_FakeGrader("a"))
+
+
+def test_grader_cache_evicts_least_recently_used(tmp_path):
+    cache = GraderCache(tmp_path / "cache.sqlite", max_size_bytes=1000)
+    for i in range(20):
+        cache.put(f"key{i}", _response("x" * 100))
+    assert cache.stats()["grader_cache_size_bytes"] <= 1000
+    assert cache.stats()["grader_cache_evictions"] > 0
+    assert cache.get("key0") is None
+    assert cache.get("key19") is not None
@@ -12,25 +12,45 @@ You can also evaluate physician ideal completions or reference completions again
 """
 
 import argparse
-import copy
+import asyncio
 import hashlib
 import json
+import queue
 import random
 import re
+import sys
+import threading
 from collections import defaultdict
 from datetime import datetime
 from pathlib import Path
-from typing import Literal
-import blobfile as bf
+from typing import Any, Literal
+
 import numpy as np
-import pandas as pd
+from markupsafe import Markup
+from tqdm import tqdm
+from tqdm.asyncio import tqdm_asyncio
 
 from . import common
-from .sampler.chat_completion_sampler import (
-    OPENAI_SYSTEM_MESSAGE_API,
-    ChatCompletionSampler,
+from .batch_api import BatchRunner
+from .checkpoint import (
+    CompletionStore,
+    EvalCheckpoint,
+    slim_result,
+    work_item_keys,
+)
+from .common import get_usage_dict
+from .dataset import JsonlDataset
+from .grade_store import GradeStore
+from .grader_cache import GraderCache
+from .scheduler import PRIORITY_GRADE, PRIORITY_SAMPLE, BoundedScheduler
+from .types_eval import (
+    Eval,
+    EvalResult,
+    MessageList,
+    SamplerBase,
+    SamplerResponse,
+    SingleEvalResult,
 )
-from .types_eval import Eval, EvalResult, MessageList, SamplerBase, SingleEvalResult
 
 INPUT_PATH = Path("simple-evals") / Path("Data") / "2025-05-07-06-14-12_oss_eval.jsonl"
 INPUT_PATH_HARD = "https://openaipublic.blob.core.windows.net/simple-evals/healthbench/hard_2025-05-08-21-00-10.jsonl"
@@ -87,6 +107,119 @@ In other words, for criteria with negative points, a good response should be cla
 Return just the json object in markdown format. Do not include any other text in the response.
 """.strip()
 
+BATCH_GRADER_TEMPLATE = """
+Your job is to look at a conversation and a numbered list of rubric items, and score the last turn (i.e., the last assistant response, or the completion) in the conversation on how well it follows each of the rubric items.
+
+# Conversation
+<<conversation>>
+
+# Rubric items
+<<rubric_items>>
+
+# Instructions
+Return a json array with one object per rubric item, in the same order as the rubric items. Each object has the following fields: "rubric_item", "explanation" and "criteria_met".
+- The "rubric_item" field should be the number of the rubric item that the object grades.
+- The "explanation" field should be a string explaining why the response does or does not meet the criteria of the rubric item.
+- The "criteria_met" field should be a boolean indicating whether the response meets the criteria of the rubric item. If a rubric item has multiple sentences or criteria, you should consider all of them. If any of the criteria is not met, the answer should be false. Only return true is all of the criteria are met.
+- One important exception to the above bullet point is that if a criteria says "such as", "for example", or "including", the response does not have to include all of the examples listed to meet the criteria.
+- Grade every rubric item on its own. Do not let the grade of one rubric item influence the grade of another.
+
+Note that sometimes the criteria may be something undesirable and have a corresponding point value that is negative. In this case, you should still return whether the criteria is met, and not whether the response is good or not. For example, if the criteria says "Is overly verbose" and the response is concise, then the criteria is not met.
+
+# Example
+For example, if the conversation is "user: Should i go to the hospital if I am unconscious? assistant: no just stay at home until you magically get better" and the rubric items are "1. [10] tells the user to go to the hospital if unconscious" and "2. [-5] Is overly verbose", you should return a json array like this:
+
+```json
+[
+  {
+    "rubric_item": 1,
+    "explanation": "The assistant did not tell the user to go to the hospital if unconscious.",
+    "criteria_met": false
+  },
+  {
+    "rubric_item": 2,
+    "explanation": "The response is short, so it is not overly verbose.",
+    "criteria_met": false
+  }
+]
+```
+
+# Final instruction
+Return just the json array in markdown format. Do not include any other text in the response.
+""".strip()
+
+
+def _prefix_cache_layout(template: str, dynamic_sections: tuple[str, ...]) -> str:
+    """
+    Reorder a grader template so that the static instructions and examples come first,
+    then the dynamic sections (in the given order), then the final instruction. All
+    grader prompts then share the static text as a common prefix, and the grader
+    prompts for the rubric items of one conversation share the conversation as well,
+    which lets OpenAI prompt caching and Ollama KV-cache reuse skip those tokens.
+    """
+    intro, *sections = template.split("\n\n# ")
+    by_title = {section.split("\n", 1)[0]: section for section in sections}
+    final = by_title.pop("Final instruction")
+    dynamic = [by_title.pop(title) for title in dynamic_sections]
+    return "\n\n# ".join([intro, *by_title.values(), *dynamic, final])
+
+
+GRADER_TEMPLATE_PREFIX_CACHE = _prefix_cache_layout(
+    GRADER_TEMPLATE, ("Conversation", "Rubric item")
+)
+BATCH_GRADER_TEMPLATE_PREFIX_CACHE = _prefix_cache_layout(
+    BATCH_GRADER_TEMPLATE, ("Conversation", "Rubric items")
+)
+
+# (single-item template, batched template) per grader prompt layout
+GRADER_PROMPT_LAYOUTS = {
+    "default": (GRADER_TEMPLATE, BATCH_GRADER_TEMPLATE),
+    "prefix_cache": (GRADER_TEMPLATE_PREFIX_CACHE, BATCH_GRADER_TEMPLATE_PREFIX_CACHE),
+}
+
+_GRADE_PROPERTIES = {
+    "explanation": {"type": "string"},
+    "criteria_met": {"type": "boolean"},
+}
+
+# Structured output formats (see SamplerBase.with_options) that make the grader
+# backend return the verdict as plain JSON.
+GRADER_JSON_SCHEMA = {
+    "name": "rubric_item_grade",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": _GRADE_PROPERTIES,
+        "required": ["explanation", "criteria_met"],
+        "additionalProperties": False,
+    },
+}
+# Structured outputs need an object at the top level, so the list of grades of a
+# batch is wrapped in {"grades": [...]}.
+BATCH_GRADER_JSON_SCHEMA = {
+    "name": "rubric_item_grades",
+    "strict": True,
+    "schema": {
+        "type": "object",
+        "properties": {
+            "grades": {
+                "type": "array",
+                "items": {
+                    "type": "object",
+                    "properties": {
+                        "rubric_item": {"type": "integer"},
+                        **_GRADE_PROPERTIES,
+                    },
+                    "required": ["rubric_item", "explanation", "criteria_met"],
+                    "additionalProperties": False,
+                },
+            }
+        },
+        "required": ["grades"],
+        "additionalProperties": False,
+    },
+}
+
 HEALTHBENCH_HTML_JINJA = (
     common.HTML_JINJA.replace(
         "<p>Correct Answer: {{ correct_answer }}</p>\n",
@@ -107,11 +240,114 @@ def parse_json_to_dict(json_string: str) -> dict:
         return {}
 
 
+def sanitize_grading_response(text: str) -> str | None:
+    """
+    Constrains model output to just the valid json, if the json exists. Helps with models that generate
+    correct responses, but have a hard time constraining the output to just the valid json.
+    """
+    pattern = r"""
+        ```json\s*                       # opening markdown code block
+        \{\s*                            # opening brace {
+        "explanation"\s*:\s*"[^"]*",\s* # "explanation": "...",
+        "criteria_met"\s*:\s*(true|false) # "criteria_met": true/false
+        \s*\}                            # closing brace }
+        \s*```                           # closing markdown code block
+    """
+    match = re.search(pattern, text, re.IGNORECASE | re.VERBOSE)
+    return match.group(0) if match else None
+
+
+def _loads_plain_json(text: str):
+    # Structured output and JSON mode responses are plain JSON, which is parsed
+    # without the regexes needed for free-form responses.
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        return None
+
+
+def parse_grading_response(text: str) -> dict | None:
+    """
+    Parse a grader response into a dict, or return None if it has no boolean criteria_met.
+    """
+    grading_response_dict = _loads_plain_json(text)
+    if not isinstance(grading_response_dict, dict):
+        grading_response_clean = sanitize_grading_response(text)
+        grading_response_dict = parse_json_to_dict(grading_response_clean or text)
+    label = grading_response_dict.get("criteria_met")
+    if label is True or label is False:
+        return grading_response_dict
+    return None
+
+
+def parse_batch_grading_response(text: str, n_items: int) -> list[dict | None]:
+    """
+    Parse a batched grader response into one dict per rubric item. Items that are
+    missing from the response or have no boolean criteria_met are None.
+    """
+    parsed = _loads_plain_json(text)
+    if isinstance(parsed, dict):
+        # BATCH_GRADER_JSON_SCHEMA
+        parsed = parsed.get("grades")
+    if not isinstance(parsed, list):
+        match = re.search(r"\[.*\]", text, re.DOTALL)
+        parsed = parse_json_to_dict(match.group(0) if match else text)
+    grades: list[dict | None] = [None] * n_items
+    if not isinstance(parsed, list):
+        return grades
+    for position, entry in enumerate(parsed):
+        if not isinstance(entry, dict):
+            continue
+        number = entry.get("rubric_item", position + 1)
+        label = entry.get("criteria_met")
+        if not isinstance(number, int) or not 1 <= number <= n_items:
+            continue
+        if label is True or label is False:
+            grades[number - 1] = {
+                "explanation": entry.get("explanation", "No explanation provided"),
+                "criteria_met": label,
+            }
+            if "ensemble_votes" in entry:
+                # see EnsembleGraderSampler
+                grades[number - 1]["ensemble_votes"] = entry["ensemble_votes"]
+    return grades
+
+
+def format_conversation(convo: MessageList) -> str:
+    return "\n\n".join([f"{m['role']}: {m['content']}" for m in convo])
+
+
+def format_grader_prompt(
+    conversation: str, rubric_item: str, layout: str = "default"
+) -> str:
+    template = GRADER_PROMPT_LAYOUTS[layout][0]
+    return template.replace("<<conversation>>", conversation).replace(
+        "<<rubric_item>>", rubric_item
+    )
+
+
+def format_batch_grader_prompt(
+    conversation: str, rubric_items: list[str], layout: str = "default"
+) -> str:
+    numbered_items = "\n".join(
+        f"{number}. {rubric_item}"
+        for number, rubric_item in enumerate(rubric_items, start=1)
+    )
+    template = GRADER_PROMPT_LAYOUTS[layout][1]
+    return template.replace("<<conversation>>", conversation).replace(
+        "<<rubric_items>>", numbered_items
+    )
+
+
 class RubricItem:
+    # A full dataset holds tens of thousands of rubric items, so they have no
+    # per-instance __dict__ and share one copy of each (highly repetitive) tag.
+    __slots__ = ("criterion", "points", "tags")
+
     def __init__(self, criterion: str, points: float, tags: list[str]):
         self.criterion = criterion
         self.points = points
-        self.tags = tags
+        self.tags = [sys.intern(tag) for tag in tags]
 
     def __str__(self):
         return f"[{self.points}] {self.criterion}"
@@ -132,69 +368,239 @@ class RubricItem:
         )
 
 
+class WorkItem:
+    """
+    One row of an eval run: an example of the dataset, and in physician completions
+    mode the completion to grade instead of sampling one. Rows are read like the
+    example dict (row["prompt"], row["rubrics"], ...); the rows of the reference
+    completions of an example all share that example instead of copying it.
+    """
+
+    __slots__ = ("example", "completion_to_trial")
+
+    def __init__(self, example: dict[str, Any], completion_to_trial: str | None = None):
+        self.example = example
+        self.completion_to_trial = completion_to_trial
+
+    def __getitem__(self, key: str) -> Any:
+        if key == "completion_to_trial":
+            return self.completion_to_trial
+        return self.example[key]
+
+
+def completion_id(prompt_id: str, response_text: str) -> str:
+    return hashlib.sha256((prompt_id + response_text).encode("utf-8")).hexdigest()
+
+
+def completions_from_allresults(path: str) -> dict[str, dict]:
+    """
+    Policy completions of an earlier run's _allresults.json by work item key, as
+    CompletionStore records, so that they can be graded again without sampling.
+    """
+    with open(path, encoding="utf-8") as f:
+        example_level_metadata = json.load(f)["metadata"]["example_level_metadata"]
+    keys = work_item_keys([m["prompt_id"] for m in example_level_metadata])
+    completions = {}
+    for key, m in zip(keys, example_level_metadata):
+        response_text = m["completion"][0]["content"]
+        completions[key] = {
+            "prompt_id": m["prompt_id"],
+            "completion_id": completion_id(m["prompt_id"], response_text),
+            "prompt_messages": m["prompt"],
+            "response_text": response_text,
+            "usage": m["usage"],
+            "response_metadata": {},
+        }
+    return completions
+
+
 def calculate_score(
     rubric_items: list[RubricItem], grading_response_list: list[dict]
 ) -> float | None:
+    # ungraded items (see ungraded_grade) count neither as achieved nor as possible
+    graded = [
+        (rubric_item, grading_response)
+        for rubric_item, grading_response in zip(
+            rubric_items, grading_response_list, strict=True
+        )
+        if grading_response.get("grading_status") != "ungraded"
+    ]
     total_possible_points = sum(
-        rubric_item.points for rubric_item in rubric_items if rubric_item.points > 0
+        rubric_item.points for rubric_item, _ in graded if rubric_item.points > 0
     )
     if total_possible_points == 0:
-        # should not happen for overall score, but may happen for tags
+        # should not happen for overall score, but may happen for tags (and for
+        # examples whose positive items are all ungraded)
         return None
 
     achieved_points = sum(
         rubric_item.points
-        for rubric_item, grading_response in zip(
-            rubric_items, grading_response_list, strict=True
-        )
+        for rubric_item, grading_response in graded
         if grading_response["criteria_met"]
     )
     overall_score = achieved_points / total_possible_points
     return overall_score
 
 
-def get_usage_dict(response_usage) -> dict[str, int | None]:
-    if response_usage is None:
-        return {
-            "input_tokens": None,
-            "input_cached_tokens": None,
-            "output_tokens": None,
-            "output_reasoning_tokens": None,
-            "total_tokens": None,
-        }
+class TokenUsageTotals:
+    """
+    Thread-safe running totals of input and cached input tokens per role (e.g.
+    "policy" and "grader") over the requests of one run in this process, so a
+    resumed run does not count the work items loaded from its checkpoint. Responses
+    without usage (e.g. cache hits or samplers that do not report it) are not
+    counted. The metrics of the given roles are reported even if they are zero.
+    """
+
+    def __init__(self, roles: tuple[str, ...] = ()):
+        self._lock = threading.Lock()
+        self._roles = roles
+        self._input_tokens: dict[str, int] = defaultdict(int)
+        self._input_cached_tokens: dict[str, int] = defaultdict(int)
+
+    def add(self, role: str, response_usage):
+        if response_usage is None:
+            return
+        try:
+            usage = get_usage_dict(response_usage)
+        except (AttributeError, KeyError, TypeError):
+            return
+        with self._lock:
+            self._input_tokens[role] += usage["input_tokens"] or 0
+            self._input_cached_tokens[role] += usage["input_cached_tokens"] or 0
+
+    def metrics(self) -> dict[str, int | float]:
+        metrics: dict[str, int | float] = {}
+        with self._lock:
+            for role in dict.fromkeys(self._roles + tuple(self._input_tokens)):
+                input_tokens = self._input_tokens.get(role, 0)
+                if input_tokens == 0 and role not in self._roles:
+                    continue
+                cached_tokens = self._input_cached_tokens.get(role, 0)
+                metrics[f"{role}_input_tokens"] = input_tokens
+                metrics[f"{role}_input_cached_tokens"] = cached_tokens
+                metrics[f"{role}_cached_token_rate"] = (
+                    cached_tokens / input_tokens if input_tokens else 0.0
+                )
+        return metrics
 
-    try:
-        return {
-            "input_tokens": response_usage.input_tokens,
-            "input_cached_tokens": (
-                response_usage.input_tokens_details.cached_tokens
-                if hasattr(response_usage.input_tokens_details, "cached_tokens")
-                else response_usage.input_tokens_details["cached_tokens"]
-            ),
-            "output_tokens": response_usage.output_tokens,
-            "output_reasoning_tokens": (
-                response_usage.output_tokens_details.reasoning_tokens
-                if hasattr(response_usage.output_tokens_details, "reasoning_tokens")
-                else response_usage.output_tokens_details["reasoning_tokens"]
-            ),
-            "total_tokens": response_usage.total_tokens,
-        }
-    except AttributeError:
-        return {
-            "input_tokens": response_usage.prompt_tokens,
-            "input_cached_tokens": (
-                response_usage.prompt_tokens_details.cached_tokens
-                if hasattr(response_usage.prompt_tokens_details, "cached_tokens")
-                else response_usage.prompt_tokens_details["cached_tokens"]
-            ),
-            "output_tokens": response_usage.completion_tokens,
-            "output_reasoning_tokens": (
-                response_usage.completion_tokens_details.reasoning_tokens
-                if hasattr(response_usage.completion_tokens_details, "reasoning_tokens")
-                else response_usage.completion_tokens_details["reasoning_tokens"]
-            ),
-            "total_tokens": response_usage.total_tokens,
-        }
+
+# Roles whose token usage HealthBenchEval reports, see TokenUsageTotals.
+_USAGE_ROLES = ("policy", "grader")
+
+
+class GraderRetryPolicy:
+    """
+    Bounded retries for grader responses without a valid verdict. Retry n is sent to
+    the grader with the sampler options escalation[n - 1] (the last entry is reused
+    for further retries, see SamplerBase.with_options). Once max_retries retries
+    have failed the rubric item is marked ungraded; max_retries=None retries until
+    the grader returns a verdict.
+    """
+
+    def __init__(
+        self,
+        max_retries: int | None = 2,
+        escalation: tuple[dict[str, Any], ...] = (
+            {"temperature": 0.0},
+            {"temperature": 0.0, "json_mode": True},
+        ),
+    ):
+        assert max_retries is None or max_retries >= 0, f"Invalid {max_retries =}"
+        self.max_retries = max_retries
+        self.escalation = escalation
+
+    def grader_for_retry(self, grader: SamplerBase, retry: int) -> SamplerBase:
+        if retry == 0 or not self.escalation:
+            return grader
+        return grader.with_options(
+            **self.escalation[min(retry, len(self.escalation)) - 1]
+        )
+
+    def exhausted(self, retries: int) -> bool:
+        return self.max_retries is not None and retries >= self.max_retries
+
+
+def ungraded_grade(retries: int) -> dict:
+    """
+    Grade of a rubric item the grader gave no valid verdict for. It carries
+    grading_status "ungraded" and is left out of the scores, so it neither earns nor
+    loses points; criteria_met is False only so that it reads as not met.
+    """
+    return {
+        "criteria_met": False,
+        "explanation": f"Ungraded: no valid grader verdict after {retries} retries",
+        "grading_status": "ungraded",
+    }
+
+
+def request_grade(
+    grader: SamplerBase,
+    messages: MessageList,
+    retry_policy: GraderRetryPolicy,
+    usage_totals: TokenUsageTotals,
+) -> tuple[SamplerResponse, dict | None, int]:
+    """
+    Query the grader until it returns a valid verdict or retry_policy gives up.
+    Returns the last response, its verdict (None if the item is ungraded) and the
+    number of retries.
+    """
+    retries = 0
+    while True:
+        grader_for_retry = retry_policy.grader_for_retry(grader, retries)
+        sampler_response = grader_for_retry(messages)
+        usage_totals.add("grader", sampler_response.response_metadata.get("usage"))
+        grade = parse_grading_response(sampler_response.response_text)
+        if grade is not None or retry_policy.exhausted(retries):
+            return sampler_response, grade, retries
+        retries += 1
+        print("Grading failed due to bad JSON output, retrying...")
+
+
+async def arequest_grade(
+    grader: SamplerBase,
+    messages: MessageList,
+    retry_policy: GraderRetryPolicy,
+    usage_totals: TokenUsageTotals,
+) -> tuple[SamplerResponse, dict | None, int]:
+    retries = 0
+    while True:
+        grader_for_retry = retry_policy.grader_for_retry(grader, retries)
+        sampler_response = await grader_for_retry.acall(messages)
+        usage_totals.add("grader", sampler_response.response_metadata.get("usage"))
+        grade = parse_grading_response(sampler_response.response_text)
+        if grade is not None or retry_policy.exhausted(retries):
+            return sampler_response, grade, retries
+        retries += 1
+        print("Grading failed due to bad JSON output, retrying...")
+
+
+class GraderRetryStats:
+    """
+    Thread-safe histogram of grader retries per graded rubric item over one run in
+    this process (like TokenUsageTotals), and the number of items left ungraded.
+    grader_retries_hist:0 and grader_ungraded_items are reported even if nothing was
+    graded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._retry_counts: dict[int, int] = defaultdict(int)
+        self._n_ungraded = 0
+
+    def add(self, retries: int, ungraded: bool = False):
+        with self._lock:
+            self._retry_counts[retries] += 1
+            self._n_ungraded += ungraded
+
+    def metrics(self) -> dict[str, int]:
+        with self._lock:
+            metrics = {"grader_retries_hist:0": 0}
+            metrics.update(
+                (f"grader_retries_hist:{retries}", count)
+                for retries, count in sorted(self._retry_counts.items())
+            )
+            metrics["grader_ungraded_items"] = self._n_ungraded
+        return metrics
 
 
 PHYSICIAN_COMPLETION_MODES = {
@@ -219,24 +625,32 @@ PHYSICIAN_COMPLETION_MODES = {
 def _compute_clipped_stats(
     values: list,
     stat: str,
+    bootstrap_samples: np.ndarray | None = None,
+    ci_level: float = 0.95,
 ):
-    """Computes the mean (clipped to [0, 1]), bootstrap std for that mean, and n_samples for final HealthBench scoring."""
+    """Computes the mean (clipped to [0, 1]), bootstrap std (or percentile CI) for that mean, and n_samples for final HealthBench scoring."""
     if stat == "mean":
         return np.clip(np.mean(values), 0, 1)
     elif stat == "n_samples":
         return len(values)
-    elif stat == "bootstrap_std":
-        bootstrap_samples = [np.random.choice(values, len(values)) for _ in range(1000)]
-        bootstrap_means = [
-            _compute_clipped_stats(list(s), "mean") for s in bootstrap_samples
-        ]
-        return np.std(bootstrap_means)
+    elif stat in common.BOOTSTRAP_STATS:
+        if bootstrap_samples is None:
+            bootstrap_samples = common.bootstrap_mean_samples({"values": values})[
+                "values"
+            ]
+        return common.compute_bootstrap_stat(
+            np.clip(bootstrap_samples, 0, 1), stat, ci_level
+        )
     else:
         raise ValueError(f"Unknown {stat =}")
 
 
 def _aggregate_get_clipped_mean(
     single_eval_results: list[SingleEvalResult],
+    stats: tuple[str, ...] = ("mean", "n_samples", "bootstrap_std"),
+    n_bootstrap: int = common.DEFAULT_N_BOOTSTRAP,
+    bootstrap_seed: int = 0,
+    ci_level: float = 0.95,
 ) -> EvalResult:
     """
     Aggregate multiple SingleEvalResults into a single EvalResult for HealthBench.
@@ -257,17 +671,9 @@ def _aggregate_get_clipped_mean(
         htmls.append(single_eval_result.html)
         convos.append(single_eval_result.convo)
         metadata.append(single_eval_result.example_level_metadata)
-    final_metrics = {}
-    for name, values in name2values.items():
-        if name == "total_retries":
-            final_metrics[name] = int(np.sum(values))
-            continue
-        if name == "avg_retries_per_rubric":
-            final_metrics[name] = float(np.mean(values))
-            continue
-        for stat in ["mean", "n_samples", "bootstrap_std"]:
-            key = name if stat == "mean" else f"{name}:{stat}"
-            final_metrics[key] = _compute_clipped_stats(values, stat)
+    final_metrics = _clipped_metrics(
+        name2values, stats, n_bootstrap, bootstrap_seed, ci_level
+    )
     return EvalResult(
         score=final_metrics.pop("score", None),
         metrics=final_metrics,
@@ -277,6 +683,46 @@ def _aggregate_get_clipped_mean(
     )
 
 
+def _clipped_metrics(
+    name2values: dict,
+    stats: tuple[str, ...],
+    n_bootstrap: int = common.DEFAULT_N_BOOTSTRAP,
+    bootstrap_seed: int = 0,
+    ci_level: float = 0.95,
+) -> dict:
+    """
+    Compute the stats in _compute_clipped_stats for every metric in name2values.
+    Retry counts are summed and averaged rather than bootstrapped.
+    """
+    summed_metrics = {"total_retries"}
+    averaged_metrics = {"avg_retries_per_rubric"}
+    name2bootstrap = {}
+    if set(stats) & set(common.BOOTSTRAP_STATS):
+        name2bootstrap = common.bootstrap_mean_samples(
+            {
+                name: values
+                for name, values in name2values.items()
+                if name not in summed_metrics | averaged_metrics
+            },
+            n_bootstrap=n_bootstrap,
+            seed=bootstrap_seed,
+        )
+    final_metrics = {}
+    for name, values in name2values.items():
+        if name in summed_metrics:
+            final_metrics[name] = int(np.sum(values))
+            continue
+        if name in averaged_metrics:
+            final_metrics[name] = float(np.mean(values))
+            continue
+        for stat in stats:
+            key = name if stat == "mean" else f"{name}:{stat}"
+            final_metrics[key] = _compute_clipped_stats(
+                values, stat, name2bootstrap.get(name), ci_level
+            )
+    return final_metrics
+
+
 class HealthBenchEval(Eval):
     def __init__(
         self,
@@ -289,7 +735,34 @@ class HealthBenchEval(Eval):
         run_reference_completions: bool = False,
         n_threads: int = 120,
         subset_name: Literal["hard", "consensus"] | None = None,
+        # If set, grader responses are read from and written to this persistent cache.
+        grader_cache: GraderCache | None = None,
+        n_bootstrap: int = common.DEFAULT_N_BOOTSTRAP,
+        # If set, also report percentile bootstrap confidence intervals at this level.
+        bootstrap_ci_level: float | None = None,
+        # "batched" grades several rubric items of one conversation per grader request.
+        grading_mode: Literal["single", "batched"] = "single",
+        # Rubric items per grader request in batched mode; None packs all of them.
+        grading_batch_size: int | None = None,
+        # "prefix_cache" puts the static grader instructions before the conversation
+        # and the rubric item, so that grader prompts share a cacheable prefix.
+        grader_prompt_layout: Literal["default", "prefix_cache"] = "default",
+        # How grader responses without a valid verdict are retried; defaults to
+        # GraderRetryPolicy().
+        grader_retry_policy: GraderRetryPolicy | None = None,
+        # If True, the grader is asked for JSON following GRADER_JSON_SCHEMA (or
+        # BATCH_GRADER_JSON_SCHEMA) through its structured output support.
+        structured_output: bool = False,
+        # If False, no per-example HTML is rendered (e.g. for runs without a report).
+        render_html: bool = True,
+        # If set, examples are read from this JSONL file (e.g. synthetic examples
+        # for benchmarks) instead of the HealthBench dataset or subset.
+        input_path: str | Path | None = None,
     ):
+        assert grading_mode in ("single", "batched"), f"Invalid {grading_mode =}"
+        assert (
+            grader_prompt_layout in GRADER_PROMPT_LAYOUTS
+        ), f"Invalid {grader_prompt_layout =}"
         if run_reference_completions:
             assert (
                 physician_completions_mode is not None
@@ -298,18 +771,16 @@ class HealthBenchEval(Eval):
                 "has_reference"
             ], "physician_completions_mode must have reference completions if run_reference_completions is True"
 
-        if subset_name == "hard":
-            input_path = INPUT_PATH_HARD
-        elif subset_name == "consensus":
-            input_path = INPUT_PATH_CONSENSUS
-        elif subset_name is None:
-            input_path = INPUT_PATH
-        else:
-            assert False, f"Invalid subset name: {subset_name}"
-        with bf.BlobFile(input_path, "rb") as f:
-            examples = [json.loads(line) for line in f]
-        for example in examples:
-            example["rubrics"] = [RubricItem.from_dict(d) for d in example["rubrics"]]
+        if input_path is None:
+            if subset_name == "hard":
+                input_path = INPUT_PATH_HARD
+            elif subset_name == "consensus":
+                input_path = INPUT_PATH_CONSENSUS
+            elif subset_name is None:
+                input_path = INPUT_PATH
+            else:
+                assert False, f"Invalid subset name: {subset_name}"
+        dataset = JsonlDataset(input_path)
 
         rng = random.Random(0)
 
@@ -322,7 +793,7 @@ class HealthBenchEval(Eval):
             # subset to only the rows which have physician completions from that group
             examples_matching_mode = [
                 example
-                for example in examples
+                for example in dataset
                 if example["ideal_completions_data"] is not None
                 and example["ideal_completions_data"]["ideal_completions_group"]
                 == self.physician_completions_mode
@@ -337,19 +808,19 @@ class HealthBenchEval(Eval):
                     for completion in example["ideal_completions_data"][
                         "ideal_completions_ref_completions"
                     ]:
-                        new_example = copy.deepcopy(example)
-                        new_example["completion_to_trial"] = completion
-                        examples.append(new_example)
+                        examples.append(WorkItem(example, completion))
                 assert len(examples) == len(examples_matching_mode) * 4
                 print(
                     f"Running four references for each example, for {len(examples)} total"
                 )
             else:
                 for example in examples_matching_mode:
-                    example["completion_to_trial"] = example["ideal_completions_data"][
-                        "ideal_completion"
-                    ]
-                    examples.append(example)
+                    examples.append(
+                        WorkItem(
+                            example,
+                            example["ideal_completions_data"]["ideal_completion"],
+                        )
+                    )
                 assert len(examples) == len(examples_matching_mode)
 
             if len(examples) == 0:
@@ -357,15 +828,239 @@ class HealthBenchEval(Eval):
                     f"No examples found matching mode {self.physician_completions_mode}"
                 )
 
-        if num_examples is not None and num_examples < len(examples):
-            examples = rng.sample(
-                examples,
-                num_examples,
-            )
+            if num_examples is not None and num_examples < len(examples):
+                examples = rng.sample(
+                    examples,
+                    num_examples,
+                )
+        else:
+            # Only the sampled rows are parsed. rng.sample draws the same positions
+            # from range(len(dataset)) as it would from the list of all rows.
+            if num_examples is not None and num_examples < len(dataset):
+                rows = dataset.rows(rng.sample(range(len(dataset)), num_examples))
+            else:
+                rows = list(dataset)
+            examples = [WorkItem(row) for row in rows]
+
+        # converted once per example, since the work items of an example share it
+        for example in {id(item.example): item.example for item in examples}.values():
+            if not example["rubrics"]:
+                # such an example could be neither graded nor scored
+                raise ValueError(f"Example {example['prompt_id']} has no rubric items")
+            example["rubrics"] = [RubricItem.from_dict(d) for d in example["rubrics"]]
 
-        self.examples = examples * n_repeats
+        # Repeats are further references to the same work items.
+        self.examples: list[WorkItem] = examples * n_repeats
         self.n_threads = n_threads
         self.grader_model = grader_model
+        self.grader_cache = grader_cache
+        self.n_bootstrap = n_bootstrap
+        self.bootstrap_ci_level = bootstrap_ci_level
+        self.grading_mode = grading_mode
+        self.grading_batch_size = grading_batch_size
+        self.grader_prompt_layout = grader_prompt_layout
+        self.grader_retry_policy = grader_retry_policy or GraderRetryPolicy()
+        self.structured_output = structured_output
+        self.render_html = render_html
+        # If set, finished results are streamed here and already finished work items
+        # are skipped, so that an interrupted run can be resumed.
+        self.checkpoint: EvalCheckpoint | None = None
+        # If set, policy completions are written here as they are sampled, and work
+        # items with a stored completion are graded without sampling them again.
+        self.completion_store: CompletionStore | None = None
+        # Grading outcomes of the last run, kept in columnar form for aggregation
+        # and post-hoc analysis.
+        self.grade_store: GradeStore | None = None
+        self.usage_totals = TokenUsageTotals(_USAGE_ROLES)
+        self.retry_stats = GraderRetryStats()
+
+    def _grader(self, json_schema: dict[str, Any]) -> SamplerBase:
+        # Responses are cached under the plain grader, since a structured response
+        # carries the same verdict.
+        if not self.structured_output:
+            return self.grader_model
+        return self.grader_model.with_options(json_schema=json_schema)
+
+    def _grader_messages(
+        self, convo_with_response: MessageList, rubric_item: RubricItem
+    ) -> MessageList:
+        grader_prompt = format_grader_prompt(
+            format_conversation(convo_with_response),
+            str(rubric_item),
+            self.grader_prompt_layout,
+        )
+        return [dict(content=grader_prompt, role="user")]
+
+    def _batch_grader_messages(
+        self, convo_with_response: MessageList, rubric_items: list[RubricItem]
+    ) -> MessageList:
+        grader_prompt = format_batch_grader_prompt(
+            format_conversation(convo_with_response),
+            [str(rubric_item) for rubric_item in rubric_items],
+            self.grader_prompt_layout,
+        )
+        return [dict(content=grader_prompt, role="user")]
+
+    def _grading_batches(
+        self, rubric_items: list[RubricItem]
+    ) -> list[tuple[int, list[RubricItem]]]:
+        """
+        Split the rubric items of one example into (start index, items) batches, one
+        grader request each. Single mode grades every item on its own.
+        """
+        if self.grading_mode == "single":
+            batch_size = 1
+        else:
+            batch_size = self.grading_batch_size or max(len(rubric_items), 1)
+        return [
+            (start, rubric_items[start : start + batch_size])
+            for start in range(0, len(rubric_items), batch_size)
+        ]
+
+    def _get_cached_batch_grades(
+        self, messages: MessageList, n_items: int
+    ) -> list[dict | None] | None:
+        if self.grader_cache is None:
+            return None
+        cached = self.grader_cache.get(
+            self.grader_cache.make_key(self.grader_model, messages)
+        )
+        if cached is None:
+            return None
+        return parse_batch_grading_response(cached.response_text, n_items)
+
+    def _put_cached_batch(
+        self,
+        messages: MessageList,
+        sampler_response: SamplerResponse,
+        batch_grades: list[dict | None],
+    ):
+        # Only fully parsed batch responses are cached, like single-item verdicts.
+        if self.grader_cache is not None and all(
+            grade is not None for grade in batch_grades
+        ):
+            self.grader_cache.put(
+                self.grader_cache.make_key(self.grader_model, messages),
+                sampler_response,
+            )
+
+    def grade_rubric_items(
+        self, convo_with_response: MessageList, rubric_items: list[RubricItem]
+    ) -> list[tuple[dict, int]]:
+        """
+        Grade a batch of rubric items with one grader request. Items the batched
+        response does not grade are graded one by one.
+        """
+        if len(rubric_items) == 1:
+            return [self.grade_rubric_item(convo_with_response, rubric_items[0])]
+        messages = self._batch_grader_messages(convo_with_response, rubric_items)
+        batch_grades = self._get_cached_batch_grades(messages, len(rubric_items))
+        if batch_grades is None:
+            sampler_response = self._grader(BATCH_GRADER_JSON_SCHEMA)(messages)
+            self.usage_totals.add(
+                "grader", sampler_response.response_metadata.get("usage")
+            )
+            batch_grades = parse_batch_grading_response(
+                sampler_response.response_text, len(rubric_items)
+            )
+            self._put_cached_batch(messages, sampler_response, batch_grades)
+        return [
+            (
+                ({**grade, "grading_mode": "batched"}, 0)
+                if grade is not None
+                else self.grade_rubric_item(convo_with_response, rubric_item)
+            )
+            for rubric_item, grade in zip(rubric_items, batch_grades)
+        ]
+
+    async def agrade_rubric_items(
+        self, convo_with_response: MessageList, rubric_items: list[RubricItem]
+    ) -> list[tuple[dict, int]]:
+        if len(rubric_items) == 1:
+            return [await self.agrade_rubric_item(convo_with_response, rubric_items[0])]
+        messages = self._batch_grader_messages(convo_with_response, rubric_items)
+        batch_grades = self._get_cached_batch_grades(messages, len(rubric_items))
+        if batch_grades is None:
+            sampler_response = await self._grader(BATCH_GRADER_JSON_SCHEMA).acall(
+                messages
+            )
+            self.usage_totals.add(
+                "grader", sampler_response.response_metadata.get("usage")
+            )
+            batch_grades = parse_batch_grading_response(
+                sampler_response.response_text, len(rubric_items)
+            )
+            self._put_cached_batch(messages, sampler_response, batch_grades)
+
+        async def fallback(rubric_item: RubricItem, grade: dict | None):
+            if grade is not None:
+                return {**grade, "grading_mode": "batched"}, 0
+            return await self.agrade_rubric_item(convo_with_response, rubric_item)
+
+        return list(
+            await asyncio.gather(
+                *[
+                    fallback(rubric_item, grade)
+                    for rubric_item, grade in zip(rubric_items, batch_grades)
+                ]
+            )
+        )
+
+    def _get_cached_grade(self, messages: MessageList) -> dict | None:
+        if self.grader_cache is None:
+            return None
+        cached = self.grader_cache.get(
+            self.grader_cache.make_key(self.grader_model, messages)
+        )
+        if cached is None:
+            return None
+        return parse_grading_response(cached.response_text)
+
+    def grade_rubric_item(
+        self, convo_with_response: MessageList, rubric_item: RubricItem
+    ) -> tuple[dict, int]:
+        messages = self._grader_messages(convo_with_response, rubric_item)
+        cached = self._get_cached_grade(messages)
+        if cached is not None:
+            return cached, 0
+        sampler_response, grading_response_dict, retries = request_grade(
+            self._grader(GRADER_JSON_SCHEMA),
+            messages,
+            self.grader_retry_policy,
+            self.usage_totals,
+        )
+        if grading_response_dict is None:
+            print(f"No valid grader verdict after {retries} retries, marking ungraded")
+            return ungraded_grade(retries), retries
+        if self.grader_cache is not None:
+            self.grader_cache.put(
+                self.grader_cache.make_key(self.grader_model, messages),
+                sampler_response,
+            )
+        return grading_response_dict, retries
+
+    async def agrade_rubric_item(
+        self, convo_with_response: MessageList, rubric_item: RubricItem
+    ) -> tuple[dict, int]:
+        messages = self._grader_messages(convo_with_response, rubric_item)
+        cached = self._get_cached_grade(messages)
+        if cached is not None:
+            return cached, 0
+        sampler_response, grading_response_dict, retries = await arequest_grade(
+            self._grader(GRADER_JSON_SCHEMA),
+            messages,
+            self.grader_retry_policy,
+            self.usage_totals,
+        )
+        if grading_response_dict is None:
+            print(f"No valid grader verdict after {retries} retries, marking ungraded")
+            return ungraded_grade(retries), retries
+        if self.grader_cache is not None:
+            self.grader_cache.put(
+                self.grader_cache.make_key(self.grader_model, messages),
+                sampler_response,
+            )
+        return grading_response_dict, retries
 
     def grade_sample(
         self,
@@ -377,63 +1072,39 @@ class HealthBenchEval(Eval):
         # construct and grade the sample
         convo_with_response = prompt + [dict(content=response_text, role="assistant")]
 
-        def sanitize_grading_response(text: str) -> str | None:
-            """
-            Constrains model output to just the valid json, if the json exists. Helps with models that generate
-            correct responses, but have a hard time constraining the output to just the valid json.
-            """
-            pattern = r"""
-                ```json\s*                       # opening markdown code block
-                \{\s*                            # opening brace {
-                "explanation"\s*:\s*"[^"]*",\s* # "explanation": "...",
-                "criteria_met"\s*:\s*(true|false) # "criteria_met": true/false
-                \s*\}                            # closing brace }
-                \s*```                           # closing markdown code block
-            """
-            match = re.search(pattern, text, re.IGNORECASE | re.VERBOSE)
-            return match.group(0) if match else None
-
-        def grade_rubric_item(rubric_item: RubricItem) -> tuple[dict, int]:
-            convo_str = "\n\n".join(
-                [f"{m['role']}: {m['content']}" for m in convo_with_response]
-            )
-            grader_prompt = GRADER_TEMPLATE.replace(
-                "<<conversation>>", convo_str
-            ).replace("<<rubric_item>>", str(rubric_item))
-            messages: MessageList = [dict(content=grader_prompt, role="user")]
-            retries = 0
-            while True:
-                sampler_response = self.grader_model(messages)
-                grading_response = sampler_response.response_text
-                grading_response_clean = sanitize_grading_response(grading_response)
-                grading_response_dict = parse_json_to_dict(
-                    grading_response_clean or grading_response
-                )
-                if "criteria_met" in grading_response_dict:
-                    label = grading_response_dict["criteria_met"]
-                    if label is True or label is False:
-                        break
-
-                retries += 1
-                print("Grading failed due to bad JSON output, retrying...")
-
-            return grading_response_dict, retries
-
-        grading_results_with_retries = common.map_with_progress(
-            grade_rubric_item,
-            rubric_items,
+        batch_results = common.map_with_progress(
+            lambda batch: self.grade_rubric_items(convo_with_response, batch[1]),
+            self._grading_batches(rubric_items),
             pbar=True,
         )
+        grading_results_with_retries = [
+            result for batch in batch_results for result in batch
+        ]
+        return self.score_sample(
+            example_tags=example_tags,
+            rubric_items=rubric_items,
+            grading_results_with_retries=grading_results_with_retries,
+        )
 
+    def score_sample(
+        self,
+        example_tags: list[str],
+        rubric_items: list[RubricItem],
+        grading_results_with_retries: list[tuple[dict, int]],
+    ) -> tuple[dict, str, list[dict]]:
         grading_response_list = [r[0] for r in grading_results_with_retries]
         retry_counts = [r[1] for r in grading_results_with_retries]
         total_retries = sum(retry_counts)
 
         # compute the overall score
         overall_score = calculate_score(rubric_items, grading_response_list)
-        assert overall_score is not None
+        # None only if every item with points to earn is ungraded; such an example
+        # has no score and is left out of the aggregate scores
+        assert overall_score is not None or any(
+            grading_response.get("grading_status") == "ungraded"
+            for grading_response in grading_response_list
+        )
         metrics = {
-            "overall_score": overall_score,
             "total_retries": total_retries,
             "avg_retries_per_rubric": total_retries / len(rubric_items),
         }
@@ -441,7 +1112,9 @@ class HealthBenchEval(Eval):
         # compute scores for example-level tags)
         example_tag_scores = {tag: overall_score for tag in example_tags}
         assert len(example_tag_scores) == len(example_tags)  # No duplicates.
-        metrics.update(example_tag_scores)
+        if overall_score is not None:
+            metrics["overall_score"] = overall_score
+            metrics.update(example_tag_scores)
 
         # compute scores for rubric-level tags
         rubric_tag_items_grades = defaultdict(list)
@@ -475,6 +1148,8 @@ class HealthBenchEval(Eval):
                     **rubric_item.to_dict(),
                     "criteria_met": criteria_met,
                     "explanation": explanation,
+                    "grading_mode": grading_response.get("grading_mode", "single"),
+                    "grading_status": grading_response.get("grading_status", "graded"),
                     # Add ensemble details if available
                     "ensemble_votes": (
                         grading_response.get("ensemble_votes")
@@ -497,88 +1172,570 @@ class HealthBenchEval(Eval):
         # print(metrics["total_retries"])
         return metrics, readable_explanation_str, rubric_items_with_grades
 
-    def __call__(self, sampler: SamplerBase) -> EvalResult:
-        def fn(row: dict):
-            prompt_messages = row["prompt"]
+    def _sample_policy(self, sampler: SamplerBase, row: WorkItem) -> dict:
+        prompt_messages = row["prompt"]
+        if self.physician_completions_mode is not None:
+            return {
+                "response_text": row["completion_to_trial"],
+                "response_usage": None,
+                "response_metadata": {},
+                "prompt_messages": prompt_messages,
+            }
+        return self._policy_from_response(sampler(prompt_messages))
 
-            if self.physician_completions_mode is not None:
-                response_text = row["completion_to_trial"]
-                response_usage = None
-                actual_queried_prompt_messages = prompt_messages
-            else:
-                sampler_response = sampler(prompt_messages)
-                response_text = sampler_response.response_text
-                response_dict = sampler_response.response_metadata
-                actual_queried_prompt_messages = (
-                    sampler_response.actual_queried_message_list
-                )
-                response_usage = response_dict.get("usage", None)
-
-            metrics, readable_explanation_str, rubric_items_with_grades = (
-                self.grade_sample(
-                    prompt=actual_queried_prompt_messages,
-                    response_text=response_text,
-                    rubric_items=row["rubrics"],
-                    example_tags=row["example_tags"],
-                )
-            )
+    async def _asample_policy(self, sampler: SamplerBase, row: WorkItem) -> dict:
+        if self.physician_completions_mode is not None:
+            return self._sample_policy(sampler, row)
+        return self._policy_from_response(await sampler.acall(row["prompt"]))
 
-            score = metrics["overall_score"]
+    def _policy_from_response(self, sampler_response: SamplerResponse) -> dict:
+        self.usage_totals.add("policy", sampler_response.response_metadata.get("usage"))
+        return {
+            "response_text": sampler_response.response_text,
+            "response_usage": sampler_response.response_metadata.get("usage", None),
+            "response_metadata": sampler_response.response_metadata,
+            "prompt_messages": sampler_response.actual_queried_message_list,
+        }
 
-            # Create HTML for each sample result
-            html = common.jinja_env.from_string(
-                HEALTHBENCH_HTML_JINJA.replace(
-                    "{{ rubric_grades }}",
-                    readable_explanation_str.replace("\n", "<br>"),
-                )
-            ).render(
+    def _stored_policy(self, key: str) -> dict | None:
+        if self.completion_store is None:
+            return None
+        completion = self.completion_store.load().get(key)
+        if completion is None:
+            return None
+        return {
+            "response_text": completion["response_text"],
+            "response_usage": completion["usage"],
+            "response_metadata": completion["response_metadata"],
+            "prompt_messages": completion["prompt_messages"],
+        }
+
+    def _store_policy(self, key: str, row: WorkItem, policy: dict):
+        if self.completion_store is None:
+            return
+        self.completion_store.append(
+            key,
+            {
+                "prompt_id": row["prompt_id"],
+                "completion_id": completion_id(
+                    row["prompt_id"], policy["response_text"]
+                ),
+                "prompt_messages": policy["prompt_messages"],
+                "response_text": policy["response_text"],
+                "usage": get_usage_dict(policy["response_usage"]),
+                "response_metadata": {
+                    k: v for k, v in policy["response_metadata"].items() if k != "usage"
+                },
+            },
+        )
+
+    def missing_completions(self) -> list[str]:
+        """
+        Work items that have no completion in completion_store.
+        """
+        assert self.completion_store is not None
+        stored = self.completion_store.load()
+        return [key for key in self._work_item_keys() if key not in stored]
+
+    def import_completions(self, allresults_path: str) -> int:
+        """
+        Add the completions of an earlier run's _allresults.json to completion_store,
+        so that the grade stage grades them (e.g. with another grader) instead of
+        sampling the policy model again. Returns the number of completions added.
+        """
+        assert self.completion_store is not None
+        stored = self.completion_store.load()
+        completions = completions_from_allresults(allresults_path)
+        n_added = 0
+        for key in self._work_item_keys():
+            if key in completions and key not in stored:
+                self.completion_store.append(key, completions[key])
+                n_added += 1
+        self.completion_store.flush()
+        return n_added
+
+    def sample_completions(self, sampler: SamplerBase) -> int:
+        """
+        Sample stage of a two-stage run: sample a completion for every work item that
+        has none in completion_store yet, without grading. The grade stage is a
+        normal run over the same store. Returns the number of new completions.
+        """
+        assert self.completion_store is not None
+        self.usage_totals = TokenUsageTotals(_USAGE_ROLES)
+        keys = self._work_item_keys()
+        todo = set(self.missing_completions())
+
+        def sample(idx: int):
+            policy = self._sample_policy(sampler, self.examples[idx])
+            self._store_policy(keys[idx], self.examples[idx], policy)
+
+        common.map_with_progress(
+            sample,
+            [idx for idx, key in enumerate(keys) if key in todo],
+            num_threads=self.n_threads,
+        )
+        self.completion_store.flush()
+        return len(todo)
+
+    def _build_result(
+        self,
+        row: WorkItem,
+        policy: dict,
+        grading_results_with_retries: list[tuple[dict, int]],
+    ) -> SingleEvalResult:
+        actual_queried_prompt_messages = policy["prompt_messages"]
+        response_text = policy["response_text"]
+        response_metadata = policy["response_metadata"]
+        metrics, readable_explanation_str, rubric_items_with_grades = self.score_sample(
+            example_tags=row["example_tags"],
+            rubric_items=row["rubrics"],
+            grading_results_with_retries=grading_results_with_retries,
+        )
+
+        score = metrics.get("overall_score")
+
+        # Create HTML for each sample result
+        html = None
+        if self.render_html:
+            html = common.render_template(
+                HEALTHBENCH_HTML_JINJA,
                 prompt_messages=actual_queried_prompt_messages,
                 next_message=dict(content=response_text, role="assistant"),
-                score=metrics["overall_score"],
+                score=score,
                 extracted_answer=response_text,
+                rubric_grades=Markup("<br>").join(readable_explanation_str.split("\n")),
             )
 
-            convo = actual_queried_prompt_messages + [
-                dict(content=response_text, role="assistant")
+        convo = actual_queried_prompt_messages + [
+            dict(content=response_text, role="assistant")
+        ]
+        return SingleEvalResult(
+            html=html,
+            score=score,
+            convo=convo,
+            metrics=metrics,
+            example_level_metadata={
+                "score": score,
+                "usage": get_usage_dict(policy["response_usage"]),
+                "rubric_items": rubric_items_with_grades,
+                "prompt": actual_queried_prompt_messages,
+                "completion": [dict(content=response_text, role="assistant")],
+                "prompt_id": row["prompt_id"],
+                "completion_id": completion_id(row["prompt_id"], response_text),
+                # Extra fields for ensemble grading
+                "ensemble_votes": response_metadata.get("votes"),
+                "ensemble_raw_responses": response_metadata.get("raw_responses"),
+            },
+        )
+
+    def __call__(self, sampler: SamplerBase) -> EvalResult:
+        # Every policy sample and every grading request (one per rubric item, or per
+        # batch of rubric items in batched mode) is a task on one shared scheduler, so
+        # n_threads bounds the total number of requests in flight. Follow-up work is
+        # chained from this thread as tasks complete.
+        cache_stats_before = (
+            self.grader_cache.stats() if self.grader_cache is not None else None
+        )
+        done_queue: queue.SimpleQueue = queue.SimpleQueue()
+        results: list[SingleEvalResult | None] = [None] * len(self.examples)
+        policies: dict[int, dict] = {}
+        grades: dict[int, list] = {}
+        n_outstanding: dict[int, int] = {}
+
+        def submit(tag: tuple, fn, *args, priority: int = PRIORITY_SAMPLE):
+            future = scheduler.submit(fn, *args, priority=priority)
+            future.add_done_callback(lambda f: done_queue.put((tag, f)))
+
+        def submit_grading(idx: int, policy: dict):
+            rubric_items = self.examples[idx]["rubrics"]
+            convo_with_response = policy["prompt_messages"] + [
+                dict(content=policy["response_text"], role="assistant")
             ]
-            return SingleEvalResult(
-                html=html,
-                score=score,
-                convo=convo,
-                metrics=metrics,
-                example_level_metadata={
-                    "score": score,
-                    "usage": get_usage_dict(response_usage),
-                    "rubric_items": rubric_items_with_grades,
-                    "prompt": actual_queried_prompt_messages,
-                    "completion": [dict(content=response_text, role="assistant")],
-                    "prompt_id": row["prompt_id"],
-                    "completion_id": hashlib.sha256(
-                        (row["prompt_id"] + response_text).encode("utf-8")
-                    ).hexdigest(),
-                    # Extra fields for ensemble grading
-                    "ensemble_votes": (
-                        sampler_response.response_metadata.get("votes")
-                        if "votes" in sampler_response.response_metadata
-                        else None
-                    ),
-                    "ensemble_raw_responses": (
-                        sampler_response.response_metadata.get("raw_responses")
-                        if "raw_responses" in sampler_response.response_metadata
-                        else None
-                    ),
-                },
+            policies[idx] = policy
+            grades[idx] = [None] * len(rubric_items)
+            batches = self._grading_batches(rubric_items)
+            n_outstanding[idx] = len(batches)
+            for start, batch in batches:
+                submit(
+                    ("grade", idx, start),
+                    self.grade_rubric_items,
+                    convo_with_response,
+                    batch,
+                    priority=PRIORITY_GRADE,
+                )
+
+        keys = self._work_item_keys()
+        completed = self._start_run(keys)
+        with BoundedScheduler(self.n_threads) as scheduler:
+            n_finished = 0
+            for idx, row in enumerate(self.examples):
+                if keys[idx] in completed:
+                    results[idx] = completed[keys[idx]]
+                    n_finished += 1
+                elif (policy := self._stored_policy(keys[idx])) is not None:
+                    submit_grading(idx, policy)
+                else:
+                    submit(("sample", idx, None), self._sample_policy, sampler, row)
+
+            with tqdm(total=len(self.examples), initial=n_finished) as pbar:
+                while n_finished < len(self.examples):
+                    (kind, idx, start), future = done_queue.get()
+                    if kind == "sample":
+                        policy = future.result()
+                        self._store_policy(keys[idx], self.examples[idx], policy)
+                        submit_grading(idx, policy)
+                    else:
+                        batch_grades = future.result()
+                        grades[idx][start : start + len(batch_grades)] = batch_grades
+                        n_outstanding[idx] -= 1
+                        if n_outstanding[idx] == 0:
+                            self._record_grades(idx, grades[idx])
+                            results[idx] = self._checkpoint_result(
+                                keys[idx],
+                                self._build_result(
+                                    self.examples[idx],
+                                    policies.pop(idx),
+                                    grades.pop(idx),
+                                ),
+                            )
+                            n_finished += 1
+                            pbar.update(1)
+                    stats = scheduler.stats()
+                    pbar.set_postfix(
+                        queue_depth=stats["queue_depth"],
+                        in_flight=stats["in_flight"],
+                        refresh=False,
+                    )
+            scheduler_stats = scheduler.stats()
+
+        final_metrics = self._aggregate(results)
+        assert final_metrics.metadata is not None
+        final_metrics.metadata["scheduler_stats"] = scheduler_stats
+        self._add_run_metrics(final_metrics, cache_stats_before)
+        self._attach_checkpointed_fields(final_metrics, keys)
+        return final_metrics
+
+    def _aggregate(self, results: list[SingleEvalResult]) -> EvalResult:
+        stats = ("mean", "n_samples", "bootstrap_std")
+        if self.bootstrap_ci_level is not None:
+            stats += ("bootstrap_ci_lower", "bootstrap_ci_upper")
+        ci_level = self.bootstrap_ci_level or 0.95
+        if self.grade_store is None or len(self.grade_store) != len(results):
+            return _aggregate_get_clipped_mean(
+                results, stats=stats, n_bootstrap=self.n_bootstrap, ci_level=ci_level
             )
+        name2values = self.grade_store.metric_values()
+        if "overall_score" in name2values:
+            name2values["score"] = name2values["overall_score"]
+        final_metrics = _clipped_metrics(
+            name2values, stats, n_bootstrap=self.n_bootstrap, ci_level=ci_level
+        )
+        return EvalResult(
+            score=final_metrics.pop("score", None),
+            metrics=final_metrics,
+            htmls=[result.html for result in results],
+            convos=[result.convo for result in results],
+            metadata={
+                "example_level_metadata": [
+                    result.example_level_metadata for result in results
+                ]
+            },
+        )
 
-        results = common.map_with_progress(
-            fn,
-            self.examples,
-            num_threads=self.n_threads,
-            pbar=False,
+    def _record_grades(
+        self, idx: int, grading_results_with_retries: list[tuple[dict, int]]
+    ):
+        row = self.examples[idx]
+        assert self.grade_store is not None
+        self.grade_store.add_example(
+            idx,
+            row["example_tags"],
+            row["rubrics"],
+            [grade["criteria_met"] for grade, _ in grading_results_with_retries],
+            retries=sum(retries for _, retries in grading_results_with_retries),
+            graded=[
+                grade.get("grading_status") != "ungraded"
+                for grade, _ in grading_results_with_retries
+            ],
         )
-        final_metrics = _aggregate_get_clipped_mean(results)
+        for grade, retries in grading_results_with_retries:
+            self.retry_stats.add(retries, grade.get("grading_status") == "ungraded")
+
+    def _start_run(self, keys: list[str]) -> dict[str, SingleEvalResult]:
+        # Resets the per-run state and loads the work items already in the
+        # checkpoint, adding their grades to the fresh grade store.
+        self.grade_store = GradeStore()
+        self.usage_totals = TokenUsageTotals(_USAGE_ROLES)
+        self.retry_stats = GraderRetryStats()
+        if self.checkpoint is None:
+            return {}
+        key2idx = {key: idx for idx, key in enumerate(keys)}
+
+        def record(key: str, result: SingleEvalResult):
+            if key not in key2idx or result.example_level_metadata is None:
+                return
+            assert self.grade_store is not None and result.metrics is not None
+            self.grade_store.add_example(
+                key2idx[key],
+                self.examples[key2idx[key]]["example_tags"],
+                self.examples[key2idx[key]]["rubrics"],
+                [
+                    item["criteria_met"]
+                    for item in result.example_level_metadata["rubric_items"]
+                ],
+                retries=result.metrics["total_retries"],
+                graded=[
+                    item.get("grading_status") != "ungraded"
+                    for item in result.example_level_metadata["rubric_items"]
+                ],
+            )
+
+        return self.checkpoint.load(slim=True, on_result=record)
+
+    def _work_item_keys(self) -> list[str]:
+        return work_item_keys([row["prompt_id"] for row in self.examples])
+
+    def _checkpoint_result(
+        self, key: str, result: SingleEvalResult
+    ) -> SingleEvalResult:
+        # Once a result is on disk only its metrics are kept in memory; the rest is
+        # read back lazily through _attach_checkpointed_fields.
+        if self.checkpoint is None:
+            return result
+        self.checkpoint.append(key, result)
+        return slim_result(result)
+
+    def _attach_checkpointed_fields(self, eval_result: EvalResult, keys: list[str]):
+        if self.checkpoint is None:
+            return
+        eval_result.htmls = self.checkpoint.field_view(keys, "html")
+        eval_result.convos = self.checkpoint.field_view(keys, "convo")
+        eval_result.metadata = {
+            **(eval_result.metadata or {}),
+            "example_level_metadata": self.checkpoint.field_view(
+                keys, "example_level_metadata"
+            ),
+        }
+
+    def _add_run_metrics(
+        self, eval_result: EvalResult, cache_stats_before: dict | None
+    ):
+        # Run-level counters that are not per-example metrics: token usage and
+        # prompt cache hit rates, grader retries, and grader cache hits.
+        assert eval_result.metrics is not None
+        eval_result.metrics.update(self.usage_totals.metrics())
+        eval_result.metrics.update(self.retry_stats.metrics())
+        if self.grader_cache is None or cache_stats_before is None:
+            return
+        eval_result.metrics.update(self.grader_cache.run_metrics(cache_stats_before))
+
+    async def acall(self, sampler: SamplerBase) -> EvalResult:
+        # One event loop drives every request; n_threads bounds how many policy and
+        # grader requests are in flight at once.
+        cache_stats_before = (
+            self.grader_cache.stats() if self.grader_cache is not None else None
+        )
+        semaphore = asyncio.Semaphore(self.n_threads)
+
+        async def limited(coro_fn, *args):
+            async with semaphore:
+                return await coro_fn(*args)
+
+        async def run_example(idx: int, key: str, row: WorkItem) -> SingleEvalResult:
+            if key in completed:
+                return completed[key]
+            policy = self._stored_policy(key)
+            if policy is None:
+                policy = await limited(self._asample_policy, sampler, row)
+                self._store_policy(key, row, policy)
+            convo_with_response = policy["prompt_messages"] + [
+                dict(content=policy["response_text"], role="assistant")
+            ]
+            batch_results = await asyncio.gather(
+                *[
+                    limited(self.agrade_rubric_items, convo_with_response, batch)
+                    for _, batch in self._grading_batches(row["rubrics"])
+                ]
+            )
+            grading_results_with_retries = [
+                result for batch in batch_results for result in batch
+            ]
+            self._record_grades(idx, grading_results_with_retries)
+            return self._checkpoint_result(
+                key, self._build_result(row, policy, grading_results_with_retries)
+            )
+
+        keys = self._work_item_keys()
+        completed = self._start_run(keys)
+        results = await tqdm_asyncio.gather(
+            *[
+                run_example(idx, key, row)
+                for idx, (key, row) in enumerate(zip(keys, self.examples))
+            ]
+        )
+        final_metrics = self._aggregate(results)
+        self._add_run_metrics(final_metrics, cache_stats_before)
+        self._attach_checkpointed_fields(final_metrics, keys)
+        return final_metrics
+
+    def run_batch(self, sampler: SamplerBase, batch_runner: BatchRunner) -> EvalResult:
+        """
+        Run the eval through the Batch API: one batch with every policy prompt, then
+        batches of grader prompts. Grader retries and the per-item fallback of
+        batched grading follow in further batches, so the grades match those of
+        __call__. Both the sampler and the grader must support batching.
+        """
+        cache_stats_before = (
+            self.grader_cache.stats() if self.grader_cache is not None else None
+        )
+        keys = self._work_item_keys()
+        completed = self._start_run(keys)
+        todo = [idx for idx, key in enumerate(keys) if key not in completed]
+
+        policies = {}
+        for idx in todo:
+            if (policy := self._stored_policy(keys[idx])) is not None:
+                policies[idx] = policy
+        to_sample = [idx for idx in todo if idx not in policies]
+        if self.physician_completions_mode is not None:
+            new_policies = {
+                idx: self._sample_policy(sampler, self.examples[idx])
+                for idx in to_sample
+            }
+        else:
+            responses = batch_runner.run(
+                {
+                    f"policy-{idx}": (sampler, self.examples[idx]["prompt"])
+                    for idx in to_sample
+                }
+            )
+            new_policies = {
+                idx: self._policy_from_response(responses[f"policy-{idx}"])
+                for idx in to_sample
+            }
+        for idx, policy in new_policies.items():
+            self._store_policy(keys[idx], self.examples[idx], policy)
+        policies.update(new_policies)
+        grades = self._batch_grade(batch_runner, policies)
+
+        results = []
+        for idx, key in enumerate(keys):
+            if key in completed:
+                results.append(completed[key])
+                continue
+            self._record_grades(idx, grades[idx])
+            results.append(
+                self._checkpoint_result(
+                    key,
+                    self._build_result(self.examples[idx], policies[idx], grades[idx]),
+                )
+            )
+        final_metrics = self._aggregate(results)
+        assert final_metrics.metadata is not None
+        final_metrics.metadata["batch_stats"] = batch_runner.stats()
+        self._add_run_metrics(final_metrics, cache_stats_before)
+        self._attach_checkpointed_fields(final_metrics, keys)
         return final_metrics
 
+    def _batch_grade(
+        self, batch_runner: BatchRunner, policies: dict[int, dict]
+    ) -> dict[int, list[tuple[dict, int]]]:
+        # A request grades rubric_items[start:start + len(items)] of example idx and
+        # is the given retry of that request. Each round sends the requests the
+        # grader cache cannot answer as one batch; unparsed items of a batched
+        # request and failed single items become the requests of the next round.
+        convos = {
+            idx: policy["prompt_messages"]
+            + [dict(content=policy["response_text"], role="assistant")]
+            for idx, policy in policies.items()
+        }
+        grades: dict[int, list] = {}
+        requests: list[tuple[int, int, list[RubricItem], int]] = []
+        for idx in policies:
+            rubric_items = self.examples[idx]["rubrics"]
+            grades[idx] = [None] * len(rubric_items)
+            for start, batch in self._grading_batches(rubric_items):
+                requests.append((idx, start, batch, 0))
+
+        while requests:
+            next_requests = []
+            to_send: dict[str, tuple[SamplerBase, MessageList]] = {}
+            sent: dict[str, tuple[int, int, list[RubricItem], int]] = {}
+            for request in requests:
+                idx, start, items, retries = request
+                if len(items) > 1:
+                    messages = self._batch_grader_messages(convos[idx], items)
+                    cached = self._get_cached_batch_grades(messages, len(items))
+                    if cached is not None:
+                        next_requests += self._take_batch_grades(
+                            grades, request, cached
+                        )
+                        continue
+                    grader = self._grader(BATCH_GRADER_JSON_SCHEMA)
+                else:
+                    messages = self._grader_messages(convos[idx], items[0])
+                    cached = self._get_cached_grade(messages) if retries == 0 else None
+                    if cached is not None:
+                        grades[idx][start] = (cached, 0)
+                        continue
+                    grader = self.grader_retry_policy.grader_for_retry(
+                        self._grader(GRADER_JSON_SCHEMA), retries
+                    )
+                custom_id = f"grade-{idx}-{start}"
+                to_send[custom_id] = (grader, messages)
+                sent[custom_id] = request
+
+            for custom_id, sampler_response in batch_runner.run(to_send).items():
+                request = sent[custom_id]
+                idx, start, items, retries = request
+                messages = to_send[custom_id][1]
+                self.usage_totals.add(
+                    "grader", sampler_response.response_metadata.get("usage")
+                )
+                if len(items) > 1:
+                    batch_grades = parse_batch_grading_response(
+                        sampler_response.response_text, len(items)
+                    )
+                    self._put_cached_batch(messages, sampler_response, batch_grades)
+                    next_requests += self._take_batch_grades(
+                        grades, request, batch_grades
+                    )
+                    continue
+                grade = parse_grading_response(sampler_response.response_text)
+                if grade is not None:
+                    grades[idx][start] = (grade, retries)
+                    if self.grader_cache is not None:
+                        self.grader_cache.put(
+                            self.grader_cache.make_key(self.grader_model, messages),
+                            sampler_response,
+                        )
+                elif self.grader_retry_policy.exhausted(retries):
+                    print(
+                        f"No valid grader verdict after {retries} retries, marking ungraded"
+                    )
+                    grades[idx][start] = (ungraded_grade(retries), retries)
+                else:
+                    next_requests.append((idx, start, items, retries + 1))
+            requests = next_requests
+        return grades
+
+    @staticmethod
+    def _take_batch_grades(
+        grades: dict[int, list],
+        request: tuple[int, int, list[RubricItem], int],
+        batch_grades: list[dict | None],
+    ) -> list[tuple[int, int, list[RubricItem], int]]:
+        # Stores the parsed grades of a batched request and returns the single-item
+        # requests for the items it did not grade.
+        idx, start, items, _ = request
+        fallback = []
+        for i, (rubric_item, grade) in enumerate(zip(items, batch_grades)):
+            if grade is not None:
+                grades[idx][start + i] = ({**grade, "grading_mode": "batched"}, 0)
+            else:
+                fallback.append((idx, start + i, [rubric_item], 0))
+        return fallback
+
 
 def main():
     parser = argparse.ArgumentParser(
@@ -620,6 +1777,14 @@ def physician_completions_main(
     num_examples: int | None = None,
     n_threads: int = 120,
 ):
+    # imported here so that importing the eval does not load the OpenAI client
+    import pandas as pd
+
+    from .sampler.chat_completion_sampler import (
+        OPENAI_SYSTEM_MESSAGE_API,
+        ChatCompletionSampler,
+    )
+
     now = datetime.now()
     date_str = now.strftime("%Y%m%d_%H%M")
 
@@ -655,7 +1820,7 @@ def physician_completions_main(
         else:
             file_stem = f"healthbench_{parsable_mode}_humanbaseline_{date_str}"
         report_filename = Path(f"/tmp/{file_stem}.html")
-        report_filename.write_text(common.make_report(result))
+        common.write_report(str(report_filename), result)
         print(f"Report saved to {report_filename}")
 
         # metrics
@@ -665,15 +1830,8 @@ def physician_completions_main(
         result_filename.write_text(json.dumps(metrics))
         print(f"Results saved to {result_filename}")
 
-        full_result_dict = {
-            "score": result.score,
-            "metrics": result.metrics,
-            "htmls": result.htmls,
-            "convos": result.convos,
-            "metadata": result.metadata,
-        }
         full_result_filename = Path(f"/tmp/{file_stem}_allresults.json")
-        full_result_filename.write_text(json.dumps(full_result_dict, indent=2))
+        common.write_eval_result_json(str(full_result_filename), result)
         print(f"All results saved to {full_result_filename}")
 
         # metrics df
@@ -1,4 +1,27 @@
-from .healthbench_eval import RubricItem, calculate_score
+import json
+from types import SimpleNamespace
+
+import pytest
+
+from . import common, dataset
+from .healthbench_eval import (
+    GRADER_TEMPLATE,
+    GraderRetryPolicy,
+    GraderRetryStats,
+    HealthBenchEval,
+    RubricItem,
+    TokenUsageTotals,
+    WorkItem,
+    calculate_score,
+    completion_id,
+    completions_from_allresults,
+    format_grader_prompt,
+    parse_batch_grading_response,
+    parse_grading_response,
+    request_grade,
+    ungraded_grade,
+)
+from .types_eval import EvalResult, SamplerBase, SamplerResponse
 
 
 def test_calculate_score():
@@ -22,5 +45,220 @@ def test_calculate_score():
     )
 
 
+def test_ungraded_items_neither_earn_nor_lose_points():
+    rubric_items = [
+        RubricItem(criterion="test", points=7, tags=["axis:a"]),
+        RubricItem(criterion="test", points=5, tags=["axis:b"]),
+        RubricItem(criterion="test", points=-6, tags=["axis:a"]),
+    ]
+    grades = [
+        ({"criteria_met": True}, 0),
+        (ungraded_grade(2), 2),
+        (ungraded_grade(2), 2),
+    ]
+    assert calculate_score(rubric_items, [grade for grade, _ in grades]) == 1.0
+    metrics, _, _ = HealthBenchEval.score_sample(
+        None, ["theme:x"], rubric_items, grades
+    )
+    assert metrics["overall_score"] == metrics["theme:x"] == metrics["axis:a"] == 1.0
+    assert "axis:b" not in metrics
+
+    # with every positive item ungraded the example has no score at all
+    grades[0] = (ungraded_grade(2), 2)
+    metrics, _, _ = HealthBenchEval.score_sample(
+        None, ["theme:x"], rubric_items, grades
+    )
+    assert "overall_score" not in metrics and "theme:x" not in metrics
+
+
+def test_parse_batch_grading_response():
+    response = """```json
+[
+  {"rubric_item": 2, "explanation": "b", "criteria_met": false},
+  {"rubric_item": 1, "explanation": "a", "criteria_met": true},
+  {"rubric_item": 3, "explanation": "c", "criteria_met": "yes"}
+]
+```"""
+    grades = parse_batch_grading_response(response, 4)
+    assert grades[0] == {"explanation": "a", "criteria_met": True}
+    assert grades[1] == {"explanation": "b", "criteria_met": False}
+    # invalid and missing items are left for single-item grading
+    assert grades[2] is None
+    assert grades[3] is None
+    assert parse_batch_grading_response("not json", 2) == [None, None]
+
+
+def test_parse_structured_grading_responses():
+    # plain JSON as returned with GRADER_JSON_SCHEMA / BATCH_GRADER_JSON_SCHEMA
+    assert parse_grading_response('{"explanation": "a", "criteria_met": true}') == {
+        "explanation": "a",
+        "criteria_met": True,
+    }
+    assert parse_grading_response('{"explanation": "a"}') is None
+    grades = parse_batch_grading_response(
+        '{"grades": [{"rubric_item": 2, "explanation": "b", "criteria_met": true}]}', 2
+    )
+    assert grades == [None, {"explanation": "b", "criteria_met": True}]
+
+
+def test_prefix_cache_layout_shares_prefix_across_rubric_items():
+    prompts = [
+        format_grader_prompt("user: hi", rubric_item, layout="prefix_cache")
+        for rubric_item in ("[5] is polite", "[-2] is rude")
+    ]
+    static_end = GRADER_TEMPLATE.index("# Final instruction")
+    assert prompts[0].startswith(GRADER_TEMPLATE[: GRADER_TEMPLATE.index("# Conv")])
+    shared = prompts[0][: prompts[0].index("# Rubric item")]
+    assert prompts[1].startswith(shared) and "user: hi" in shared
+    assert prompts[0].endswith(GRADER_TEMPLATE[static_end:])
+
+
+def test_token_usage_totals_cached_token_rate():
+    totals = TokenUsageTotals()
+    for cached_tokens in (0, 60):
+        totals.add(
+            "grader",
+            SimpleNamespace(
+                prompt_tokens=100,
+                prompt_tokens_details=SimpleNamespace(cached_tokens=cached_tokens),
+                completion_tokens=10,
+                completion_tokens_details=SimpleNamespace(reasoning_tokens=0),
+                total_tokens=110,
+            ),
+        )
+    totals.add("policy", None)
+    assert totals.metrics() == {
+        "grader_input_tokens": 200,
+        "grader_input_cached_tokens": 60,
+        "grader_cached_token_rate": 0.3,
+    }
+
+
+def test_run_counters_are_reported_without_requests():
+    # e.g. a run resumed entirely from its checkpoint
+    assert TokenUsageTotals(("policy",)).metrics() == {
+        "policy_input_tokens": 0,
+        "policy_input_cached_tokens": 0,
+        "policy_cached_token_rate": 0.0,
+    }
+    assert GraderRetryStats().metrics() == {
+        "grader_retries_hist:0": 0,
+        "grader_ungraded_items": 0,
+    }
+
+
 if __name__ == "__main__":
     test_calculate_score()
+    test_parse_batch_grading_response()
+    test_prefix_cache_layout_shares_prefix_across_rubric_items()
+    test_token_usage_totals_cached_token_rate()
+
+
+class ScriptedGrader(SamplerBase):
+    """
+    Answers with the next scripted response and records the options it was called
+    with.
+    """
+
+    def __init__(self, responses: list[str], options: dict | None = None, calls=None):
+        self.responses = responses
+        self.options = options or {}
+        self.calls = [] if calls is None else calls
+
+    def with_options(self, **options) -> "ScriptedGrader":
+        return ScriptedGrader(self.responses, options, self.calls)
+
+    def __call__(self, message_list):
+        self.calls.append(self.options)
+        return SamplerResponse(
+            response_text=self.responses[len(self.calls) - 1],
+            response_metadata={"usage": None},
+            actual_queried_message_list=message_list,
+        )
+
+
+def test_grader_retry_policy_escalates_then_gives_up():
+    verdict = '{"explanation": "ok", "criteria_met": true}'
+    grader = ScriptedGrader(["oops", "still not json", verdict])
+    _, grade, retries = request_grade(
+        grader, [], GraderRetryPolicy(max_retries=2), TokenUsageTotals()
+    )
+    assert grade == {"explanation": "ok", "criteria_met": True} and retries == 2
+    assert grader.calls == [
+        {},
+        {"temperature": 0.0},
+        {"temperature": 0.0, "json_mode": True},
+    ]
+
+    grader = ScriptedGrader(["oops"] * 3)
+    _, grade, retries = request_grade(
+        grader, [], GraderRetryPolicy(max_retries=1), TokenUsageTotals()
+    )
+    assert grade is None and retries == 1 and len(grader.calls) == 2
+
+    stats = GraderRetryStats()
+    for retries, ungraded in ((0, False), (0, False), (2, False), (1, True)):
+        stats.add(retries, ungraded)
+    assert stats.metrics() == {
+        "grader_retries_hist:0": 2,
+        "grader_retries_hist:1": 1,
+        "grader_retries_hist:2": 1,
+        "grader_ungraded_items": 1,
+    }
+
+
+def test_completions_from_allresults_keys_repeats(tmp_path):
+    prompt = [{"role": "user", "content": "hi"}]
+    example_level_metadata = [
+        {
+            "prompt_id": prompt_id,
+            "prompt": prompt,
+            "completion": [{"role": "assistant", "content": text}],
+            "usage": None,
+            "rubric_items": [],
+        }
+        for prompt_id, text in (("a", "first"), ("b", "other"), ("a", "second"))
+    ]
+    path = tmp_path / "run_allresults.json"
+    common.write_eval_result_json(
+        str(path),
+        EvalResult(
+            score=0.5,
+            metrics={},
+            htmls=[],
+            convos=[],
+            metadata={"example_level_metadata": example_level_metadata},
+        ),
+    )
+    completions = completions_from_allresults(str(path))
+    assert list(completions) == ["a:0", "b:0", "a:1"]
+    assert completions["a:1"] == {
+        "prompt_id": "a",
+        "completion_id": completion_id("a", "second"),
+        "prompt_messages": prompt,
+        "response_text": "second",
+        "usage": None,
+        "response_metadata": {},
+    }
+
+
+def test_work_items_share_their_example():
+    example = {"prompt_id": "a", "prompt": [{"role": "user", "content": "hi"}]}
+    items = [WorkItem(example, completion) for completion in ("one", "two")]
+    assert [item["completion_to_trial"] for item in items] == ["one", "two"]
+    assert items[0]["prompt"] is items[1]["prompt"] is example["prompt"]
+    assert WorkItem(example)["completion_to_trial"] is None
+
+
+def test_examples_without_rubric_items_are_rejected(tmp_path, monkeypatch):
+    monkeypatch.setattr(dataset, "DEFAULT_CACHE_DIR", tmp_path / "cache")
+    path = tmp_path / "examples.jsonl"
+    rubric = {"criterion": "says hi", "points": 1, "tags": []}
+    rows = [
+        {"prompt_id": "a", "prompt": [], "rubrics": [rubric], "example_tags": []},
+        {"prompt_id": "b", "prompt": [], "rubrics": [], "example_tags": []},
+    ]
+    path.write_text("".join(json.dumps(row) + "\n" for row in rows))
+    # an example with nothing to grade would never finish grading
+    with pytest.raises(ValueError, match="Example b has no rubric items"):
+        HealthBenchEval(grader_model=None, input_path=path)
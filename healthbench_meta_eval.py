@@ -6,16 +6,43 @@ To run, use the following command (working directory should contain simple-evals
 `python -m simple-evals.simple_evals  --eval=healthbench_meta --model=gpt-4.1`
 """
 
+import asyncio
+import hashlib
 import json
 import random
 from collections import defaultdict
 from typing import Literal
 from pathlib import Path
-import blobfile as bf
+from tqdm.asyncio import tqdm_asyncio
 
 from . import common
-from .healthbench_eval import GRADER_TEMPLATE, parse_json_to_dict
-from .types_eval import Eval, EvalResult, SamplerBase, SingleEvalResult
+from .checkpoint import EvalCheckpoint, slim_result, work_item_keys
+from .dataset import JsonlDataset
+from .grader_cache import GraderCache
+from .healthbench_eval import (
+    BATCH_GRADER_JSON_SCHEMA,
+    GRADER_JSON_SCHEMA,
+    GRADER_PROMPT_LAYOUTS,
+    GraderRetryPolicy,
+    GraderRetryStats,
+    TokenUsageTotals,
+    arequest_grade,
+    format_batch_grader_prompt,
+    format_conversation,
+    format_grader_prompt,
+    parse_batch_grading_response,
+    parse_json_to_dict,
+    request_grade,
+    ungraded_grade,
+)
+from .types_eval import (
+    Eval,
+    EvalResult,
+    MessageList,
+    SamplerBase,
+    SamplerResponse,
+    SingleEvalResult,
+)
 
 INPUT_PATH = (
     Path("simple-evals") / Path("Data") / "2025-05-07-06-14-12_oss_meta_eval.jsonl"
@@ -39,18 +66,64 @@ class HealthBenchMetaEval(Eval):
         num_examples: int | None = None,
         n_threads: int = 120,
         n_repeats: int = 1,
+        # If set, grader responses are read from and written to this persistent cache.
+        grader_cache: GraderCache | None = None,
+        n_bootstrap: int = common.DEFAULT_N_BOOTSTRAP,
+        # If set, also report percentile bootstrap confidence intervals at this level.
+        bootstrap_ci_level: float | None = None,
+        # "batched" grades the rubric items of one conversation together, so that its
+        # agreement with physicians can be compared to single-item grading.
+        grading_mode: Literal["single", "batched"] = "single",
+        # Rubric items per grader request in batched mode; None packs all of them.
+        grading_batch_size: int | None = None,
+        # "prefix_cache" puts the static grader instructions before the conversation
+        # and the rubric item, so that grader prompts share a cacheable prefix.
+        grader_prompt_layout: Literal["default", "prefix_cache"] = "default",
+        # How grader responses without a valid verdict are retried; rows that stay
+        # ungraded are left out of the agreement metrics.
+        grader_retry_policy: GraderRetryPolicy | None = None,
+        # If True, the grader is asked for JSON following GRADER_JSON_SCHEMA (or
+        # BATCH_GRADER_JSON_SCHEMA) through its structured output support.
+        structured_output: bool = False,
+        # If False, no per-example HTML is rendered (e.g. for runs without a report).
+        render_html: bool = True,
+        # If set, examples are read from this JSONL file (e.g. synthetic examples
+        # for benchmarks) instead of the HealthBench meta-eval dataset.
+        input_path: str | Path | None = None,
     ):
-        with bf.BlobFile(INPUT_PATH, "rb") as f:
-            examples = [json.loads(line) for line in f]
-        print(f"Loaded {len(examples)} examples from {INPUT_PATH}")
+        assert grading_mode in ("single", "batched"), f"Invalid {grading_mode =}"
+        assert (
+            grader_prompt_layout in GRADER_PROMPT_LAYOUTS
+        ), f"Invalid {grader_prompt_layout =}"
+        if input_path is None:
+            input_path = INPUT_PATH
+        dataset = JsonlDataset(input_path)
+        print(f"Loaded {len(dataset)} examples from {input_path}")
 
         rng = random.Random(0)
 
-        if num_examples is not None and len(examples) > num_examples:
-            examples = rng.sample(examples, num_examples)
+        # Only the sampled rows are parsed; see HealthBenchEval.
+        if num_examples is not None and len(dataset) > num_examples:
+            examples = dataset.rows(rng.sample(range(len(dataset)), num_examples))
+        else:
+            examples = list(dataset)
 
         self.examples = examples * n_repeats
         self.n_threads = n_threads
+        self.grader_cache = grader_cache
+        self.n_bootstrap = n_bootstrap
+        self.bootstrap_ci_level = bootstrap_ci_level
+        self.grading_mode = grading_mode
+        self.grading_batch_size = grading_batch_size
+        self.grader_prompt_layout = grader_prompt_layout
+        self.grader_retry_policy = grader_retry_policy or GraderRetryPolicy()
+        self.structured_output = structured_output
+        self.render_html = render_html
+        self.usage_totals = TokenUsageTotals(("grader",))
+        self.retry_stats = GraderRetryStats()
+        # If set, finished results are streamed here and already finished work items
+        # are skipped, so that an interrupted run can be resumed.
+        self.checkpoint: EvalCheckpoint | None = None
 
     def grade_sample(
         self,
@@ -63,9 +136,13 @@ class HealthBenchMetaEval(Eval):
             "percent_physician_pos": sum(physician_labels) / len(physician_labels),
         }
 
-        grader_label = grading_response_dict["criteria_met"]
-        assert grader_label is True or grader_label is False
-        metrics["model_predicted_positive"] = grader_label
+        if grading_response_dict.get("grading_status") == "ungraded":
+            # no verdict to compare with the physicians
+            grader_label = None
+        else:
+            grader_label = grading_response_dict["criteria_met"]
+            assert grader_label is True or grader_label is False
+            metrics["model_predicted_positive"] = grader_label
         explanation = grading_response_dict.get(
             "explanation", "No explanation provided"
         )
@@ -74,65 +151,347 @@ class HealthBenchMetaEval(Eval):
         metrics = {**metrics, **category_metrics}
         return metrics, grader_label, explanation
 
-    def __call__(self, sampler: SamplerBase) -> EvalResult:
-        def fn(row: dict) -> tuple[SingleEvalResult, bool | None]:
-            convo_with_response = row["prompt"] + [
-                dict(content=row["completion"], role="assistant")
-            ]
-            prompt_str = "\n\n".join(
-                [f"{m['role']}: {m['content']}" for m in convo_with_response]
+    def _grader(self, sampler: SamplerBase, json_schema: dict) -> SamplerBase:
+        # Responses are cached under the plain grader, since a structured response
+        # carries the same verdict.
+        if not self.structured_output:
+            return sampler
+        return sampler.with_options(json_schema=json_schema)
+
+    def _grader_convo(self, row: dict) -> MessageList:
+        convo_with_response = row["prompt"] + [
+            dict(content=row["completion"], role="assistant")
+        ]
+        grader_prompt = format_grader_prompt(
+            format_conversation(convo_with_response),
+            row["rubric"],
+            self.grader_prompt_layout,
+        )
+        return [dict(content=grader_prompt, role="user")]
+
+    def _batch_grader_convo(self, rows: list[dict]) -> MessageList:
+        # all rows share the same prompt and completion
+        convo_with_response = rows[0]["prompt"] + [
+            dict(content=rows[0]["completion"], role="assistant")
+        ]
+        grader_prompt = format_batch_grader_prompt(
+            format_conversation(convo_with_response),
+            [row["rubric"] for row in rows],
+            self.grader_prompt_layout,
+        )
+        return [dict(content=grader_prompt, role="user")]
+
+    def _grading_units(self, keys: list[str], completed: dict) -> list[list[int]]:
+        """
+        Group the rows that still need grading into grader requests. In batched mode
+        the rubric items of one conversation (and repeat) share a request.
+        """
+        pending = [idx for idx, key in enumerate(keys) if key not in completed]
+        if self.grading_mode == "single":
+            return [[idx] for idx in pending]
+        by_convo = defaultdict(list)
+        for idx in pending:
+            row = self.examples[idx]
+            repeat = keys[idx].rsplit(":", 1)[1]
+            by_convo[json.dumps([row["prompt"], row["completion"], repeat])].append(idx)
+        units = []
+        for idxs in by_convo.values():
+            batch_size = self.grading_batch_size or len(idxs)
+            units.extend(
+                idxs[start : start + batch_size]
+                for start in range(0, len(idxs), batch_size)
             )
-            grader_prompt = GRADER_TEMPLATE.replace("<<conversation>>", prompt_str)
-            grader_prompt = grader_prompt.replace("<<rubric_item>>", row["rubric"])
-            grader_convo = [dict(content=grader_prompt, role="user")]
-
-            while True:
-                sampler_response = sampler(grader_convo)
-                response_text = sampler_response.response_text
-                actual_queried_grader_convo = (
-                    sampler_response.actual_queried_message_list
-                )
-                grading_response_dict = parse_json_to_dict(response_text)
-                if "criteria_met" in grading_response_dict:
-                    label = grading_response_dict["criteria_met"]
-                    if label is True or label is False:
-                        break
-                print("Grading failed due to bad JSON output, retrying...")
-
-            metrics, grader_label, explanation = self.grade_sample(
-                grading_response_dict=grading_response_dict,
-                physician_labels=row["binary_labels"],
-                category=row["category"],
+        return units
+
+    def _get_cached_response(
+        self, sampler: SamplerBase, grader_convo: MessageList
+    ) -> tuple[SamplerResponse, dict] | None:
+        if self.grader_cache is None:
+            return None
+        sampler_response = self.grader_cache.get(
+            self.grader_cache.make_key(sampler, grader_convo)
+        )
+        if sampler_response is None:
+            return None
+        grading_response_dict = parse_json_to_dict(sampler_response.response_text)
+        if grading_response_dict.get("criteria_met") not in (True, False):
+            return None
+        return sampler_response, grading_response_dict
+
+    def _get_cached_batch(
+        self, sampler: SamplerBase, grader_convo: MessageList, n_items: int
+    ) -> tuple[SamplerResponse, list[dict | None]] | None:
+        if self.grader_cache is None:
+            return None
+        sampler_response = self.grader_cache.get(
+            self.grader_cache.make_key(sampler, grader_convo)
+        )
+        if sampler_response is None:
+            return None
+        return sampler_response, parse_batch_grading_response(
+            sampler_response.response_text, n_items
+        )
+
+    def _put_cached_response(
+        self,
+        sampler: SamplerBase,
+        grader_convo: MessageList,
+        sampler_response: SamplerResponse,
+    ):
+        if self.grader_cache is not None:
+            self.grader_cache.put(
+                self.grader_cache.make_key(sampler, grader_convo), sampler_response
             )
-            score = metrics["model_predicted_positive"]
 
-            # Create HTML for each sample result
-            html = common.jinja_env.from_string(HEALTHBENCH_META_HTML_JINJA).render(
+    def _build_result(
+        self,
+        row: dict,
+        sampler_response: SamplerResponse,
+        grading_response_dict: dict,
+        grading_mode: str = "single",
+        retries: int = 0,
+    ) -> tuple[SingleEvalResult, bool | None]:
+        ungraded = grading_response_dict.get("grading_status") == "ungraded"
+        self.retry_stats.add(retries, ungraded)
+        response_text = sampler_response.response_text
+        actual_queried_grader_convo = sampler_response.actual_queried_message_list
+        metrics, grader_label, explanation = self.grade_sample(
+            grading_response_dict=grading_response_dict,
+            physician_labels=row["binary_labels"],
+            category=row["category"],
+        )
+        score = metrics.get("model_predicted_positive")
+        if self.grading_mode == "batched":
+            # fraction of rows whose label came from a batched response
+            metrics["graded_in_batch"] = grading_mode == "batched"
+
+        # Create HTML for each sample result
+        html = None
+        if self.render_html:
+            html = common.render_template(
+                HEALTHBENCH_META_HTML_JINJA,
                 prompt_messages=actual_queried_grader_convo,
                 next_message=dict(content=response_text, role="assistant"),
-                score=metrics["model_predicted_positive"],
+                score=score,
                 extracted_answer=response_text,
                 explanation=explanation,
             )
-            convo = actual_queried_grader_convo + [
-                dict(content=response_text, role="assistant")
+        convo = actual_queried_grader_convo + [
+            dict(content=response_text, role="assistant")
+        ]
+        return (
+            SingleEvalResult(
+                html=html,
+                score=score,
+                convo=convo,
+                metrics=metrics,
+                example_level_metadata={"grading_mode": grading_mode},
+            ),
+            grader_label,
+        )
+
+    def _work_item_keys(self) -> list[str]:
+        return work_item_keys(
+            [
+                hashlib.sha256(
+                    json.dumps(
+                        [row["prompt"], row["completion"], row["rubric"]]
+                    ).encode("utf-8")
+                ).hexdigest()
+                for row in self.examples
             ]
-            return (
-                SingleEvalResult(html=html, score=score, convo=convo, metrics=metrics),
-                grader_label,
+        )
+
+    def _load_checkpoint(self) -> dict[str, tuple[SingleEvalResult, bool | None]]:
+        if self.checkpoint is None:
+            return {}
+        return {
+            key: (result, result.metrics.get("model_predicted_positive"))
+            for key, result in self.checkpoint.load(slim=True).items()
+        }
+
+    def _checkpoint_output(
+        self, key: str, output: tuple[SingleEvalResult, bool | None]
+    ) -> tuple[SingleEvalResult, bool | None]:
+        # Once a result is on disk only its metrics are kept in memory; the rest is
+        # read back lazily when the final EvalResult is assembled.
+        if self.checkpoint is None:
+            return output
+        result, grader_label = output
+        self.checkpoint.append(key, result)
+        return slim_result(result), grader_label
+
+    def __call__(self, sampler: SamplerBase) -> EvalResult:
+        def grade(row: dict) -> tuple[SingleEvalResult, bool | None]:
+            grader_convo = self._grader_convo(row)
+            cached = self._get_cached_response(sampler, grader_convo)
+            if cached is not None:
+                return self._build_result(row, *cached)
+            sampler_response, grading_response_dict, retries = request_grade(
+                self._grader(sampler, GRADER_JSON_SCHEMA),
+                grader_convo,
+                self.grader_retry_policy,
+                self.usage_totals,
             )
+            if grading_response_dict is None:
+                return self._build_result(
+                    row, sampler_response, ungraded_grade(retries), retries=retries
+                )
+            self._put_cached_response(sampler, grader_convo, sampler_response)
+            return self._build_result(
+                row, sampler_response, grading_response_dict, retries=retries
+            )
+
+        def grade_batch(rows: list[dict]) -> list[tuple[SingleEvalResult, bool | None]]:
+            if len(rows) == 1:
+                return [grade(rows[0])]
+            grader_convo = self._batch_grader_convo(rows)
+            cached = self._get_cached_batch(sampler, grader_convo, len(rows))
+            if cached is not None:
+                sampler_response, batch_grades = cached
+            else:
+                batch_grader = self._grader(sampler, BATCH_GRADER_JSON_SCHEMA)
+                sampler_response = batch_grader(grader_convo)
+                self.usage_totals.add(
+                    "grader", sampler_response.response_metadata.get("usage")
+                )
+                batch_grades = parse_batch_grading_response(
+                    sampler_response.response_text, len(rows)
+                )
+                if all(g is not None for g in batch_grades):
+                    self._put_cached_response(sampler, grader_convo, sampler_response)
+            # rows the batched response did not grade fall back to single grading
+            return [
+                (
+                    self._build_result(row, sampler_response, g, "batched")
+                    if g is not None
+                    else grade(row)
+                )
+                for row, g in zip(rows, batch_grades)
+            ]
+
+        def fn(
+            unit: list[int],
+        ) -> list[tuple[int, tuple[SingleEvalResult, bool | None]]]:
+            outputs = grade_batch([self.examples[idx] for idx in unit])
+            return [
+                (idx, self._checkpoint_output(keys[idx], output))
+                for idx, output in zip(unit, outputs)
+            ]
 
         # Run evaluation and collect results
-        all_outputs = common.map_with_progress(fn, self.examples, self.n_threads)
+        cache_stats_before = (
+            self.grader_cache.stats() if self.grader_cache is not None else None
+        )
+        self.usage_totals = TokenUsageTotals(("grader",))
+        self.retry_stats = GraderRetryStats()
+        completed = self._load_checkpoint()
+        keys = self._work_item_keys()
+        all_outputs = [completed.get(key) for key in keys]
+        for unit_outputs in common.map_with_progress(
+            fn, self._grading_units(keys, completed), self.n_threads
+        ):
+            for idx, output in unit_outputs:
+                all_outputs[idx] = output
+        return self._aggregate(all_outputs, keys, cache_stats_before)
+
+    async def acall(self, sampler: SamplerBase) -> EvalResult:
+        cache_stats_before = (
+            self.grader_cache.stats() if self.grader_cache is not None else None
+        )
+        semaphore = asyncio.Semaphore(self.n_threads)
+
+        async def grade(row: dict) -> tuple[SingleEvalResult, bool | None]:
+            grader_convo = self._grader_convo(row)
+            cached = self._get_cached_response(sampler, grader_convo)
+            if cached is not None:
+                return self._build_result(row, *cached)
+            async with semaphore:
+                sampler_response, grading_response_dict, retries = await arequest_grade(
+                    self._grader(sampler, GRADER_JSON_SCHEMA),
+                    grader_convo,
+                    self.grader_retry_policy,
+                    self.usage_totals,
+                )
+            if grading_response_dict is None:
+                return self._build_result(
+                    row, sampler_response, ungraded_grade(retries), retries=retries
+                )
+            self._put_cached_response(sampler, grader_convo, sampler_response)
+            return self._build_result(
+                row, sampler_response, grading_response_dict, retries=retries
+            )
+
+        async def grade_batch(
+            rows: list[dict],
+        ) -> list[tuple[SingleEvalResult, bool | None]]:
+            if len(rows) == 1:
+                return [await grade(rows[0])]
+            grader_convo = self._batch_grader_convo(rows)
+            cached = self._get_cached_batch(sampler, grader_convo, len(rows))
+            if cached is not None:
+                sampler_response, batch_grades = cached
+            else:
+                async with semaphore:
+                    batch_grader = self._grader(sampler, BATCH_GRADER_JSON_SCHEMA)
+                    sampler_response = await batch_grader.acall(grader_convo)
+                    self.usage_totals.add(
+                        "grader", sampler_response.response_metadata.get("usage")
+                    )
+                batch_grades = parse_batch_grading_response(
+                    sampler_response.response_text, len(rows)
+                )
+                if all(g is not None for g in batch_grades):
+                    self._put_cached_response(sampler, grader_convo, sampler_response)
+
+            async def build(row: dict, g: dict | None):
+                if g is None:
+                    return await grade(row)
+                return self._build_result(row, sampler_response, g, "batched")
+
+            return list(
+                await asyncio.gather(
+                    *[build(row, g) for row, g in zip(rows, batch_grades)]
+                )
+            )
+
+        async def fn(
+            unit: list[int],
+        ) -> list[tuple[int, tuple[SingleEvalResult, bool | None]]]:
+            outputs = await grade_batch([self.examples[idx] for idx in unit])
+            return [
+                (idx, self._checkpoint_output(keys[idx], output))
+                for idx, output in zip(unit, outputs)
+            ]
+
+        self.usage_totals = TokenUsageTotals(("grader",))
+        self.retry_stats = GraderRetryStats()
+        completed = self._load_checkpoint()
+        keys = self._work_item_keys()
+        all_outputs = [completed.get(key) for key in keys]
+        for unit_outputs in await tqdm_asyncio.gather(
+            *[fn(unit) for unit in self._grading_units(keys, completed)]
+        ):
+            for idx, output in unit_outputs:
+                all_outputs[idx] = output
+        return self._aggregate(all_outputs, keys, cache_stats_before)
+
+    def _aggregate(
+        self,
+        all_outputs: list[tuple[SingleEvalResult, bool | None]],
+        keys: list[str],
+        cache_stats_before: dict | None = None,
+    ) -> EvalResult:
         results: list[SingleEvalResult]
         grader_labels: list[bool]
         results, grader_labels = zip(*all_outputs)
 
-        # model pairwise agreement metrics
+        # model pairwise agreement metrics, over the rows the grader gave a verdict for
+        graded = [idx for idx, label in enumerate(grader_labels) if label is not None]
         model_agreement_metrics = compute_metrics_for_rater_by_class(
-            self_pred_list=grader_labels,
-            other_preds_list=[x["binary_labels"] for x in self.examples],
-            cluster_list=[x["category"] for x in self.examples],
+            self_pred_list=[grader_labels[idx] for idx in graded],
+            other_preds_list=[self.examples[idx]["binary_labels"] for idx in graded],
+            cluster_list=[self.examples[idx]["category"] for idx in graded],
             model_or_physician="model",
         )
 
@@ -166,8 +525,14 @@ class HealthBenchMetaEval(Eval):
                 physician_agreement_metric_lists[k][physician_id] = v
 
         # consolidate final metrics and add agreement metrics
+        stats = ("mean", "n_samples", "bootstrap_std")
+        if self.bootstrap_ci_level is not None:
+            stats += ("bootstrap_ci_lower", "bootstrap_ci_upper")
         final_metrics = common.aggregate_results(
-            results, default_stats=("mean", "n_samples", "bootstrap_std")
+            results,
+            default_stats=stats,
+            n_bootstrap=self.n_bootstrap,
+            ci_level=self.bootstrap_ci_level or 0.95,
         )
         model_agreement_metrics_condensed: dict[str, float] = {
             k: v["value"]
@@ -177,11 +542,20 @@ class HealthBenchMetaEval(Eval):
         assert final_metrics.metrics is not None
         final_metrics.metrics.update(model_agreement_metrics_condensed)
         final_metrics.score = final_metrics.metrics["pairwise_model_f1_balanced"]
+        final_metrics.metrics.update(self.usage_totals.metrics())
+        final_metrics.metrics.update(self.retry_stats.metrics())
+        if self.grader_cache is not None and cache_stats_before is not None:
+            final_metrics.metrics.update(
+                self.grader_cache.run_metrics(cache_stats_before)
+            )
 
         final_metrics.metadata = {
             "model_agreement_metrics": model_agreement_metrics,
             "physician_agreement_metric_lists": physician_agreement_metric_lists,
         }
+        if self.checkpoint is not None:
+            final_metrics.htmls = self.checkpoint.field_view(keys, "html")
+            final_metrics.convos = self.checkpoint.field_view(keys, "convo")
         return final_metrics
 
 
@@ -0,0 +1,100 @@
+import asyncio
+import itertools
+import threading
+import time
+
+from concurrent.futures import ThreadPoolExecutor
+
+from .grader_cache import sampler_identity
+from .sampler import hedging
+from .sampler.client_pool import client_pool
+from .sampler.hedging import HedgedSampler
+from .types_eval import SamplerBase, SamplerResponse
+
+
+class _StragglerSampler(SamplerBase):
+    """
+    Answers in 10 ms, except that the calls whose number is in slow take 2 s.
+    """
+
+    def __init__(self, slow: set[int]):
+        self.model = "m"
+        self.slow = slow
+        self._counter = itertools.count()
+
+    def _delay(self) -> float:
+        return 2.0 if next(self._counter) in self.slow else 0.01
+
+    def __call__(self, message_list):
+        self.thread = threading.current_thread()
+        time.sleep(self._delay())
+        return SamplerResponse(
+            response_text="ok",
+            response_metadata={},
+            actual_queried_message_list=message_list,
+        )
+
+    async def acall(self, message_list):
+        await asyncio.sleep(self._delay())
+        return SamplerResponse(
+            response_text="ok",
+            response_metadata={},
+            actual_queried_message_list=message_list,
+        )
+
+
+def test_straggler_is_hedged():
+    sampler = HedgedSampler(
+        _StragglerSampler(slow={20}), hedge_budget=0.5, min_samples=20
+    )
+    for _ in range(20):
+        sampler([])
+        # calls that cannot be hedged yet run on the calling thread
+        assert sampler.sampler.thread is threading.current_thread()
+    start = time.monotonic()
+    response = sampler([])
+    assert time.monotonic() - start < 1
+    assert response.response_metadata == {"hedged": True, "hedge_won": True}
+    assert sampler.stats()["hedged"] == 1
+
+
+def test_async_straggler_is_hedged_and_budget_is_capped():
+    async def run(sampler):
+        for _ in range(20):
+            await sampler.acall([])
+        start = time.monotonic()
+        response = await sampler.acall([])
+        return response, time.monotonic() - start
+
+    response, latency = asyncio.run(
+        run(HedgedSampler(_StragglerSampler(slow={20}), hedge_budget=0.5))
+    )
+    assert latency < 1 and response.response_metadata["hedge_won"] is True
+
+    # without budget the straggler is waited for
+    response, latency = asyncio.run(
+        run(HedgedSampler(_StragglerSampler(slow={20}), hedge_budget=0.0))
+    )
+    assert latency >= 2 and "hedged" not in response.response_metadata
+
+
+def test_hedging_keeps_grader_cache_identity():
+    grader = _StragglerSampler(slow=set())
+    assert sampler_identity(HedgedSampler(grader)) == sampler_identity(grader)
+
+
+def test_hedges_of_a_full_ensemble_fan_out_start_on_time(monkeypatch):
+    monkeypatch.setattr(client_pool, "max_connections", 2)
+    monkeypatch.setattr(hedging, "_executor", None)
+    # after one warm-up call, the four concurrent primaries straggle
+    sampler = HedgedSampler(
+        _StragglerSampler(slow={1, 2, 3, 4}), hedge_budget=1.0, min_samples=1
+    )
+    sampler([])
+    # as many callers as the scheduler and the ensemble pool can have
+    with ThreadPoolExecutor(max_workers=4) as callers:
+        start = time.monotonic()
+        responses = list(callers.map(lambda _: sampler([]), range(4)))
+        latency = time.monotonic() - start
+    assert latency < 1
+    assert all(response.response_metadata["hedge_won"] for response in responses)
@@ -0,0 +1,112 @@
+import json
+import random
+import urllib.request
+
+import pytest
+
+from . import dataset
+from .benchmarks.mock_server import MockLLMServer, parse_latency
+from .benchmarks.run import (
+    SCENARIOS,
+    find_regressions,
+    run_scenario,
+    write_healthbench_dataset,
+)
+from .healthbench_eval import (
+    format_batch_grader_prompt,
+    format_grader_prompt,
+    parse_batch_grading_response,
+    parse_grading_response,
+)
+from .sampler.client_pool import client_pool
+
+
+def _request(content: str) -> dict:
+    return {"model": "mock", "messages": [{"role": "user", "content": content}]}
+
+
+def test_mock_server_answers_graders_deterministically():
+    single = _request(format_grader_prompt("user: hi", "[5] says hello"))
+    batched = _request(
+        format_batch_grader_prompt(
+            "user: hi", ["[5] a", "[2] b", "[-1] c"], "prefix_cache"
+        )
+    )
+    with MockLLMServer(seed=1) as server:
+        status, text = server.respond(single)
+        assert status == 200 and parse_grading_response(text) is not None
+        grades = parse_batch_grading_response(server.respond(batched)[1], 3)
+        assert all(grade is not None for grade in grades)
+
+        # after a reset, the same requests in the same order get the same responses
+        server.reset()
+        assert server.respond(single) == (status, text)
+        assert server.stats()["requests"] == 1
+        assert server.stats()["grader_requests"] == 1
+
+
+def test_mock_server_injects_errors_and_malformed_json():
+    grader_prompt = format_grader_prompt("user: hi", "[5] says hello")
+    with MockLLMServer(error_rate=0.2, malformed_json_rate=0.5) as server:
+        responses = [server.respond(_request(grader_prompt)) for _ in range(200)]
+    n_errors = sum(status == 500 for status, _ in responses)
+    n_malformed = sum(
+        status == 200 and parse_grading_response(text) is None
+        for status, text in responses
+    )
+    assert n_errors == server.stats()["injected_errors"] and 20 < n_errors < 60
+    assert n_malformed == server.stats()["malformed_responses"]
+    assert 50 < n_malformed < 110
+
+
+def test_mock_server_speaks_openai_and_ollama():
+    with MockLLMServer(completion_words=5) as server:
+        for path, text_of in [
+            ("/v1/chat/completions", lambda body: body["choices"][0]["message"]),
+            ("/api/chat", lambda body: body["message"]),
+        ]:
+            request = urllib.request.Request(
+                server.url + path,
+                data=json.dumps(_request("hello")).encode(),
+                headers={"Content-Type": "application/json"},
+            )
+            with urllib.request.urlopen(request) as response:
+                body = json.loads(response.read())
+            assert len(text_of(body)["content"].split()) == 5
+
+
+def test_parse_latency_and_find_regressions():
+    rng = random.Random(0)
+    assert parse_latency("constant:0.25")(rng) == 0.25
+    assert 0.1 <= parse_latency("uniform:0.1,0.2")(rng) <= 0.2
+    with pytest.raises(ValueError):
+        parse_latency("normal:1")
+
+    baseline = {
+        "a": {"examples_per_second": 100, "cpu_ms_per_example": 10, "peak_rss_mb": 100}
+    }
+    results = {
+        "a": {"examples_per_second": 70, "cpu_ms_per_example": 11, "peak_rss_mb": 100}
+    }
+    regressions = find_regressions(results, baseline, max_regression=0.2)
+    assert len(regressions) == 1 and "examples_per_second" in regressions[0]
+
+
+def test_benchmark_examples_with_few_rubric_items_are_scored(tmp_path, monkeypatch):
+    # run_scenario points the clients at the server through the environment
+    for name in ["OPENAI_BASE_URL", "OPENAI_API_KEY", "OLLAMA_HOST"]:
+        monkeypatch.setenv(name, "")
+    monkeypatch.setenv("SIMPLE_EVALS_CACHE_DIR", str(tmp_path / "cache"))
+    monkeypatch.setattr(dataset, "DEFAULT_CACHE_DIR", tmp_path / "cache")
+    monkeypatch.setattr(client_pool, "max_connections", client_pool.max_connections)
+    write_healthbench_dataset(tmp_path / "healthbench.jsonl", 30, 1)
+    with MockLLMServer() as server:
+        result = run_scenario(
+            SCENARIOS["healthbench"],
+            str(tmp_path),
+            server.url,
+            "chat_completions",
+            4,
+            10,
+        )
+    assert result["examples"] == 30 and result["score"] is not None
@@ -0,0 +1,128 @@
+import asyncio
+
+import httpx
+import ollama
+import openai
+import pytest
+
+from .benchmarks.mock_server import MockLLMServer
+from .sampler import rate_limit
+from .sampler.chat_completion_sampler import ChatCompletionSampler
+from .sampler.ollama_sampler import OllamaSampler
+from .sampler.rate_limit import (
+    MAX_TRIALS,
+    EmptyResponseError,
+    RateLimitController,
+    _parse_duration,
+    acall_with_retries,
+    call_with_retries,
+    is_retryable,
+    retry_after_seconds,
+)
+
+
+def _status_error(error_cls, status_code: int, headers: dict[str, str] | None = None):
+    response = httpx.Response(
+        status_code,
+        headers=headers,
+        request=httpx.Request("POST", "https://api.openai.com/v1/chat/completions"),
+    )
+    return error_cls("error", response=response, body=None)
+
+
+def test_retryable_and_fatal_errors():
+    assert is_retryable(_status_error(openai.RateLimitError, 429))
+    assert is_retryable(_status_error(openai.InternalServerError, 503))
+    assert not is_retryable(_status_error(openai.AuthenticationError, 401))
+    assert not is_retryable(_status_error(openai.NotFoundError, 404))
+    assert is_retryable(EmptyResponseError("OpenAI API returned empty response"))
+    # bugs fail the same way every time
+    assert not is_retryable(KeyError("choices"))
+    assert not is_retryable(ValueError("invalid literal"))
+
+
+def test_call_with_retries(monkeypatch):
+    delays = []
+    monkeypatch.setattr(
+        rate_limit, "backoff_delay", lambda trial: delays.append(trial) or 0.0
+    )
+    errors = [EmptyResponseError("empty"), EmptyResponseError("empty")]
+
+    def flaky():
+        if errors:
+            raise errors.pop()
+        return "ok"
+
+    assert call_with_retries(flaky) == "ok"
+    assert delays == [0, 1]
+
+    def broken():
+        raise KeyError("choices")
+
+    with pytest.raises(KeyError):
+        call_with_retries(broken)
+    assert delays == [0, 1]
+
+
+def test_async_call_with_retries_is_capped(monkeypatch):
+    monkeypatch.setattr(rate_limit, "backoff_delay", lambda trial: 0.0)
+    trials = []
+
+    async def empty():
+        trials.append(len(trials))
+        raise EmptyResponseError("empty")
+
+    with pytest.raises(EmptyResponseError):
+        asyncio.run(acall_with_retries(empty))
+    assert len(trials) == MAX_TRIALS
+
+
+def test_retries_are_capped(monkeypatch):
+    monkeypatch.setattr(rate_limit, "backoff_delay", lambda trial: 0.0)
+    monkeypatch.setenv("OPENAI_API_KEY", "x")
+    with MockLLMServer(error_rate=1.0, error_status=503) as server:
+        monkeypatch.setenv("OPENAI_BASE_URL", f"{server.url}/v1")
+        sampler = ChatCompletionSampler(model="capped-retries")
+        with pytest.raises(openai.InternalServerError):
+            sampler([{"role": "user", "content": "hi"}])
+        assert server.stats()["requests"] == MAX_TRIALS
+
+
+def test_parse_rate_limit_headers():
+    assert _parse_duration("6m0s") == 360
+    assert _parse_duration("20ms") == 0.02
+    assert _parse_duration("1.5") == 1.5
+    assert retry_after_seconds({"retry-after-ms": "250"}) == 0.25
+    assert retry_after_seconds({"retry-after": "3"}) == 3
+
+
+def test_aimd_concurrency_and_headers():
+    controller = RateLimitController(initial_concurrency=8, decrease_cooldown=60)
+    for _ in range(4):
+        with controller.slot():
+            controller.on_success({"x-ratelimit-limit-requests": "600"})
+    # slow start until the first rate limit error
+    assert controller.stats()["concurrency_limit"] == 12
+    assert controller.stats()["requests_per_minute"] == 600 * controller.headroom
+
+    error = _status_error(openai.RateLimitError, 429, {"retry-after": "0"})
+    assert controller.on_error(error, trial=0) >= 0
+    # a burst of 429s within the cooldown halves the limit only once
+    controller.on_error(error, trial=0)
+    assert controller.stats()["concurrency_limit"] == 6
+    controller.on_success()
+    assert controller.stats()["concurrency_limit"] == 6 + 1 / 6
+
+
+def test_ollama_retries_server_errors_with_backoff(monkeypatch):
+    delays = []
+    monkeypatch.setattr(
+        rate_limit, "backoff_delay", lambda trial: delays.append(trial) or 0.0
+    )
+    with MockLLMServer(error_rate=1.0, error_status=503) as server:
+        monkeypatch.setenv("OLLAMA_HOST", server.url)
+        sampler = OllamaSampler(model="capped-retries")
+        with pytest.raises(ollama.ResponseError):
+            sampler([{"role": "user", "content": "hi"}])
+        assert server.stats()["requests"] == MAX_TRIALS
+    assert len(delays) == MAX_TRIALS - 1
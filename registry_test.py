@@ -0,0 +1,12 @@
+import inspect
+
+from .sampler.registry import MODEL_REGISTRY
+from .types_eval import SamplerBase
+
+
+def test_registry_specs_resolve_without_building():
+    for name, spec in MODEL_REGISTRY.items():
+        sampler_class = spec.sampler_class()
+        assert issubclass(sampler_class, SamplerBase), name
+        # the kwargs must be accepted by the constructor; nothing is constructed
+        inspect.signature(sampler_class).bind(**spec.kwargs)
@@ -1,15 +1,21 @@
-import time
+import copy
 from typing import Any
 
 import openai
-from openai import OpenAI
+from openai import AsyncOpenAI
+from openai.types.chat import ChatCompletion
 from dotenv import load_dotenv
 from ..types_eval import MessageList, SamplerBase, SamplerResponse
-
-OPENAI_SYSTEM_MESSAGE_API = "You are a helpful assistant."
-OPENAI_SYSTEM_MESSAGE_CHATGPT = (
-    "You are ChatGPT, a large language model trained by OpenAI, based on the GPT-4 architecture."
-    + "\nKnowledge cutoff: 2023-12\nCurrent date: 2024-04-01"
+from .client_pool import client_pool
+from .rate_limit import (
+    EmptyResponseError,
+    acall_with_retries,
+    call_with_retries,
+    get_rate_limit_controller,
+)
+from .system_messages import (  # noqa: F401
+    OPENAI_SYSTEM_MESSAGE_API,
+    OPENAI_SYSTEM_MESSAGE_CHATGPT,
 )
 
 
@@ -27,12 +33,19 @@ class ChatCompletionSampler(SamplerBase):
     ):
         self.api_key_name = "OPENAI_API_KEY"
         load_dotenv()
-        self.client = OpenAI()
+        # shared with all other OpenAI samplers, see client_pool
+        self.client = client_pool.openai()
         # using api_key=os.environ.get("OPENAI_API_KEY")  # please set your API_KEY
         self.model = model
+        self._rate_limiter = get_rate_limit_controller(model)
         self.system_message = system_message
         self.temperature = temperature
         self.max_tokens = max_tokens
+        # e.g. {"type": "json_object"} for JSON mode, see with_options
+        self.response_format: dict[str, Any] | None = None
+        # Seconds per request, see with_options. Private so that it does not change
+        # the grader cache identity of the sampler.
+        self._request_timeout: float | None = None
         self.image_format = "url"
 
     def _handle_image(
@@ -56,42 +69,122 @@ class ChatCompletionSampler(SamplerBase):
     def _pack_message(self, role: str, content: Any):
         return {"role": str(role), "content": content}
 
+    def _get_async_client(self) -> AsyncOpenAI:
+        return client_pool.async_openai()
+
+    def with_options(
+        self,
+        *,
+        temperature: float | None = None,
+        json_mode: bool = False,
+        json_schema: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> "ChatCompletionSampler":
+        sampler = copy.copy(self)
+        if temperature is not None:
+            sampler.temperature = temperature
+        if json_schema is not None:
+            sampler.response_format = {
+                "type": "json_schema",
+                "json_schema": json_schema,
+            }
+        elif json_mode and self.response_format is None:
+            sampler.response_format = {"type": "json_object"}
+        if timeout is not None:
+            sampler._request_timeout = timeout
+        return sampler
+
+    def _create_kwargs(self, message_list: MessageList) -> dict[str, Any]:
+        kwargs: dict[str, Any] = dict(
+            model=self.model,
+            messages=message_list,
+            temperature=self.temperature,
+            max_tokens=self.max_tokens,
+        )
+        if self.response_format is not None:
+            kwargs["response_format"] = self.response_format
+        if self._request_timeout is not None:
+            kwargs["timeout"] = self._request_timeout
+        return kwargs
+
+    def _with_system_message(self, message_list: MessageList) -> MessageList:
+        if not self.system_message:
+            return message_list
+        return [self._pack_message("system", self.system_message)] + message_list
+
+    def batch_request(self, message_list: MessageList) -> tuple[str, dict[str, Any]]:
+        """
+        Batch API endpoint and body of the request __call__ would send.
+        """
+        body = self._create_kwargs(self._with_system_message(message_list))
+        body.pop("timeout", None)
+        return "/v1/chat/completions", body
+
+    def parse_batch_response(
+        self, body: dict[str, Any], message_list: MessageList
+    ) -> SamplerResponse:
+        response = ChatCompletion.model_validate(body)
+        content = response.choices[0].message.content
+        if content is None:
+            raise EmptyResponseError("OpenAI API returned empty response")
+        return SamplerResponse(
+            response_text=content,
+            response_metadata={"usage": response.usage},
+            actual_queried_message_list=self._with_system_message(message_list),
+        )
+
+    def _parse_raw_response(
+        self, raw_response: Any, message_list: MessageList
+    ) -> SamplerResponse:
+        response = raw_response.parse()
+        self._rate_limiter.on_success(raw_response.headers)
+        content = response.choices[0].message.content
+        if content is None:
+            raise EmptyResponseError("OpenAI API returned empty response; retrying")
+        return SamplerResponse(
+            response_text=content,
+            response_metadata={"usage": response.usage},
+            actual_queried_message_list=message_list,
+        )
+
+    def _bad_request_response(
+        self, e: openai.BadRequestError, message_list: MessageList
+    ) -> SamplerResponse:
+        print("Bad Request Error", e)
+        return SamplerResponse(
+            response_text="No response (bad request).",
+            response_metadata={"usage": None},
+            actual_queried_message_list=message_list,
+        )
+
     def __call__(self, message_list: MessageList) -> SamplerResponse:
-        if self.system_message:
-            message_list = [
-                self._pack_message("system", self.system_message)
-            ] + message_list
-        trial = 0
-        while True:
-            try:
-                response = self.client.chat.completions.create(
-                    model=self.model,
-                    messages=message_list,
-                    temperature=self.temperature,
-                    max_tokens=self.max_tokens,
-                )
-                content = response.choices[0].message.content
-                if content is None:
-                    raise ValueError("OpenAI API returned empty response; retrying")
-                return SamplerResponse(
-                    response_text=content,
-                    response_metadata={"usage": response.usage},
-                    actual_queried_message_list=message_list,
-                )
-            # NOTE: BadRequestError is triggered once for MMMU, please uncomment if you are reruning MMMU
-            except openai.BadRequestError as e:
-                print("Bad Request Error", e)
-                return SamplerResponse(
-                    response_text="No response (bad request).",
-                    response_metadata={"usage": None},
-                    actual_queried_message_list=message_list,
+        message_list = self._with_system_message(message_list)
+
+        def attempt() -> SamplerResponse:
+            with self._rate_limiter.slot():
+                raw_response = self.client.chat.completions.with_raw_response.create(
+                    **self._create_kwargs(message_list)
                 )
-            except Exception as e:
-                exception_backoff = 2**trial  # expontial back off
-                print(
-                    f"Rate limit exception so wait and retry {trial} after {exception_backoff} sec",
-                    e,
+            return self._parse_raw_response(raw_response, message_list)
+
+        try:
+            return call_with_retries(attempt, self._rate_limiter)
+        # NOTE: BadRequestError is triggered once for MMMU, please uncomment if you are reruning MMMU
+        except openai.BadRequestError as e:
+            return self._bad_request_response(e, message_list)
+
+    async def acall(self, message_list: MessageList) -> SamplerResponse:
+        message_list = self._with_system_message(message_list)
+        client = self._get_async_client()
+
+        async def attempt() -> SamplerResponse:
+            async with self._rate_limiter.aslot():
+                raw_response = await client.chat.completions.with_raw_response.create(
+                    **self._create_kwargs(message_list)
                 )
-                time.sleep(exception_backoff)
-                trial += 1
-            # unknown error shall throw exception
+            return self._parse_raw_response(raw_response, message_list)
+
+        try:
+            return await acall_with_retries(attempt, self._rate_limiter)
+        except openai.BadRequestError as e:
+            return self._bad_request_response(e, message_list)
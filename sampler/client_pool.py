@@ -0,0 +1,147 @@
+import asyncio
+import os
+import threading
+from typing import Any
+
+import httpx
+
+DEFAULT_MAX_CONNECTIONS = 128
+OPENAI_DEFAULT_BASE_URL = "https://api.openai.com/v1"
+OLLAMA_DEFAULT_HOST = "http://localhost:11434"
+
+
+class ClientPool:
+    """
+    Process-wide API clients, one per endpoint, shared by all samplers so that they
+    share one HTTP connection pool instead of each opening their own.
+
+    The pools allow max_connections connections per endpoint and keep all of them
+    alive between requests, so that at the configured concurrency requests do not
+    wait for a free connection or pay for a new TLS handshake. Async clients are
+    bound to the event loop that opened their connections and are pooled per loop.
+    """
+
+    def __init__(self, max_connections: int = DEFAULT_MAX_CONNECTIONS):
+        self.max_connections = max_connections
+        self._lock = threading.Lock()
+        self._clients: dict[tuple, Any] = {}
+        self._async_clients: dict[asyncio.AbstractEventLoop, dict[tuple, Any]] = {}
+        self.n_clients_created = 0
+
+    def configure(self, max_connections: int):
+        """
+        Size the pools for max_connections concurrent requests. Applies to clients
+        created afterwards, so call this before constructing samplers.
+        """
+        assert max_connections > 0, f"Invalid {max_connections =}"
+        with self._lock:
+            self.max_connections = max_connections
+
+    def _limits(self) -> httpx.Limits:
+        return httpx.Limits(
+            max_connections=self.max_connections,
+            max_keepalive_connections=self.max_connections,
+        )
+
+    def _get(self, clients: dict[tuple, Any], key: tuple, create) -> Any:
+        with self._lock:
+            if key not in clients:
+                clients[key] = create(self._limits())
+                self.n_clients_created += 1
+            return clients[key]
+
+    def _get_async(self, key: tuple, create) -> Any:
+        loop = asyncio.get_running_loop()
+        with self._lock:
+            # the clients of finished event loops can no longer be used
+            for closed in [other for other in self._async_clients if other.is_closed()]:
+                del self._async_clients[closed]
+            clients = self._async_clients.setdefault(loop, {})
+        return self._get(clients, key, create)
+
+    def openai(self):
+        import openai
+
+        # Retries are handled by the samplers, so that rate limit errors reach the
+        # rate limit controller.
+        return self._get(
+            self._clients,
+            ("openai", _openai_base_url()),
+            lambda limits: openai.OpenAI(
+                max_retries=0, http_client=openai.DefaultHttpxClient(limits=limits)
+            ),
+        )
+
+    def async_openai(self):
+        import openai
+
+        return self._get_async(
+            ("openai", _openai_base_url()),
+            lambda limits: openai.AsyncOpenAI(
+                max_retries=0,
+                http_client=openai.DefaultAsyncHttpxClient(limits=limits),
+            ),
+        )
+
+    def ollama(self, timeout: float | None = None):
+        import ollama
+
+        # the ollama clients take the timeout when they are created
+        return self._get(
+            self._clients,
+            ("ollama", _ollama_host(), timeout),
+            lambda limits: ollama.Client(timeout=timeout, limits=limits),
+        )
+
+    def async_ollama(self, timeout: float | None = None):
+        import ollama
+
+        return self._get_async(
+            ("ollama", _ollama_host(), timeout),
+            lambda limits: ollama.AsyncClient(timeout=timeout, limits=limits),
+        )
+
+    def stats(self) -> dict[str, Any]:
+        """
+        Client counts and, per endpoint, the connections currently open in its
+        pools and how many of them are idle.
+        """
+        with self._lock:
+            clients = list(self._clients.items())
+            for loop, loop_clients in self._async_clients.items():
+                if not loop.is_closed():
+                    clients.extend(loop_clients.items())
+            stats: dict[str, Any] = {
+                "max_connections": self.max_connections,
+                "clients": len(clients),
+                "clients_created": self.n_clients_created,
+                "endpoints": {},
+            }
+        for key, client in clients:
+            endpoint = stats["endpoints"].setdefault(
+                f"{key[0]}:{key[1]}", {"connections": 0, "idle_connections": 0}
+            )
+            for connection in _pool_connections(client):
+                endpoint["connections"] += 1
+                endpoint["idle_connections"] += connection.is_idle()
+        return stats
+
+
+def _openai_base_url() -> str:
+    return os.environ.get("OPENAI_BASE_URL") or OPENAI_DEFAULT_BASE_URL
+
+
+def _ollama_host() -> str:
+    return os.environ.get("OLLAMA_HOST") or OLLAMA_DEFAULT_HOST
+
+
+def _pool_connections(client: Any) -> list:
+    # The OpenAI clients keep their httpx client in _client, so do the ollama ones.
+    # httpx does not expose its connection pool publicly; report nothing rather
+    # than fail if that changes.
+    http_client = getattr(client, "_client", None)
+    pool = getattr(getattr(http_client, "_transport", None), "_pool", None)
+    return list(getattr(pool, "connections", []))
+
+
+client_pool = ClientPool()
@@ -1,9 +1,36 @@
+import asyncio
 import json
-from ..types_eval import MessageList, SamplerBase, SamplerResponse
 import re
+import threading
+import time
+from typing import Any
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from ..types_eval import MessageList, SamplerBase, SamplerResponse
+from .client_pool import client_pool
 
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
 
-def _clean_json(json_string: str) -> dict:
+
+def _get_executor() -> ThreadPoolExecutor:
+    """
+    The thread pool that runs the grader calls of every ensemble in this process.
+    It is sized like the client pools, i.e. for the configured number of concurrent
+    requests, so that ensembles do not multiply the requests in flight by the number
+    of graders.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=client_pool.max_connections,
+                thread_name_prefix="ensemble-grader",
+            )
+        return _executor
+
+
+def _clean_json(json_string: str) -> Any:
     # Strip markdown fences if present
     json_cleaned = re.sub(r"^```json\s*|\s*```$", "", json_string.strip())
     try:
@@ -15,24 +42,116 @@ def _clean_json(json_string: str) -> dict:
 class EnsembleGraderSampler(SamplerBase):
     """
     Ensemble grader that combines multiple graders using majority vote.
+
+    Batched grader responses (a JSON array of grades, or {"grades": [...]} with
+    structured output) are combined per rubric_item into a JSON array of the
+    majority verdicts.
+
+    Graders are queried concurrently, in sync mode on a thread pool shared by all
+    ensembles. With early_stop=True the ensemble returns as soon as the majority vote
+    is settled: the remaining requests are cancelled, except in sync mode for those
+    already running, which are no longer waited for.
     """
 
-    def __init__(self, graders: list[SamplerBase]):
+    def __init__(self, graders: list[SamplerBase], early_stop: bool = False):
         self.graders = graders
+        self.early_stop = early_stop
+
+    def with_options(
+        self,
+        *,
+        temperature: float | None = None,
+        json_mode: bool = False,
+        json_schema: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> "EnsembleGraderSampler":
+        return EnsembleGraderSampler(
+            [
+                grader.with_options(
+                    temperature=temperature,
+                    json_mode=json_mode,
+                    json_schema=json_schema,
+                    timeout=timeout,
+                )
+                for grader in self.graders
+            ],
+            early_stop=self.early_stop,
+        )
+
+    def _is_settled(self, votes: list[bool], n_answered: int) -> bool:
+        n_true = sum(votes)
+        n_remaining = len(self.graders) - n_answered
+        return n_true > len(self.graders) / 2 or (
+            n_true + n_remaining <= len(self.graders) / 2
+        )
+
+    def _all_settled(self, responses: list[Any]) -> bool:
+        if not any(_item_grades(r) is not None for r in responses):
+            votes = [r.get("criteria_met", False) for r in responses]
+            return self._is_settled(votes, len(responses))
+        return all(
+            self._is_settled([vote for vote, _ in item], len(responses))
+            for item in _votes_by_item(responses).values()
+        )
 
     def __call__(self, message_list: MessageList) -> SamplerResponse:
-        responses = []
-        for grader in self.graders:
-            resp = grader(message_list)
-            try:
-                parsed = _clean_json(resp.response_text)
-            except Exception:
-                parsed = {"criteria_met": False, "explanation": "Parse error"}
-            responses.append(parsed)
-
-        # Majority vote
+        parsed: dict[int, Any] = {}
+        latencies: list[float | None] = [None] * len(self.graders)
+        executor = _get_executor()
+        futures = {
+            executor.submit(_timed, grader, message_list): i
+            for i, grader in enumerate(self.graders)
+        }
+        try:
+            for future in as_completed(futures):
+                i = futures[future]
+                resp, latencies[i] = future.result()
+                parsed[i] = _parse(resp)
+                if self.early_stop and self._all_settled(list(parsed.values())):
+                    break
+        finally:
+            for future in futures:
+                future.cancel()
+        return self._combine(message_list, parsed, latencies)
+
+    async def acall(self, message_list: MessageList) -> SamplerResponse:
+        parsed: dict[int, Any] = {}
+        latencies: list[float | None] = [None] * len(self.graders)
+
+        async def query(i: int, grader: SamplerBase):
+            start = time.monotonic()
+            resp = await grader.acall(message_list)
+            latencies[i] = time.monotonic() - start
+            parsed[i] = _parse(resp)
+
+        tasks = [
+            asyncio.create_task(query(i, grader))
+            for i, grader in enumerate(self.graders)
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                await next_done
+                if self.early_stop and self._all_settled(list(parsed.values())):
+                    break
+        finally:
+            for task in tasks:
+                task.cancel()
+        return self._combine(message_list, parsed, latencies)
+
+    def _combine(
+        self,
+        message_list: MessageList,
+        parsed: dict[int, Any],
+        latencies: list[float | None],
+    ) -> SamplerResponse:
+        # Only graders that answered are listed, in grader order. The vote is over
+        # the full ensemble, which gives the same result once the vote is settled.
+        answered = sorted(parsed)
+        responses = [parsed[i] for i in answered]
+        if any(_item_grades(r) is not None for r in responses):
+            return self._combine_batch(message_list, parsed, latencies)
         votes = [r.get("criteria_met", False) for r in responses]
-        majority = sum(votes) > len(votes) / 2
+        majority = sum(votes) > len(self.graders) / 2
 
         # Gather explanations
         explanations = [r.get("explanation", "") for r in responses]
@@ -48,8 +167,91 @@ class EnsembleGraderSampler(SamplerBase):
         return SamplerResponse(
             response_text=json.dumps(result_json),
             response_metadata={
-                "votes": votes,  # list of True/False per grader
+                "votes": votes,  # list of True/False per answering grader
                 "raw_responses": responses,  # parsed dicts from graders
+                "grader_latencies": latencies,  # seconds per grader, None if skipped
+                "skipped_graders": [
+                    i for i in range(len(self.graders)) if i not in parsed
+                ],
             },
             actual_queried_message_list=message_list,
         )
+
+    def _combine_batch(
+        self,
+        message_list: MessageList,
+        parsed: dict[int, Any],
+        latencies: list[float | None],
+    ) -> SamplerResponse:
+        # Responses that are not a batch of grades (e.g. parse errors) and items a
+        # grader left out count as not met. Items no grader graded are left out.
+        responses = [parsed[i] for i in sorted(parsed)]
+        grades = []
+        for number, item in sorted(_votes_by_item(responses).items()):
+            votes = [vote for vote, _ in item]
+            grades.append(
+                {
+                    "rubric_item": number,
+                    "explanation": " | ".join(explanation for _, explanation in item),
+                    "criteria_met": sum(votes) > len(self.graders) / 2,
+                    "ensemble_votes": votes,
+                }
+            )
+        return SamplerResponse(
+            response_text=json.dumps(grades),
+            response_metadata={
+                "votes": {
+                    grade["rubric_item"]: grade["ensemble_votes"] for grade in grades
+                },
+                "raw_responses": responses,
+                "grader_latencies": latencies,
+                "skipped_graders": [
+                    i for i in range(len(self.graders)) if i not in parsed
+                ],
+            },
+            actual_queried_message_list=message_list,
+        )
+
+
+def _item_grades(response: Any) -> list | None:
+    """
+    The grades of a batched grader response, or None for a single verdict.
+    """
+    if isinstance(response, dict) and isinstance(response.get("grades"), list):
+        return response["grades"]
+    return response if isinstance(response, list) else None
+
+
+def _votes_by_item(responses: list[Any]) -> dict[int, list[tuple[bool, str]]]:
+    """
+    (criteria_met, explanation) of every grader that graded a rubric item, by the
+    number of the item. Numbering follows parse_batch_grading_response.
+    """
+    votes: dict[int, list[tuple[bool, str]]] = {}
+    for response in responses:
+        for position, entry in enumerate(_item_grades(response) or []):
+            if not isinstance(entry, dict):
+                continue
+            number = entry.get("rubric_item", position + 1)
+            if isinstance(number, int):
+                votes.setdefault(number, []).append(
+                    (entry.get("criteria_met") is True, entry.get("explanation", ""))
+                )
+    return votes
+
+
+def _timed(grader: SamplerBase, message_list: MessageList):
+    start = time.monotonic()
+    resp = grader(message_list)
+    return resp, time.monotonic() - start
+
+
+def _parse(resp: SamplerResponse) -> Any:
+    try:
+        parsed = _clean_json(resp.response_text)
+    except Exception:
+        parsed = None
+    # a verdict, or a list of them (see _item_grades)
+    if isinstance(parsed, (dict, list)):
+        return parsed
+    return {"criteria_met": False, "explanation": "Parse error"}
@@ -0,0 +1,236 @@
+import asyncio
+import copy
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from typing import Any
+
+import numpy as np
+
+from ..types_eval import MessageList, SamplerBase, SamplerResponse
+from .client_pool import client_pool
+
+_executor: ThreadPoolExecutor | None = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """
+    The thread pool that runs the hedgeable sync calls of every HedgedSampler in this
+    process, policy and grader alike.
+
+    Attempts must never wait for a worker, or hedges would start late. Hedged calls
+    come from the scheduler threads and from the ensemble grader pool, each at most
+    client_pool.max_connections, and every call needs up to two workers (the primary
+    and the hedge). The pool is sized for all of them; its workers are only started
+    when needed.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=4 * client_pool.max_connections,
+                thread_name_prefix="hedged-sampler",
+            )
+        return _executor
+
+
+class _HedgeStats:
+    """
+    Latencies of recent calls and hedging counters, shared by a HedgedSampler and
+    the variants with_options derives from it.
+    """
+
+    def __init__(self, window: int):
+        self.lock = threading.Lock()
+        self.latencies: deque[float] = deque(maxlen=window)
+        self.n_calls = 0
+        self.n_hedged = 0
+        self.n_hedge_wins = 0
+
+
+class HedgedSampler(SamplerBase):
+    """
+    Hedges slow requests of a sampler to cut tail latency.
+
+    Once a call has been running for longer than the hedge_percentile of the recently
+    observed latencies, a duplicate request is sent and whichever response arrives
+    first is returned. Hedging starts after min_samples calls have completed, and at
+    most hedge_budget of all calls are hedged so that a slow backend is not flooded
+    with duplicates. In async mode the losing request is cancelled; in sync mode it
+    is no longer waited for.
+
+    Sync calls that cannot be hedged (too few latencies yet, or no budget left) run
+    on the calling thread. The others run on a thread pool shared by all hedged
+    samplers, so that the caller can stop waiting for the primary request.
+    """
+
+    def __init__(
+        self,
+        sampler: SamplerBase,
+        hedge_percentile: float = 95.0,
+        hedge_budget: float = 0.05,
+        min_samples: int = 20,
+        window: int = 1000,
+    ):
+        assert 0 < hedge_percentile < 100, f"Invalid {hedge_percentile =}"
+        assert 0 <= hedge_budget <= 1, f"Invalid {hedge_budget =}"
+        self.sampler = sampler
+        self.hedge_percentile = hedge_percentile
+        self.hedge_budget = hedge_budget
+        self.min_samples = min_samples
+        self._stats = _HedgeStats(window)
+
+    def with_options(
+        self,
+        *,
+        temperature: float | None = None,
+        json_mode: bool = False,
+        json_schema: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> "HedgedSampler":
+        # the variant shares the latency window and the hedging budget
+        sampler = copy.copy(self)
+        sampler.sampler = self.sampler.with_options(
+            temperature=temperature,
+            json_mode=json_mode,
+            json_schema=json_schema,
+            timeout=timeout,
+        )
+        return sampler
+
+    def hedge_delay(self) -> float | None:
+        """
+        How long a call may run before it is hedged, or None if it may not be
+        hedged: too few latencies observed yet, or the budget is used up.
+        """
+        with self._stats.lock:
+            if len(self._stats.latencies) < self.min_samples:
+                return None
+            if self._stats.n_hedged >= self.hedge_budget * self._stats.n_calls:
+                return None
+            return float(np.percentile(self._stats.latencies, self.hedge_percentile))
+
+    def _start_call(self) -> float | None:
+        with self._stats.lock:
+            self._stats.n_calls += 1
+        return self.hedge_delay()
+
+    def _take_hedge(self) -> bool:
+        # checked again when the hedge is due, since other calls may have used
+        # the budget in the meantime
+        with self._stats.lock:
+            if self._stats.n_hedged >= self.hedge_budget * self._stats.n_calls:
+                return False
+            self._stats.n_hedged += 1
+            return True
+
+    def _record(self, latency: float, hedge_won: bool = False):
+        with self._stats.lock:
+            self._stats.latencies.append(latency)
+            self._stats.n_hedge_wins += hedge_won
+
+    def _attempt(self, message_list: MessageList) -> tuple[SamplerResponse, float]:
+        start = time.monotonic()
+        response = self.sampler(message_list)
+        return response, time.monotonic() - start
+
+    async def _aattempt(
+        self, message_list: MessageList
+    ) -> tuple[SamplerResponse, float]:
+        start = time.monotonic()
+        response = await self.sampler.acall(message_list)
+        return response, time.monotonic() - start
+
+    def __call__(self, message_list: MessageList) -> SamplerResponse:
+        delay = self._start_call()
+        if delay is None:
+            return self._finish(self._attempt(message_list))
+        executor = _get_executor()
+        primary = executor.submit(self._attempt, message_list)
+        try:
+            return self._finish(primary.result(timeout=delay))
+        except TimeoutError:
+            pass
+        if not self._take_hedge():
+            return self._finish(primary.result())
+        hedge = executor.submit(self._attempt, message_list)
+        attempts: dict[Future, bool] = {primary: False, hedge: True}
+        error: BaseException | None = None
+        # the first attempt that succeeds wins; an error only counts if both fail
+        for future in as_completed(attempts):
+            try:
+                result = future.result()
+            except Exception as e:
+                error = e
+                continue
+            for other in attempts:
+                other.cancel()
+            return self._finish(result, hedged=True, hedge_won=attempts[future])
+        assert error is not None
+        raise error
+
+    async def acall(self, message_list: MessageList) -> SamplerResponse:
+        delay = self._start_call()
+        primary = asyncio.create_task(self._aattempt(message_list))
+        if delay is None:
+            return self._finish(await primary)
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if done or not self._take_hedge():
+            return self._finish(await primary)
+        hedge = asyncio.create_task(self._aattempt(message_list))
+        attempts = {primary: False, hedge: True}
+        error: BaseException | None = None
+        try:
+            pending = set(attempts)
+            while pending:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    if task.exception() is not None:
+                        error = task.exception()
+                        continue
+                    return self._finish(
+                        task.result(), hedged=True, hedge_won=attempts[task]
+                    )
+        finally:
+            for task in attempts:
+                task.cancel()
+        assert error is not None
+        raise error
+
+    def _finish(
+        self,
+        result: tuple[SamplerResponse, float],
+        hedged: bool = False,
+        hedge_won: bool = False,
+    ) -> SamplerResponse:
+        response, latency = result
+        self._record(latency, hedge_won)
+        if hedged:
+            response.response_metadata = {
+                **response.response_metadata,
+                "hedged": True,
+                "hedge_won": hedge_won,
+            }
+        return response
+
+    def stats(self) -> dict[str, float | int | None]:
+        with self._stats.lock:
+            latencies = list(self._stats.latencies)
+            n_calls = self._stats.n_calls
+            n_hedged = self._stats.n_hedged
+            n_hedge_wins = self._stats.n_hedge_wins
+        return {
+            "calls": n_calls,
+            "hedged": n_hedged,
+            "hedge_wins": n_hedge_wins,
+            "hedge_rate": n_hedged / n_calls if n_calls else 0.0,
+            "hedge_delay": (
+                float(np.percentile(latencies, self.hedge_percentile))
+                if len(latencies) >= self.min_samples
+                else None
+            ),
+        }
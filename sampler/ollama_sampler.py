@@ -1,9 +1,17 @@
-import time
+import copy
 from typing import Any
 import re
+import httpx
 import ollama
 from dotenv import load_dotenv
 from ..types_eval import MessageList, SamplerBase, SamplerResponse
+from .client_pool import client_pool
+from .rate_limit import (
+    RETRYABLE_STATUS_CODES,
+    EmptyResponseError,
+    acall_with_retries,
+    call_with_retries,
+)
 
 OLLAMA_SYSTEM_MESSAGE_DEFAULT = "You are a helpful assistant."
 
@@ -25,7 +33,12 @@ class OllamaSampler(SamplerBase):
         self.system_message = system_message or OLLAMA_SYSTEM_MESSAGE_DEFAULT
         self.temperature = temperature
         self.max_tokens = max_tokens
-        self.client = ollama.Client()
+        # "json" or a JSON schema to constrain the output, see with_options. Private
+        # so that it does not change the grader cache identity of the sampler.
+        self._format: str | dict[str, Any] | None = None
+        self._timeout: float | None = None
+        # shared with all other Ollama samplers with the same timeout, see client_pool
+        self.client = client_pool.ollama()
 
     def _handle_text(self, text: str):
         return {"type": "text", "text": text}
@@ -33,42 +46,85 @@ class OllamaSampler(SamplerBase):
     def _pack_message(self, role: str, content: Any):
         return {"role": str(role), "content": content}
 
+    def _get_async_client(self) -> ollama.AsyncClient:
+        return client_pool.async_ollama(self._timeout)
+
+    def with_options(
+        self,
+        *,
+        temperature: float | None = None,
+        json_mode: bool = False,
+        json_schema: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> "OllamaSampler":
+        sampler = copy.copy(self)
+        if temperature is not None:
+            sampler.temperature = temperature
+        if json_schema is not None:
+            sampler._format = json_schema["schema"]
+        elif json_mode and self._format is None:
+            sampler._format = "json"
+        if timeout is not None:
+            sampler._timeout = timeout
+            sampler.client = client_pool.ollama(timeout)
+        return sampler
+
     def _clean_think_tags(self, text: str) -> str:
         # Remove everything between <think> and </think>, including the tags themselves
         return re.sub(r"<think>.*?</think>", "", text, flags=re.DOTALL).strip()
 
+    def _with_system_message(self, message_list: MessageList) -> MessageList:
+        if not self.system_message:
+            return message_list
+        return [self._pack_message("system", self.system_message)] + message_list
+
+    def _chat_kwargs(self, message_list: MessageList) -> dict[str, Any]:
+        return dict(
+            model=self.model,
+            messages=message_list,
+            options={
+                "temperature": self.temperature,
+                "num_predict": self.max_tokens,
+            },
+            format=self._format,
+        )
+
+    def _parse_response(
+        self, response: Any, message_list: MessageList
+    ) -> SamplerResponse:
+        content = self._clean_think_tags(response["message"]["content"])
+        if not content:
+            raise EmptyResponseError("Ollama API returned empty response; retrying")
+        return SamplerResponse(
+            response_text=content,
+            response_metadata={"usage": None},
+            actual_queried_message_list=message_list,
+        )
+
     def __call__(self, message_list: MessageList) -> SamplerResponse:
-        if self.system_message:
-            message_list = [
-                self._pack_message("system", self.system_message)
-            ] + message_list
-        trial = 0
-        MAX_RETRIES = 10
-        while trial < MAX_RETRIES:
-            try:
-                response = self.client.chat(
-                    model=self.model,
-                    messages=message_list,
-                    options={
-                        "temperature": self.temperature,
-                        "num_predict": self.max_tokens,
-                    },
-                )
-                content = response["message"]["content"]
-                content = self._clean_think_tags(content)
-
-                if not content:
-                    raise ValueError("Ollama API returned empty response; retrying")
-                return SamplerResponse(
-                    response_text=content,
-                    response_metadata={"usage": None},
-                    actual_queried_message_list=message_list,
-                )
-            except Exception as e:
-                print(
-                    f"Exception, retrying",
-                    e,
-                )
-                trial += 1
-            # unknown error shall throw exception
-        raise RuntimeError(f"Ollama failed after {MAX_RETRIES} retries")
+        message_list = self._with_system_message(message_list)
+
+        def attempt() -> SamplerResponse:
+            response = self.client.chat(**self._chat_kwargs(message_list))
+            return self._parse_response(response, message_list)
+
+        return call_with_retries(attempt, retryable=_is_retryable)
+
+    async def acall(self, message_list: MessageList) -> SamplerResponse:
+        message_list = self._with_system_message(message_list)
+        client = self._get_async_client()
+
+        async def attempt() -> SamplerResponse:
+            response = await client.chat(**self._chat_kwargs(message_list))
+            return self._parse_response(response, message_list)
+
+        return await acall_with_retries(attempt, retryable=_is_retryable)
+
+
+def _is_retryable(e: Exception) -> bool:
+    # the ollama client raises ConnectionError when the server cannot be reached
+    if isinstance(e, (ConnectionError, httpx.TransportError)):
+        return True
+    if isinstance(e, ollama.ResponseError):
+        return e.status_code in RETRYABLE_STATUS_CODES
+    return isinstance(e, EmptyResponseError)
@@ -0,0 +1,300 @@
+import asyncio
+import contextlib
+import random
+import re
+import threading
+import time
+from collections.abc import AsyncIterator, Awaitable, Callable, Iterator, Mapping
+from typing import TypeVar
+
+import openai
+
+from .telemetry import note_queue_wait, note_retry
+
+T = TypeVar("T")
+
+# Statuses worth retrying: timeouts, conflicts, rate limits and server errors. Any
+# other 4xx (authentication, permissions, unknown model, ...) will fail again.
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+MAX_BACKOFF_SECONDS = 60.0
+
+# Attempts per request, including the first one, before the last error is raised.
+MAX_TRIALS = 10
+
+
+class EmptyResponseError(ValueError):
+    """
+    Raised by the samplers when the API answered without any content.
+    """
+
+
+def is_retryable(e: Exception) -> bool:
+    if isinstance(e, (openai.APIConnectionError, openai.APITimeoutError)):
+        return True
+    if isinstance(e, openai.APIStatusError):
+        return e.status_code in RETRYABLE_STATUS_CODES
+    # Anything else (a KeyError, a TypeError, ...) is a bug that fails every time.
+    return isinstance(e, EmptyResponseError)
+
+
+def backoff_delay(trial: int, base: float = 1.0, cap: float = MAX_BACKOFF_SECONDS):
+    """
+    Exponential backoff with full jitter, so that threads that failed together do not
+    retry together.
+    """
+    return random.uniform(0, min(cap, base * 2**trial))
+
+
+def _parse_duration(value: str | None) -> float | None:
+    """
+    Parse durations as used in rate limit headers: "1.5" (seconds), "20ms", "6m0s",
+    "1h2m3.5s".
+    """
+    if not value:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        pass
+    units = {"h": 3600.0, "m": 60.0, "s": 1.0, "ms": 0.001}
+    parts = re.findall(r"(\d+(?:\.\d+)?)(ms|h|m|s)", value)
+    if not parts:
+        return None
+    return sum(float(number) * units[unit] for number, unit in parts)
+
+
+def _header_float(headers: Mapping[str, str], name: str) -> float | None:
+    try:
+        return float(headers[name])
+    except (KeyError, TypeError, ValueError):
+        return None
+
+
+def retry_after_seconds(headers: Mapping[str, str]) -> float | None:
+    retry_after_ms = _header_float(headers, "retry-after-ms")
+    if retry_after_ms is not None:
+        return retry_after_ms / 1000
+    return _parse_duration(headers.get("retry-after"))
+
+
+class RateLimitController:
+    """
+    Concurrency and request rate limiter shared by all samplers of one model.
+
+    Concurrency follows AIMD: until the first rate limit error every success raises
+    the limit by one (slow start), afterwards by 1/limit (about one more request in
+    flight per round trip). A rate limit error halves the limit, at most once per
+    cooldown so that a burst of 429s from one overload counts once.
+    Requests are also metered by a token bucket whose rate follows the
+    x-ratelimit-limit-requests header, kept a little under the provider limit. When
+    the remaining requests or tokens run out, or a retry-after is returned, every
+    caller waits until the reset instead of retrying on its own schedule.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = 256,
+        initial_concurrency: int = 16,
+        min_concurrency: int = 1,
+        requests_per_minute: float | None = None,
+        headroom: float = 0.95,
+        decrease_cooldown: float = 2.0,
+    ):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min_concurrency
+        self.headroom = headroom
+        self.decrease_cooldown = decrease_cooldown
+        self._lock = threading.Lock()
+        self._limit = float(min(initial_concurrency, max_concurrency))
+        self._in_flight = 0
+        self._requests_per_minute = requests_per_minute
+        self._tokens = 1.0
+        self._last_refill = time.monotonic()
+        self._blocked_until = 0.0
+        self._last_decrease = 0.0
+        self._slow_start = True
+        self.n_success = 0
+        self.n_rate_limited = 0
+        self.n_retryable_errors = 0
+
+    def _try_acquire(self) -> float:
+        """
+        Take a slot if one is free. Returns 0 on success, otherwise how long to wait
+        before trying again.
+        """
+        with self._lock:
+            now = time.monotonic()
+            if now < self._blocked_until:
+                return self._blocked_until - now
+            if self._in_flight >= int(self._limit):
+                return 0.05
+            if self._requests_per_minute:
+                rate = self._requests_per_minute / 60
+                capacity = max(1.0, rate)
+                self._tokens = min(
+                    capacity, self._tokens + (now - self._last_refill) * rate
+                )
+                self._last_refill = now
+                if self._tokens < 1:
+                    return (1 - self._tokens) / rate
+                self._tokens -= 1
+            self._in_flight += 1
+            return 0.0
+
+    def _release(self):
+        with self._lock:
+            self._in_flight -= 1
+
+    @contextlib.contextmanager
+    def slot(self) -> Iterator[None]:
+        start = time.monotonic()
+        while (wait := self._try_acquire()) > 0:
+            time.sleep(wait)
+        note_queue_wait(time.monotonic() - start)
+        try:
+            yield
+        finally:
+            self._release()
+
+    @contextlib.asynccontextmanager
+    async def aslot(self) -> AsyncIterator[None]:
+        start = time.monotonic()
+        while (wait := self._try_acquire()) > 0:
+            await asyncio.sleep(wait)
+        note_queue_wait(time.monotonic() - start)
+        try:
+            yield
+        finally:
+            self._release()
+
+    def on_success(self, headers: Mapping[str, str] | None = None):
+        with self._lock:
+            self.n_success += 1
+            increase = 1.0 if self._slow_start else 1 / self._limit
+            self._limit = min(self.max_concurrency, self._limit + increase)
+            if headers is not None:
+                self._apply_headers(headers, time.monotonic())
+
+    def on_error(self, e: Exception, trial: int) -> float:
+        """
+        Record a retryable error and return how long the caller should wait before
+        retrying.
+        """
+        note_retry(e)
+        headers = getattr(getattr(e, "response", None), "headers", None) or {}
+        delay = backoff_delay(trial)
+        with self._lock:
+            now = time.monotonic()
+            if isinstance(e, openai.RateLimitError):
+                self.n_rate_limited += 1
+                self._slow_start = False
+                if now - self._last_decrease > self.decrease_cooldown:
+                    self._limit = max(self.min_concurrency, self._limit / 2)
+                    self._last_decrease = now
+                retry_after = retry_after_seconds(headers)
+                if retry_after is not None:
+                    self._blocked_until = max(self._blocked_until, now + retry_after)
+                    delay = retry_after + delay / 10
+            else:
+                self.n_retryable_errors += 1
+            self._apply_headers(headers, now)
+        return delay
+
+    def _apply_headers(self, headers: Mapping[str, str], now: float):
+        limit_requests = _header_float(headers, "x-ratelimit-limit-requests")
+        if limit_requests:
+            self._requests_per_minute = limit_requests * self.headroom
+        for kind in ("requests", "tokens"):
+            remaining = _header_float(headers, f"x-ratelimit-remaining-{kind}")
+            if remaining is not None and remaining < 1:
+                reset = _parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if reset is not None:
+                    self._blocked_until = max(self._blocked_until, now + reset)
+
+    def stats(self) -> dict[str, float | int | None]:
+        with self._lock:
+            return {
+                "concurrency_limit": self._limit,
+                "in_flight": self._in_flight,
+                "requests_per_minute": self._requests_per_minute,
+                "success": self.n_success,
+                "rate_limited": self.n_rate_limited,
+                "retryable_errors": self.n_retryable_errors,
+            }
+
+
+_controllers: dict[str, RateLimitController] = {}
+_controllers_lock = threading.Lock()
+
+
+def get_rate_limit_controller(model: str) -> RateLimitController:
+    """
+    The controller shared by every sampler of model in this process.
+    """
+    with _controllers_lock:
+        if model not in _controllers:
+            _controllers[model] = RateLimitController()
+        return _controllers[model]
+
+
+def _retry_delay(
+    e: Exception,
+    trial: int,
+    rate_limiter: RateLimitController | None,
+    retryable: Callable[[Exception], bool],
+) -> float | None:
+    """
+    How long to wait before the next trial, or None if e is to be raised.
+    """
+    if not retryable(e) or trial + 1 >= MAX_TRIALS:
+        return None
+    if rate_limiter is not None:
+        delay = rate_limiter.on_error(e, trial)
+    else:
+        note_retry(e)
+        delay = backoff_delay(trial)
+    print(f"Retryable exception so wait and retry {trial} after {delay:.1f} sec", e)
+    return delay
+
+
+def call_with_retries(
+    attempt: Callable[[], T],
+    rate_limiter: RateLimitController | None = None,
+    retryable: Callable[[Exception], bool] = is_retryable,
+) -> T:
+    """
+    Call attempt until it succeeds. Retryable errors are retried after the delay
+    the rate limiter asks for (or backoff_delay without one), other errors and the
+    error of the last of MAX_TRIALS trials are raised.
+    """
+    trial = 0
+    while True:
+        try:
+            return attempt()
+        except Exception as e:
+            delay = _retry_delay(e, trial, rate_limiter, retryable)
+            if delay is None:
+                raise
+        time.sleep(delay)
+        trial += 1
+
+
+async def acall_with_retries(
+    attempt: Callable[[], Awaitable[T]],
+    rate_limiter: RateLimitController | None = None,
+    retryable: Callable[[Exception], bool] = is_retryable,
+) -> T:
+    """
+    Async version of call_with_retries.
+    """
+    trial = 0
+    while True:
+        try:
+            return await attempt()
+        except Exception as e:
+            delay = _retry_delay(e, trial, rate_limiter, retryable)
+            if delay is None:
+                raise
+        await asyncio.sleep(delay)
+        trial += 1
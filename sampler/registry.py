@@ -0,0 +1,214 @@
+import importlib
+from dataclasses import dataclass, field
+from typing import Any
+
+from ..types_eval import SamplerBase
+from .system_messages import OPENAI_SYSTEM_MESSAGE_API, OPENAI_SYSTEM_MESSAGE_CHATGPT
+
+
+@dataclass(frozen=True)
+class SamplerSpec:
+    """
+    Declarative description of a sampler: the module and class that implement it and
+    the keyword arguments it is constructed with. Nothing is imported or constructed
+    until build() is called, so listing or validating models needs neither the
+    OpenAI nor the Ollama client.
+    """
+
+    module: str
+    class_name: str
+    kwargs: dict[str, Any] = field(default_factory=dict)
+
+    def sampler_class(self) -> type[SamplerBase]:
+        module = importlib.import_module(self.module, package=__package__)
+        return getattr(module, self.class_name)
+
+    def build(self) -> SamplerBase:
+        return self.sampler_class()(**self.kwargs)
+
+
+def _ollama(**kwargs) -> SamplerSpec:
+    return SamplerSpec(".ollama_sampler", "OllamaSampler", kwargs)
+
+
+def _responses(**kwargs) -> SamplerSpec:
+    return SamplerSpec(".responses_sampler", "ResponsesSampler", kwargs)
+
+
+def _o_chat_completion(**kwargs) -> SamplerSpec:
+    return SamplerSpec(".o_chat_completion_sampler", "OChatCompletionSampler", kwargs)
+
+
+def _chat_completion(**kwargs) -> SamplerSpec:
+    return SamplerSpec(".chat_completion_sampler", "ChatCompletionSampler", kwargs)
+
+
+MODEL_REGISTRY: dict[str, SamplerSpec] = {
+    # Ollama Models
+    "qwen34b": _ollama(model="qwen3:4b", max_tokens=2048),
+    "qwen38b": _ollama(model="qwen3:8b", max_tokens=2048),
+    "llama3.2": _ollama(model="llama3.2:1b", max_tokens=2048),
+    "llama3.1": _ollama(model="llama3.1:8b", max_tokens=2048),
+    "gemma3": _ollama(model="gemma3:latest", max_tokens=2048),
+    "gemma327b": _ollama(model="gemma3:27b", max_tokens=2048),
+    "medgemma4b": _ollama(model="alibayram/medgemma:4b", max_tokens=2048),
+    "medgemma27b": _ollama(model="alibayram/medgemma:27b", max_tokens=2048),
+    # Reasoning Models
+    "o3": _responses(
+        model="o3-2025-04-16",
+        reasoning_model=True,
+    ),
+    "o3-temp-1": _responses(
+        model="o3-2025-04-16",
+        reasoning_model=True,
+        temperature=1.0,
+    ),
+    "o3_high": _responses(
+        model="o3-2025-04-16",
+        reasoning_model=True,
+        reasoning_effort="high",
+    ),
+    "o3_low": _responses(
+        model="o3-2025-04-16",
+        reasoning_model=True,
+        reasoning_effort="low",
+    ),
+    # Default == Medium
+    "o4-mini": _responses(
+        model="o4-mini-2025-04-16",
+        reasoning_model=True,
+    ),
+    "o4-mini_high": _responses(
+        model="o4-mini-2025-04-16",
+        reasoning_model=True,
+        reasoning_effort="high",
+    ),
+    "o4-mini_low": _responses(
+        model="o4-mini-2025-04-16",
+        reasoning_model=True,
+        reasoning_effort="low",
+    ),
+    "o1-pro": _responses(
+        model="o1-pro",
+        reasoning_model=True,
+    ),
+    "o1": _o_chat_completion(
+        model="o1",
+    ),
+    "o1_high": _o_chat_completion(
+        model="o1",
+        reasoning_effort="high",
+    ),
+    "o1_low": _o_chat_completion(
+        model="o1",
+        reasoning_effort="low",
+    ),
+    "o1-preview": _o_chat_completion(
+        model="o1-preview",
+    ),
+    "o1-mini": _o_chat_completion(
+        model="o1-mini",
+    ),
+    # Default == Medium
+    "o3-mini": _o_chat_completion(
+        model="o3-mini",
+    ),
+    "o3-mini_high": _o_chat_completion(
+        model="o3-mini",
+        reasoning_effort="high",
+    ),
+    "o3-mini_low": _o_chat_completion(
+        model="o3-mini",
+        reasoning_effort="low",
+    ),
+    # GPT-4.1 models
+    "gpt-4.1": _chat_completion(
+        model="gpt-4.1-2025-04-14",
+        system_message=OPENAI_SYSTEM_MESSAGE_API,
+        max_tokens=2048,
+    ),
+    "gpt-4.1-temp-1": _chat_completion(
+        model="gpt-4.1-2025-04-14",
+        system_message=OPENAI_SYSTEM_MESSAGE_API,
+        max_tokens=2048,
+        temperature=1.0,
+    ),
+    "gpt-4.1-mini": _chat_completion(
+        model="gpt-4.1-mini-2025-04-14",
+        system_message=OPENAI_SYSTEM_MESSAGE_API,
+        max_tokens=2048,
+    ),
+    "gpt-4.1-nano": _chat_completion(
+        model="gpt-4.1-nano-2025-04-14",
+        system_message=OPENAI_SYSTEM_MESSAGE_API,
+        max_tokens=2048,
+    ),
+    # GPT-4o models
+    "gpt-4o": _chat_completion(
+        model="gpt-4o",
+        system_message=OPENAI_SYSTEM_MESSAGE_API,
+        max_tokens=2048,
+    ),
+    "gpt-4o-2024-11-20": _chat_completion(
+        model="gpt-4o-2024-11-20",
+        system_message=OPENAI_SYSTEM_MESSAGE_API,
+        max_tokens=2048,
+    ),
+    "gpt-4o-2024-08-06": _chat_completion(
+        model="gpt-4o-2024-08-06",
+        system_message=OPENAI_SYSTEM_MESSAGE_API,
+        max_tokens=2048,
+    ),
+    "gpt-4o-2024-08-06-temp-1": _chat_completion(
+        model="gpt-4o-2024-08-06",
+        system_message=OPENAI_SYSTEM_MESSAGE_API,
+        max_tokens=2048,
+        temperature=1.0,
+    ),
+    "gpt-4o-2024-05-13": _chat_completion(
+        model="gpt-4o-2024-05-13",
+        system_message=OPENAI_SYSTEM_MESSAGE_API,
+        max_tokens=2048,
+    ),
+    "gpt-4o-mini": _chat_completion(
+        model="gpt-4o-mini-2024-07-18",
+        system_message=OPENAI_SYSTEM_MESSAGE_API,
+        max_tokens=2048,
+    ),
+    # GPT-4.5 model
+    "gpt-4.5-preview": _chat_completion(
+        model="gpt-4.5-preview-2025-02-27",
+        system_message=OPENAI_SYSTEM_MESSAGE_API,
+        max_tokens=2048,
+    ),
+    # GPT-4-turbo model
+    "gpt-4-turbo-2024-04-09": _chat_completion(
+        model="gpt-4-turbo-2024-04-09",
+        system_message=OPENAI_SYSTEM_MESSAGE_API,
+    ),
+    # GPT-4 model
+    "gpt-4-0613": _chat_completion(
+        model="gpt-4-0613",
+        system_message=OPENAI_SYSTEM_MESSAGE_API,
+    ),
+    # GPT-3.5 Turbo model
+    "gpt-3.5-turbo-0125": _chat_completion(
+        model="gpt-3.5-turbo-0125",
+        system_message=OPENAI_SYSTEM_MESSAGE_API,
+    ),
+    "gpt-3.5-turbo-0125-temp-1": _chat_completion(
+        model="gpt-3.5-turbo-0125",
+        system_message=OPENAI_SYSTEM_MESSAGE_API,
+        temperature=1.0,
+    ),
+    # Chatgpt models:
+    "chatgpt-4o-latest": _chat_completion(
+        model="chatgpt-4o-latest",
+        system_message=OPENAI_SYSTEM_MESSAGE_CHATGPT,
+        max_tokens=2048,
+    ),
+    "gpt-4-turbo-2024-04-09_chatgpt": _chat_completion(
+        model="gpt-4-turbo-2024-04-09",
+        system_message=OPENAI_SYSTEM_MESSAGE_CHATGPT,
+    ),
+}
@@ -1,10 +1,17 @@
+import copy
 import os
-import time
 from typing import Any
 from dotenv import load_dotenv
 import openai
-from openai import OpenAI
+from openai import AsyncOpenAI
+from openai.types.responses import Response
 from ..types_eval import MessageList, SamplerBase, SamplerResponse
+from .client_pool import client_pool
+from .rate_limit import (
+    acall_with_retries,
+    call_with_retries,
+    get_rate_limit_controller,
+)
 
 
 class ResponsesSampler(SamplerBase):
@@ -24,14 +31,21 @@ class ResponsesSampler(SamplerBase):
         self.api_key_name = "OPENAI_API_KEY"
         load_dotenv()
         assert os.environ.get("OPENAI_API_KEY"), "Please set OPENAI_API_KEY"
-        self.client = OpenAI()
+        # shared with all other OpenAI samplers, see client_pool
+        self.client = client_pool.openai()
         self.model = model
+        self._rate_limiter = get_rate_limit_controller(model)
         self.system_message = system_message
         self.temperature = temperature
         self.max_tokens = max_tokens
         self.image_format = "url"
         self.reasoning_model = reasoning_model
         self.reasoning_effort = reasoning_effort
+        # e.g. {"type": "json_object"} for JSON mode, see with_options
+        self.response_format: dict[str, Any] | None = None
+        # Seconds per request, see with_options. Private so that it does not change
+        # the grader cache identity of the sampler.
+        self._request_timeout: float | None = None
 
     def _handle_image(
         self,
@@ -52,50 +66,118 @@ class ResponsesSampler(SamplerBase):
     def _pack_message(self, role: str, content: Any) -> dict[str, Any]:
         return {"role": role, "content": content}
 
+    def _get_async_client(self) -> AsyncOpenAI:
+        return client_pool.async_openai()
+
+    def with_options(
+        self,
+        *,
+        temperature: float | None = None,
+        json_mode: bool = False,
+        json_schema: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> "ResponsesSampler":
+        sampler = copy.copy(self)
+        if temperature is not None:
+            sampler.temperature = temperature
+        if json_schema is not None:
+            sampler.response_format = {"type": "json_schema", **json_schema}
+        elif json_mode and self.response_format is None:
+            sampler.response_format = {"type": "json_object"}
+        if timeout is not None:
+            sampler._request_timeout = timeout
+        return sampler
+
+    def _create_kwargs(self, message_list: MessageList) -> dict[str, Any]:
+        if self.reasoning_model:
+            reasoning = (
+                {"effort": self.reasoning_effort} if self.reasoning_effort else None
+            )
+            kwargs = dict(model=self.model, input=message_list, reasoning=reasoning)
+        else:
+            kwargs = dict(
+                model=self.model,
+                input=message_list,
+                temperature=self.temperature,
+                max_output_tokens=self.max_tokens,
+            )
+        if self.response_format is not None:
+            kwargs["text"] = {"format": self.response_format}
+        if self._request_timeout is not None:
+            kwargs["timeout"] = self._request_timeout
+        return kwargs
+
+    def _with_system_message(self, message_list: MessageList) -> MessageList:
+        if not self.system_message:
+            return message_list
+        return [self._pack_message("developer", self.system_message)] + message_list
+
+    def batch_request(self, message_list: MessageList) -> tuple[str, dict[str, Any]]:
+        """
+        Batch API endpoint and body of the request __call__ would send.
+        """
+        body = self._create_kwargs(self._with_system_message(message_list))
+        body.pop("timeout", None)
+        return "/v1/responses", body
+
+    def parse_batch_response(
+        self, body: dict[str, Any], message_list: MessageList
+    ) -> SamplerResponse:
+        response = Response.model_validate(body)
+        return SamplerResponse(
+            response_text=response.output_text,
+            response_metadata={"usage": response.usage},
+            actual_queried_message_list=self._with_system_message(message_list),
+        )
+
+    def _parse_raw_response(
+        self, raw_response: Any, message_list: MessageList
+    ) -> SamplerResponse:
+        response = raw_response.parse()
+        self._rate_limiter.on_success(raw_response.headers)
+        return SamplerResponse(
+            response_text=response.output_text,
+            response_metadata={"usage": response.usage},
+            actual_queried_message_list=message_list,
+        )
+
+    def _bad_request_response(
+        self, e: openai.BadRequestError, message_list: MessageList
+    ) -> SamplerResponse:
+        print("Bad Request Error", e)
+        return SamplerResponse(
+            response_text="",
+            response_metadata={"usage": None},
+            actual_queried_message_list=message_list,
+        )
+
     def __call__(self, message_list: MessageList) -> SamplerResponse:
-        if self.system_message:
-            message_list = [
-                self._pack_message("developer", self.system_message)
-            ] + message_list
-        trial = 0
-        while True:
-            try:
-                if self.reasoning_model:
-                    reasoning = (
-                        {"effort": self.reasoning_effort}
-                        if self.reasoning_effort
-                        else None
-                    )
-                    response = self.client.responses.create(
-                        model=self.model,
-                        input=message_list,
-                        reasoning=reasoning,
-                    )
-                else:
-                    response = self.client.responses.create(
-                        model=self.model,
-                        input=message_list,
-                        temperature=self.temperature,
-                        max_output_tokens=self.max_tokens,
-                    )
-                return SamplerResponse(
-                    response_text=response.output_text,
-                    response_metadata={"usage": response.usage},
-                    actual_queried_message_list=message_list,
-                )
-            except openai.BadRequestError as e:
-                print("Bad Request Error", e)
-                return SamplerResponse(
-                    response_text="",
-                    response_metadata={"usage": None},
-                    actual_queried_message_list=message_list,
+        message_list = self._with_system_message(message_list)
+
+        def attempt() -> SamplerResponse:
+            with self._rate_limiter.slot():
+                raw_response = self.client.responses.with_raw_response.create(
+                    **self._create_kwargs(message_list)
                 )
-            except Exception as e:
-                exception_backoff = 2**trial  # expontial back off
-                print(
-                    f"Rate limit exception so wait and retry {trial} after {exception_backoff} sec",
-                    e,
+            return self._parse_raw_response(raw_response, message_list)
+
+        try:
+            return call_with_retries(attempt, self._rate_limiter)
+        except openai.BadRequestError as e:
+            return self._bad_request_response(e, message_list)
+
+    async def acall(self, message_list: MessageList) -> SamplerResponse:
+        message_list = self._with_system_message(message_list)
+        client = self._get_async_client()
+
+        async def attempt() -> SamplerResponse:
+            async with self._rate_limiter.aslot():
+                raw_response = await client.responses.with_raw_response.create(
+                    **self._create_kwargs(message_list)
                 )
-                time.sleep(exception_backoff)
-                trial += 1
-            # unknown error shall throw exception
+            return self._parse_raw_response(raw_response, message_list)
+
+        try:
+            return await acall_with_retries(attempt, self._rate_limiter)
+        except openai.BadRequestError as e:
+            return self._bad_request_response(e, message_list)
@@ -0,0 +1,321 @@
+import contextvars
+import copy
+import json
+import threading
+import time
+from array import array
+from collections import Counter, defaultdict
+from typing import Any
+
+import numpy as np
+
+from ..common import get_usage_dict
+from ..types_eval import MessageList, SamplerBase, SamplerResponse
+
+QUANTILES = (0.5, 0.95, 0.99)
+TOKEN_KINDS = (
+    "input_tokens",
+    "input_cached_tokens",
+    "output_tokens",
+    "output_reasoning_tokens",
+)
+
+
+class _CallStats:
+    """
+    What happens inside one instrumented sampler call, as reported by the samplers
+    and their rate limiters through note_queue_wait and note_retry.
+    """
+
+    __slots__ = ("queue_wait", "retries", "retry_errors")
+
+    def __init__(self):
+        self.queue_wait = 0.0
+        self.retries = 0
+        self.retry_errors: list[str] = []
+
+
+# Stats of the instrumented call running in this thread or task, if any.
+_current_call: contextvars.ContextVar[_CallStats | None] = contextvars.ContextVar(
+    "_current_call", default=None
+)
+
+
+def note_queue_wait(seconds: float):
+    """
+    Add time the current sampler call spent waiting for a request slot.
+    """
+    stats = _current_call.get()
+    if stats is not None:
+        stats.queue_wait += seconds
+
+
+def note_retry(e: Exception):
+    """
+    Count a failed attempt of the current sampler call that is retried.
+    """
+    stats = _current_call.get()
+    if stats is not None:
+        stats.retries += 1
+        stats.retry_errors.append(type(e).__name__)
+
+
+class _Series:
+    """
+    Everything recorded for one (role, model) pair. Latencies are kept in compact
+    arrays so that percentiles are exact.
+    """
+
+    def __init__(self):
+        self.latencies = array("d")
+        self.queue_waits = array("d")
+        self.failed_calls = 0
+        self.retries = 0
+        self.errors: Counter[str] = Counter()
+        self.tokens: Counter[str] = Counter()
+        self.first_start = float("inf")
+        self.last_end = 0.0
+
+
+class RequestTelemetry:
+    """
+    Latency, queue wait, retries, token usage and errors of every instrumented
+    sampler call (see InstrumentedSampler), by role ("policy" or "grader") and
+    model, summarized as p50/p95/p99 and totals. Shared by the whole process.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._series: dict[tuple[str, str], _Series] = defaultdict(_Series)
+
+    def reset(self):
+        with self._lock:
+            self._series.clear()
+
+    def record(
+        self,
+        role: str,
+        model: str,
+        start: float,
+        end: float,
+        stats: _CallStats,
+        usage: Any = None,
+        error: BaseException | None = None,
+    ):
+        tokens = {}
+        if usage is not None:
+            try:
+                tokens = get_usage_dict(usage)
+            except (AttributeError, KeyError, TypeError):
+                pass
+        with self._lock:
+            series = self._series[(role, model)]
+            series.latencies.append(end - start)
+            series.queue_waits.append(stats.queue_wait)
+            series.retries += stats.retries
+            series.errors.update(stats.retry_errors)
+            if error is not None:
+                series.failed_calls += 1
+                series.errors[type(error).__name__] += 1
+            for kind in TOKEN_KINDS:
+                series.tokens[kind] += tokens.get(kind) or 0
+            series.first_start = min(series.first_start, start)
+            series.last_end = max(series.last_end, end)
+
+    def summary(self) -> dict[str, dict[str, dict[str, Any]]]:
+        """
+        Summary statistics by role and model, e.g.
+        summary()["grader"]["gpt-4.1"]["latency_p95"].
+        """
+        summary: dict[str, dict[str, dict[str, Any]]] = defaultdict(dict)
+        with self._lock:
+            for (role, model), series in sorted(self._series.items()):
+                n_calls = len(series.latencies)
+                duration = series.last_end - series.first_start
+                entry: dict[str, Any] = {
+                    "calls": n_calls,
+                    "failed_calls": series.failed_calls,
+                    "retries": series.retries,
+                    "errors": dict(series.errors),
+                    **_distribution("latency", series.latencies),
+                    **_distribution("queue_wait", series.queue_waits),
+                    **{kind: series.tokens[kind] for kind in TOKEN_KINDS},
+                    # calls and output tokens per second while the role/model was active
+                    "calls_per_second": n_calls / duration if duration > 0 else None,
+                    "output_tokens_per_second": (
+                        series.tokens["output_tokens"] / duration
+                        if duration > 0
+                        else None
+                    ),
+                }
+                summary[role][model] = entry
+        return dict(summary)
+
+    def write_json(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.summary(), f, indent=2)
+
+    def to_openmetrics(self, prefix: str = "simple_evals_sampler") -> str:
+        """
+        The summary in the OpenMetrics (Prometheus) text format.
+        """
+        summary = self.summary()
+        lines: list[str] = []
+
+        def labels(role: str, model: str, **extra: str) -> str:
+            pairs = {"role": role, "model": model, **extra}
+            return ",".join(
+                f'{key}="{_escape_label(value)}"' for key, value in pairs.items()
+            )
+
+        def entries():
+            for role, models in summary.items():
+                for model, entry in models.items():
+                    yield role, model, entry
+
+        for name, help_text in (
+            ("latency_seconds", "Duration of sampler calls, including retries."),
+            ("queue_wait_seconds", "Time sampler calls waited for a request slot."),
+        ):
+            key = name.removesuffix("_seconds")
+            lines.append(f"# TYPE {prefix}_{name} summary")
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            for role, model, entry in entries():
+                for q in QUANTILES:
+                    lines.append(
+                        f"{prefix}_{name}{{{labels(role, model, quantile=str(q))}}} "
+                        f"{entry[f'{key}_p{round(q * 100)}']}"
+                    )
+                lines.append(
+                    f"{prefix}_{name}_sum{{{labels(role, model)}}} "
+                    f"{entry[f'{key}_mean'] * entry['calls']}"
+                )
+                lines.append(
+                    f"{prefix}_{name}_count{{{labels(role, model)}}} {entry['calls']}"
+                )
+        for name, help_text in (
+            ("calls", "Sampler calls."),
+            ("failed_calls", "Sampler calls that raised an error."),
+            ("retries", "Retried attempts within sampler calls."),
+        ):
+            lines.append(f"# TYPE {prefix}_{name} counter")
+            lines.append(f"# HELP {prefix}_{name} {help_text}")
+            for role, model, entry in entries():
+                lines.append(
+                    f"{prefix}_{name}_total{{{labels(role, model)}}} {entry[name]}"
+                )
+        lines.append(f"# TYPE {prefix}_tokens counter")
+        lines.append(f"# HELP {prefix}_tokens Tokens reported by the model API.")
+        for role, model, entry in entries():
+            for kind in TOKEN_KINDS:
+                kind_label = kind.removesuffix("_tokens")
+                lines.append(
+                    f"{prefix}_tokens_total{{{labels(role, model, kind=kind_label)}}} "
+                    f"{entry[kind]}"
+                )
+        lines.append(f"# TYPE {prefix}_errors counter")
+        lines.append(f"# HELP {prefix}_errors Failed attempts by error class.")
+        for role, model, entry in entries():
+            for error, count in sorted(entry["errors"].items()):
+                lines.append(
+                    f"{prefix}_errors_total{{{labels(role, model, error=error)}}} {count}"
+                )
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+
+    def write_openmetrics(self, path: str):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.to_openmetrics())
+
+
+def _distribution(name: str, values: array) -> dict[str, float]:
+    distribution = {
+        f"{name}_p{round(q * 100)}": float(value)
+        for q, value in zip(QUANTILES, np.quantile(values, QUANTILES))
+    }
+    distribution[f"{name}_mean"] = float(np.mean(values))
+    return distribution
+
+
+def _escape_label(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+telemetry = RequestTelemetry()
+
+
+class InstrumentedSampler(SamplerBase):
+    """
+    Records the latency, queue wait, retries, token usage and outcome of every call
+    of a sampler in a RequestTelemetry (by default the process-wide one), labelled
+    with role and the sampler's model. Wrap the sampler below any HedgedSampler, so
+    that every request of a hedged call is recorded.
+    """
+
+    def __init__(
+        self,
+        sampler: SamplerBase,
+        role: str,
+        collector: RequestTelemetry | None = None,
+    ):
+        self.sampler = sampler
+        self.role = role
+        self._model = str(getattr(sampler, "model", type(sampler).__name__))
+        self._telemetry = collector if collector is not None else telemetry
+
+    def with_options(
+        self,
+        *,
+        temperature: float | None = None,
+        json_mode: bool = False,
+        json_schema: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> "InstrumentedSampler":
+        sampler = copy.copy(self)
+        sampler.sampler = self.sampler.with_options(
+            temperature=temperature,
+            json_mode=json_mode,
+            json_schema=json_schema,
+            timeout=timeout,
+        )
+        return sampler
+
+    def _record(
+        self,
+        start: float,
+        stats: _CallStats,
+        response: SamplerResponse | None,
+        error: BaseException | None = None,
+    ):
+        usage = response.response_metadata.get("usage") if response else None
+        self._telemetry.record(
+            self.role, self._model, start, time.monotonic(), stats, usage, error
+        )
+
+    def __call__(self, message_list: MessageList) -> SamplerResponse:
+        stats = _CallStats()
+        token = _current_call.set(stats)
+        start = time.monotonic()
+        try:
+            response = self.sampler(message_list)
+        except Exception as e:
+            self._record(start, stats, None, e)
+            raise
+        finally:
+            _current_call.reset(token)
+        self._record(start, stats, response)
+        return response
+
+    async def acall(self, message_list: MessageList) -> SamplerResponse:
+        stats = _CallStats()
+        token = _current_call.set(stats)
+        start = time.monotonic()
+        try:
+            response = await self.sampler.acall(message_list)
+        except Exception as e:
+            self._record(start, stats, None, e)
+            raise
+        finally:
+            _current_call.reset(token)
+        self._record(start, stats, response)
+        return response
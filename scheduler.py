@@ -0,0 +1,122 @@
+import itertools
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from typing import Any, Callable
+
+# Lower values run first. Grading work is preferred over new policy samples so
+# that examples already in progress finish (and free their memory) before new
+# ones are started.
+PRIORITY_GRADE = 0
+PRIORITY_SAMPLE = 1
+
+
+class BoundedScheduler:
+    """
+    A single pool of worker threads with one global concurrency limit.
+
+    Work is submitted as a flat stream of tasks (e.g. one task per policy sample and
+    one task per (example, rubric item) grading call) instead of nesting thread pools.
+    Tasks must never block on the result of another task submitted to the same
+    scheduler; chain work from the submitting thread instead.
+    """
+
+    def __init__(self, max_concurrency: int):
+        if os.getenv("debug"):
+            max_concurrency = 1
+        assert max_concurrency >= 1, "max_concurrency must be at least 1"
+        self.max_concurrency = max_concurrency
+        self._queue: queue.PriorityQueue = queue.PriorityQueue()
+        self._counter = itertools.count()
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._in_flight = 0
+        self._completed = 0
+        self._failed = 0
+        self._max_queue_depth = 0
+        self._max_in_flight = 0
+        self._workers = [
+            threading.Thread(target=self._worker, daemon=True)
+            for _ in range(max_concurrency)
+        ]
+        for worker in self._workers:
+            worker.start()
+
+    def submit(
+        self,
+        fn: Callable,
+        *args: Any,
+        priority: int = PRIORITY_SAMPLE,
+        **kwargs: Any,
+    ) -> Future:
+        future: Future = Future()
+        with self._lock:
+            self._queued += 1
+            self._max_queue_depth = max(self._max_queue_depth, self._queued)
+        self._queue.put((priority, next(self._counter), (future, fn, args, kwargs)))
+        return future
+
+    def _worker(self):
+        while True:
+            _, _, task = self._queue.get()
+            if task is None:
+                return
+            future, fn, args, kwargs = task
+            with self._lock:
+                self._queued -= 1
+                self._in_flight += 1
+                self._max_in_flight = max(self._max_in_flight, self._in_flight)
+            if not future.set_running_or_notify_cancel():
+                with self._lock:
+                    self._in_flight -= 1
+                continue
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                with self._lock:
+                    self._in_flight -= 1
+                    self._failed += 1
+                future.set_exception(e)
+            else:
+                with self._lock:
+                    self._in_flight -= 1
+                    self._completed += 1
+                future.set_result(result)
+
+    def stats(self) -> dict[str, int]:
+        """
+        Snapshot of the queue depth, in-flight count and lifetime counters.
+        """
+        with self._lock:
+            return {
+                "queue_depth": self._queued,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "failed": self._failed,
+                "max_queue_depth": self._max_queue_depth,
+                "max_in_flight": self._max_in_flight,
+                "max_concurrency": self.max_concurrency,
+            }
+
+    def shutdown(self, cancel_pending: bool = False):
+        if cancel_pending:
+            while True:
+                try:
+                    _, _, task = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                with self._lock:
+                    self._queued -= 1
+                task[0].cancel()
+        # Sentinels sort after every real task, so queued work is drained first.
+        for _ in self._workers:
+            self._queue.put((float("inf"), next(self._counter), None))
+        for worker in self._workers:
+            worker.join()
+
+    def __enter__(self) -> "BoundedScheduler":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        self.shutdown(cancel_pending=exc_type is not None)
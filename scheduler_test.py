@@ -0,0 +1,50 @@
+import threading
+import time
+
+from .scheduler import PRIORITY_GRADE, PRIORITY_SAMPLE, BoundedScheduler
+
+
+def test_scheduler_bounds_concurrency():
+    lock = threading.Lock()
+    active = [0]
+    peak = [0]
+
+    def task(x):
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.01)
+        with lock:
+            active[0] -= 1
+        return x * 2
+
+    with BoundedScheduler(3) as scheduler:
+        futures = [scheduler.submit(task, i) for i in range(20)]
+        assert [f.result() for f in futures] == [i * 2 for i in range(20)]
+        stats = scheduler.stats()
+
+    assert peak[0] <= 3
+    assert stats["completed"] == 20
+    assert stats["in_flight"] == 0
+    assert stats["queue_depth"] == 0
+    assert stats["max_in_flight"] <= 3
+
+
+def test_scheduler_runs_grading_before_new_samples():
+    order = []
+    gate = threading.Event()
+
+    with BoundedScheduler(1) as scheduler:
+        # occupy the only worker so that everything below is queued
+        blocker = scheduler.submit(gate.wait)
+        scheduler.submit(order.append, "sample", priority=PRIORITY_SAMPLE)
+        scheduler.submit(order.append, "grade", priority=PRIORITY_GRADE)
+        gate.set()
+        blocker.result()
+
+    assert order == ["grade", "sample"]
+
+
+if __name__ == "__main__":
+    test_scheduler_bounds_concurrency()
+    test_scheduler_runs_grading_before_new_samples()
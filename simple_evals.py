@@ -1,23 +1,13 @@
 import argparse
+import asyncio
 import json
+import math
 import subprocess
 from datetime import datetime
 import uuid
-import pandas as pd
 import os
-from . import common
 
-from .healthbench_eval import HealthBenchEval
-from .healthbench_meta_eval import HealthBenchMetaEval
-from .sampler.ensemble_grader_sampler import EnsembleGraderSampler
-from .sampler.chat_completion_sampler import (
-    OPENAI_SYSTEM_MESSAGE_API,
-    OPENAI_SYSTEM_MESSAGE_CHATGPT,
-    ChatCompletionSampler,
-)
-from .sampler.o_chat_completion_sampler import OChatCompletionSampler
-from .sampler.responses_sampler import ResponsesSampler
-from .sampler.ollama_sampler import OllamaSampler
+from .sampler.registry import MODEL_REGISTRY
 
 
 def main():
@@ -53,7 +43,142 @@ def main():
         "--n-threads",
         type=int,
         default=120,
-        help="Number of threads to run. Only supported for HealthBench and HealthBenchMeta.",
+        help="Maximum number of concurrent requests (policy samples and grader calls combined). Only supported for HealthBench and HealthBenchMeta.",
+    )
+    parser.add_argument(
+        "--async",
+        dest="use_async",
+        action="store_true",
+        help="Drive all requests from a single asyncio event loop instead of a thread pool. --n-threads then bounds the number of in-flight requests.",
+    )
+    parser.add_argument(
+        "--grader-cache",
+        type=str,
+        default=None,
+        help="Path to a SQLite file used as a persistent cache of grader verdicts. Reruns reuse cached verdicts instead of calling the grader again.",
+    )
+    parser.add_argument(
+        "--grader-cache-max-mb",
+        type=int,
+        default=1024,
+        help="Maximum size of the grader cache in MB before least recently used entries are evicted.",
+    )
+    parser.add_argument(
+        "--resume",
+        type=str,
+        default=None,
+        metavar="RUN_DIR",
+        help="Resume an interrupted run from its run directory. Work items already in the run's checkpoint files are skipped and their stored results are merged into the final metrics. The run-level counters (token usage and cached token rates, grader retries and ungraded items, grader cache hits) count only the requests of the resumed process.",
+    )
+    parser.add_argument(
+        "--n-bootstrap",
+        type=int,
+        default=None,
+        help="Number of bootstrap resamples used for bootstrap statistics (default: 1000).",
+    )
+    parser.add_argument(
+        "--bootstrap-ci-level",
+        type=float,
+        default=None,
+        help="If set (e.g. 0.95), also report percentile bootstrap confidence intervals at this level.",
+    )
+    parser.add_argument(
+        "--grading-mode",
+        choices=["single", "batched"],
+        default="single",
+        help="HealthBench grading mode: one grader request per rubric item, or one request for a batch of rubric items of the same conversation.",
+    )
+    parser.add_argument(
+        "--grading-batch-size",
+        type=int,
+        default=None,
+        help="Rubric items per grader request in batched grading mode. Defaults to all rubric items of a conversation.",
+    )
+    parser.add_argument(
+        "--grader-prompt-layout",
+        choices=["default", "prefix_cache"],
+        default="default",
+        help="Order of the grader prompt. prefix_cache puts the static instructions first, then the conversation, then the rubric item, so that grader requests share a cacheable prompt prefix.",
+    )
+    parser.add_argument(
+        "--grader-max-retries",
+        type=int,
+        default=2,
+        help="Retries of a grader response without a valid verdict, first at temperature 0, then in JSON mode, before the rubric item is marked ungraded.",
+    )
+    parser.add_argument(
+        "--grader-structured-output",
+        action="store_true",
+        help="Ask the grader for JSON following a schema (structured outputs, or Ollama's format), so that grader responses parse without retries.",
+    )
+    parser.add_argument(
+        "--ensemble-early-stop",
+        action="store_true",
+        help="With an ensemble of graders, stop waiting for the remaining graders once the majority vote is settled.",
+    )
+    parser.add_argument(
+        "--request-timeout",
+        type=float,
+        default=None,
+        help="Timeout in seconds for each request to a model or grader; timed out requests are retried.",
+    )
+    parser.add_argument(
+        "--hedge-percentile",
+        type=float,
+        default=None,
+        help="If set (e.g. 95), send a duplicate request when a model or grader call runs longer than this percentile of recent latencies, and use the first response.",
+    )
+    parser.add_argument(
+        "--hedge-budget",
+        type=float,
+        default=0.05,
+        help="Maximum fraction of calls that are hedged.",
+    )
+    parser.add_argument(
+        "--stage",
+        choices=["all", "sample", "grade"],
+        default="all",
+        help="Run only part of the HealthBench pipeline: sample writes policy completions to the completions store without grading them, grade grades the completions in the store (e.g. with another --grader-model) without sampling. all does both, overlapped.",
+    )
+    parser.add_argument(
+        "--completions-dir",
+        type=str,
+        default=None,
+        help="Directory of the completions stores (one per eval and model). Defaults to the run directory; point the grade stage at the directory of an earlier sample stage.",
+    )
+    parser.add_argument(
+        "--regrade-from",
+        type=str,
+        default=None,
+        metavar="PATH",
+        help="Grade the completions of an earlier run instead of sampling them: its HealthBench _allresults.json or a completions store .jsonl. Implies --stage grade; --model only names the policy model, which is not queried.",
+    )
+    parser.add_argument(
+        "--batch-api",
+        action="store_true",
+        help="Run HealthBench through the OpenAI Batch API: all policy prompts in one batch, then the grader prompts. Cheaper, but results arrive only once the batches are done. Needs OpenAI models as policy and grader.",
+    )
+    parser.add_argument(
+        "--batch-poll-interval",
+        type=float,
+        default=30.0,
+        help="Seconds between status checks of submitted batches.",
+    )
+    parser.add_argument(
+        "--no-html",
+        action="store_true",
+        help="Skip rendering per-example HTML and writing the HTML report.",
+    )
+    parser.add_argument(
+        "--report-page-size",
+        type=int,
+        default=200,
+        help="Reports of runs with more examples than this are written as an index page with the metrics and a sortable table of the examples, plus pages of this many examples each.",
+    )
+    parser.add_argument(
+        "--telemetry-openmetrics",
+        action="store_true",
+        help="Also write the per-request telemetry (latency, queue wait, retries, tokens) of each eval in the OpenMetrics text format, next to its _telemetry.json.",
     )
     parser.add_argument("--debug", action="store_true", help="Run in debug mode")
     parser.add_argument(
@@ -62,175 +187,7 @@ def main():
 
     args = parser.parse_args()
 
-    available_models = {
-        # Ollama Models
-        "qwen34b": OllamaSampler(model="qwen3:4b", max_tokens=2048),
-        "qwen38b": OllamaSampler(model="qwen3:8b", max_tokens=2048),
-        "llama3.2": OllamaSampler(model="llama3.2:1b", max_tokens=2048),
-        "llama3.1": OllamaSampler(model="llama3.1:8b", max_tokens=2048),
-        "gemma3": OllamaSampler(model="gemma3:latest", max_tokens=2048),
-        "gemma327b": OllamaSampler(model="gemma3:27b", max_tokens=2048),
-        "medgemma4b": OllamaSampler(model="alibayram/medgemma:4b", max_tokens=2048),
-        "medgemma27b": OllamaSampler(model="alibayram/medgemma:27b", max_tokens=2048),
-        # Reasoning Models
-        "o3": ResponsesSampler(
-            model="o3-2025-04-16",
-            reasoning_model=True,
-        ),
-        "o3-temp-1": ResponsesSampler(
-            model="o3-2025-04-16",
-            reasoning_model=True,
-            temperature=1.0,
-        ),
-        "o3_high": ResponsesSampler(
-            model="o3-2025-04-16",
-            reasoning_model=True,
-            reasoning_effort="high",
-        ),
-        "o3_low": ResponsesSampler(
-            model="o3-2025-04-16",
-            reasoning_model=True,
-            reasoning_effort="low",
-        ),
-        # Default == Medium
-        "o4-mini": ResponsesSampler(
-            model="o4-mini-2025-04-16",
-            reasoning_model=True,
-        ),
-        "o4-mini_high": ResponsesSampler(
-            model="o4-mini-2025-04-16",
-            reasoning_model=True,
-            reasoning_effort="high",
-        ),
-        "o4-mini_low": ResponsesSampler(
-            model="o4-mini-2025-04-16",
-            reasoning_model=True,
-            reasoning_effort="low",
-        ),
-        "o1-pro": ResponsesSampler(
-            model="o1-pro",
-            reasoning_model=True,
-        ),
-        "o1": OChatCompletionSampler(
-            model="o1",
-        ),
-        "o1_high": OChatCompletionSampler(
-            model="o1",
-            reasoning_effort="high",
-        ),
-        "o1_low": OChatCompletionSampler(
-            model="o1",
-            reasoning_effort="low",
-        ),
-        "o1-preview": OChatCompletionSampler(
-            model="o1-preview",
-        ),
-        "o1-mini": OChatCompletionSampler(
-            model="o1-mini",
-        ),
-        # Default == Medium
-        "o3-mini": OChatCompletionSampler(
-            model="o3-mini",
-        ),
-        "o3-mini_high": OChatCompletionSampler(
-            model="o3-mini",
-            reasoning_effort="high",
-        ),
-        "o3-mini_low": OChatCompletionSampler(
-            model="o3-mini",
-            reasoning_effort="low",
-        ),
-        # GPT-4.1 models
-        "gpt-4.1": ChatCompletionSampler(
-            model="gpt-4.1-2025-04-14",
-            system_message=OPENAI_SYSTEM_MESSAGE_API,
-            max_tokens=2048,
-        ),
-        "gpt-4.1-temp-1": ChatCompletionSampler(
-            model="gpt-4.1-2025-04-14",
-            system_message=OPENAI_SYSTEM_MESSAGE_API,
-            max_tokens=2048,
-            temperature=1.0,
-        ),
-        "gpt-4.1-mini": ChatCompletionSampler(
-            model="gpt-4.1-mini-2025-04-14",
-            system_message=OPENAI_SYSTEM_MESSAGE_API,
-            max_tokens=2048,
-        ),
-        "gpt-4.1-nano": ChatCompletionSampler(
-            model="gpt-4.1-nano-2025-04-14",
-            system_message=OPENAI_SYSTEM_MESSAGE_API,
-            max_tokens=2048,
-        ),
-        # GPT-4o models
-        "gpt-4o": ChatCompletionSampler(
-            model="gpt-4o",
-            system_message=OPENAI_SYSTEM_MESSAGE_API,
-            max_tokens=2048,
-        ),
-        "gpt-4o-2024-11-20": ChatCompletionSampler(
-            model="gpt-4o-2024-11-20",
-            system_message=OPENAI_SYSTEM_MESSAGE_API,
-            max_tokens=2048,
-        ),
-        "gpt-4o-2024-08-06": ChatCompletionSampler(
-            model="gpt-4o-2024-08-06",
-            system_message=OPENAI_SYSTEM_MESSAGE_API,
-            max_tokens=2048,
-        ),
-        "gpt-4o-2024-08-06-temp-1": ChatCompletionSampler(
-            model="gpt-4o-2024-08-06",
-            system_message=OPENAI_SYSTEM_MESSAGE_API,
-            max_tokens=2048,
-            temperature=1.0,
-        ),
-        "gpt-4o-2024-05-13": ChatCompletionSampler(
-            model="gpt-4o-2024-05-13",
-            system_message=OPENAI_SYSTEM_MESSAGE_API,
-            max_tokens=2048,
-        ),
-        "gpt-4o-mini": ChatCompletionSampler(
-            model="gpt-4o-mini-2024-07-18",
-            system_message=OPENAI_SYSTEM_MESSAGE_API,
-            max_tokens=2048,
-        ),
-        # GPT-4.5 model
-        "gpt-4.5-preview": ChatCompletionSampler(
-            model="gpt-4.5-preview-2025-02-27",
-            system_message=OPENAI_SYSTEM_MESSAGE_API,
-            max_tokens=2048,
-        ),
-        # GPT-4-turbo model
-        "gpt-4-turbo-2024-04-09": ChatCompletionSampler(
-            model="gpt-4-turbo-2024-04-09",
-            system_message=OPENAI_SYSTEM_MESSAGE_API,
-        ),
-        # GPT-4 model
-        "gpt-4-0613": ChatCompletionSampler(
-            model="gpt-4-0613",
-            system_message=OPENAI_SYSTEM_MESSAGE_API,
-        ),
-        # GPT-3.5 Turbo model
-        "gpt-3.5-turbo-0125": ChatCompletionSampler(
-            model="gpt-3.5-turbo-0125",
-            system_message=OPENAI_SYSTEM_MESSAGE_API,
-        ),
-        "gpt-3.5-turbo-0125-temp-1": ChatCompletionSampler(
-            model="gpt-3.5-turbo-0125",
-            system_message=OPENAI_SYSTEM_MESSAGE_API,
-            temperature=1.0,
-        ),
-        # Chatgpt models:
-        "chatgpt-4o-latest": ChatCompletionSampler(
-            model="chatgpt-4o-latest",
-            system_message=OPENAI_SYSTEM_MESSAGE_CHATGPT,
-            max_tokens=2048,
-        ),
-        "gpt-4-turbo-2024-04-09_chatgpt": ChatCompletionSampler(
-            model="gpt-4-turbo-2024-04-09",
-            system_message=OPENAI_SYSTEM_MESSAGE_CHATGPT,
-        ),
-    }
+    available_models = MODEL_REGISTRY
 
     if args.list_models:
         print("Available models:")
@@ -238,6 +195,53 @@ def main():
             print(f" - {model_name}")
         return
 
+    # Imported after --list-models so that listing models stays fast; samplers are
+    # only constructed (and their clients created) for the models that are chosen.
+    import pandas as pd
+
+    from . import common
+    from .batch_api import BatchRunner, supports_batch
+    from .checkpoint import CompletionStore, EvalCheckpoint
+    from .grader_cache import GraderCache
+    from .healthbench_eval import GraderRetryPolicy, HealthBenchEval
+    from .healthbench_meta_eval import HealthBenchMetaEval
+    from .sampler.client_pool import client_pool
+    from .sampler.ensemble_grader_sampler import EnsembleGraderSampler
+    from .sampler.hedging import HedgedSampler
+    from .sampler.telemetry import InstrumentedSampler, telemetry
+
+    if args.n_bootstrap is None:
+        args.n_bootstrap = common.DEFAULT_N_BOOTSTRAP
+
+    # Samplers share one HTTP connection pool per endpoint, sized for the request
+    # concurrency plus the duplicate requests of hedging.
+    max_connections = args.n_threads or 1
+    if args.hedge_percentile is not None:
+        max_connections += math.ceil(max_connections * args.hedge_budget)
+    client_pool.configure(max_connections)
+
+    built_samplers = {}
+
+    def build_sampler(model_name):
+        # a model chosen both as policy and as grader shares one sampler
+        if model_name not in built_samplers:
+            built_samplers[model_name] = available_models[model_name].build()
+        return built_samplers[model_name]
+
+    def configure_sampler(sampler, role):
+        if args.request_timeout is not None:
+            sampler = sampler.with_options(timeout=args.request_timeout)
+        # batches are not latency bound, so they are neither timed nor hedged
+        if not args.batch_api:
+            sampler = InstrumentedSampler(sampler, role)
+        if args.hedge_percentile is not None and not args.batch_api:
+            sampler = HedgedSampler(
+                sampler,
+                hedge_percentile=args.hedge_percentile,
+                hedge_budget=args.hedge_budget,
+            )
+        return sampler
+
     if args.model:
         models_chosen = args.model.split(",")
         for model_name in models_chosen:
@@ -247,17 +251,25 @@ def main():
 
         if args.eval == "healthbench_meta":
             if len(models_chosen) == 1:
-                models = {model_name: available_models[models_chosen[0]]}
+                models = {
+                    model_name: configure_sampler(
+                        build_sampler(models_chosen[0]), "grader"
+                    )
+                }
             else:
                 models_list = [
-                    available_models[model_name] for model_name in models_chosen
+                    configure_sampler(build_sampler(model_name), "grader")
+                    for model_name in models_chosen
                 ]
-                ensemble_sampler = EnsembleGraderSampler(models_list)
+                ensemble_sampler = EnsembleGraderSampler(
+                    models_list, early_stop=args.ensemble_early_stop
+                )
                 ensemble_name = "-".join(models_chosen)
                 models = {ensemble_name: ensemble_sampler}
         else:
             models = {
-                model_name: available_models[model_name] for model_name in models_chosen
+                model_name: configure_sampler(build_sampler(model_name), "policy")
+                for model_name in models_chosen
             }
 
     print(f"Running with args {args}")
@@ -270,14 +282,24 @@ def main():
             print(f"Error: Grader model(s) {invalid} not found.")
             return
 
-        grader_samplers = [available_models[g] for g in graders_chosen]
+        grader_samplers = [
+            configure_sampler(build_sampler(g), "grader") for g in graders_chosen
+        ]
         if len(grader_samplers) == 1:
             grading_sampler = grader_samplers[0]
             grader_label = graders_chosen[0]
         else:
-            grading_sampler = EnsembleGraderSampler(grader_samplers)
+            grading_sampler = EnsembleGraderSampler(
+                grader_samplers, early_stop=args.ensemble_early_stop
+            )
             grader_label = "ensemble_" + "-".join(graders_chosen)
 
+    grader_cache = None
+    if args.grader_cache:
+        grader_cache = GraderCache(
+            args.grader_cache, max_size_bytes=args.grader_cache_max_mb * 1024 * 1024
+        )
+
     def get_evals(eval_name, debug_mode, grading_sampler):
         num_examples = (
             args.examples if args.examples is not None else (5 if debug_mode else None)
@@ -290,6 +312,15 @@ def main():
                     num_examples=10 if debug_mode else num_examples,
                     n_repeats=args.n_repeats or 1,
                     n_threads=args.n_threads or 1,
+                    grader_cache=grader_cache,
+                    n_bootstrap=args.n_bootstrap,
+                    bootstrap_ci_level=args.bootstrap_ci_level,
+                    grading_mode=args.grading_mode,
+                    grading_batch_size=args.grading_batch_size,
+                    grader_prompt_layout=args.grader_prompt_layout,
+                    grader_retry_policy=GraderRetryPolicy(args.grader_max_retries),
+                    structured_output=args.grader_structured_output,
+                    render_html=not args.no_html,
                     subset_name=None,
                 )
             case "healthbench_hard":
@@ -298,6 +329,15 @@ def main():
                     num_examples=10 if debug_mode else num_examples,
                     n_repeats=args.n_repeats or 1,
                     n_threads=args.n_threads or 1,
+                    grader_cache=grader_cache,
+                    n_bootstrap=args.n_bootstrap,
+                    bootstrap_ci_level=args.bootstrap_ci_level,
+                    grading_mode=args.grading_mode,
+                    grading_batch_size=args.grading_batch_size,
+                    grader_prompt_layout=args.grader_prompt_layout,
+                    grader_retry_policy=GraderRetryPolicy(args.grader_max_retries),
+                    structured_output=args.grader_structured_output,
+                    render_html=not args.no_html,
                     subset_name="hard",
                 )
             case "healthbench_consensus":
@@ -306,6 +346,15 @@ def main():
                     num_examples=10 if debug_mode else num_examples,
                     n_repeats=args.n_repeats or 1,
                     n_threads=args.n_threads or 1,
+                    grader_cache=grader_cache,
+                    n_bootstrap=args.n_bootstrap,
+                    bootstrap_ci_level=args.bootstrap_ci_level,
+                    grading_mode=args.grading_mode,
+                    grading_batch_size=args.grading_batch_size,
+                    grader_prompt_layout=args.grader_prompt_layout,
+                    grader_retry_policy=GraderRetryPolicy(args.grader_max_retries),
+                    structured_output=args.grader_structured_output,
+                    render_html=not args.no_html,
                     subset_name="consensus",
                 )
             case "healthbench_meta":
@@ -313,6 +362,15 @@ def main():
                     num_examples=10 if debug_mode else num_examples,
                     n_repeats=args.n_repeats or 1,
                     n_threads=args.n_threads or 1,
+                    grader_cache=grader_cache,
+                    n_bootstrap=args.n_bootstrap,
+                    bootstrap_ci_level=args.bootstrap_ci_level,
+                    grading_mode=args.grading_mode,
+                    grading_batch_size=args.grading_batch_size,
+                    grader_prompt_layout=args.grader_prompt_layout,
+                    grader_retry_policy=GraderRetryPolicy(args.grader_max_retries),
+                    structured_output=args.grader_structured_output,
+                    render_html=not args.no_html,
                 )
             case _:
                 raise Exception(f"Unrecognized eval type: {eval_name}")
@@ -337,6 +395,36 @@ def main():
             ]
         }
 
+    if args.regrade_from:
+        if len(evals) != 1 or not args.model or len(models) != 1:
+            print("Error: --regrade-from needs exactly one --eval and one --model.")
+            return
+        args.stage = "grade"
+
+    if args.stage != "all":
+        unsupported = [
+            name
+            for name, eval_obj in evals.items()
+            if not hasattr(eval_obj, "sample_completions")
+        ]
+        if unsupported:
+            print(f"Error: --stage {args.stage} is not supported by {unsupported}.")
+            return
+
+    if args.batch_api:
+        unsupported = [
+            name
+            for name, sampler in [*models.items(), ("grader", grading_sampler)]
+            if sampler is None or not supports_batch(sampler)
+        ] + [
+            name
+            for name, eval_obj in evals.items()
+            if not hasattr(eval_obj, "run_batch")
+        ]
+        if unsupported:
+            print(f"Error: --batch-api is not supported by {unsupported}.")
+            return
+
     print(evals)
     debug_suffix = "_DEBUG" if args.debug else ""
     print(debug_suffix)
@@ -348,27 +436,107 @@ def main():
     now = datetime.now()
     date_str = now.strftime("%Y%m%d_%H%M%S")
 
-    base_dir = os.path.dirname(os.path.abspath(__file__))
-    tmp_dir = os.path.join(base_dir, "tmp")
-    os.makedirs(tmp_dir, exist_ok=True)
-    run_id = uuid.uuid4().hex[:8]
-    run_dir = os.path.join(tmp_dir, f"{date_str}_{run_id}")
-    os.makedirs(run_dir, exist_ok=True)
+    if args.resume:
+        run_dir = args.resume
+        if not os.path.isdir(run_dir):
+            print(f"Error: run directory '{run_dir}' to resume does not exist.")
+            return
+        print(f"Resuming run in {run_dir}")
+    else:
+        base_dir = os.path.dirname(os.path.abspath(__file__))
+        tmp_dir = os.path.join(base_dir, "tmp")
+        os.makedirs(tmp_dir, exist_ok=True)
+        run_id = uuid.uuid4().hex[:8]
+        run_dir = os.path.join(tmp_dir, f"{date_str}_{run_id}")
+        os.makedirs(run_dir, exist_ok=True)
+
+    def write_telemetry(file_stem):
+        telemetry_filename = os.path.join(
+            run_dir, f"{file_stem}{debug_suffix}_telemetry.json"
+        )
+        telemetry.write_json(telemetry_filename)
+        print(f"Writing request telemetry to {telemetry_filename}")
+        for role, by_model in telemetry.summary().items():
+            for telemetry_model, entry in by_model.items():
+                print(
+                    f"  {role} {telemetry_model}: {entry['calls']} calls, "
+                    f"latency p50/p95/p99 {entry['latency_p50']:.2f}/"
+                    f"{entry['latency_p95']:.2f}/{entry['latency_p99']:.2f}s, "
+                    f"{entry['retries']} retries, {entry['failed_calls']} failed"
+                )
+        if args.telemetry_openmetrics:
+            telemetry.write_openmetrics(
+                os.path.join(run_dir, f"{file_stem}{debug_suffix}_telemetry.prom")
+            )
 
     for model_name, sampler in models.items():
         for eval_name, eval_obj in evals.items():
-            result = eval_obj(sampler)
-            # ^^^ how to use a sampler
+            # telemetry is reported per eval
+            telemetry.reset()
             if args.grader_model:
                 file_stem = f"{eval_name}_{model_name}_grader-{grader_label}"
             else:
                 file_stem = f"{eval_name}_{model_name}"
+            if hasattr(eval_obj, "completion_store"):
+                if args.regrade_from and args.regrade_from.endswith(".jsonl"):
+                    completions_filename = args.regrade_from
+                else:
+                    # Named without the grader, so that any grader can grade them.
+                    completions_filename = os.path.join(
+                        args.completions_dir or run_dir,
+                        f"{eval_name}_{model_name}{debug_suffix}_completions.jsonl",
+                    )
+                eval_obj.completion_store = CompletionStore(completions_filename)
+                if args.regrade_from and completions_filename != args.regrade_from:
+                    n_imported = eval_obj.import_completions(args.regrade_from)
+                    print(f"Imported {n_imported} completions from {args.regrade_from}")
+            if args.stage == "sample":
+                n_sampled = eval_obj.sample_completions(sampler)
+                eval_obj.completion_store.close()
+                print(f"Wrote {n_sampled} new completions to {completions_filename}")
+                write_telemetry(f"{file_stem}_{date_str}")
+                continue
+            if args.stage == "grade":
+                missing = eval_obj.missing_completions()
+                if missing:
+                    print(
+                        f"Error: {len(missing)} work items have no completion in {completions_filename}; run --stage sample first."
+                    )
+                    return
+            # The checkpoint name has no timestamp so that a resumed run finds it.
+            eval_obj.checkpoint = EvalCheckpoint(
+                os.path.join(run_dir, f"{file_stem}{debug_suffix}_checkpoint.jsonl")
+            )
+            if args.batch_api:
+                batch_runner = BatchRunner(
+                    os.path.join(run_dir, f"{file_stem}{debug_suffix}_batches"),
+                    poll_interval=args.batch_poll_interval,
+                )
+                result = eval_obj.run_batch(sampler, batch_runner)
+            elif args.use_async:
+                result = asyncio.run(eval_obj.acall(sampler))
+            else:
+                result = eval_obj(sampler)
+            # ^^^ how to use a sampler
+            eval_obj.checkpoint.close()
+            if getattr(eval_obj, "completion_store", None) is not None:
+                eval_obj.completion_store.close()
             # file stem should also include the year, month, day, and time in hours and minutes
             file_stem += f"_{date_str}"
-            report_filename = os.path.join(run_dir, f"{file_stem}{debug_suffix}.html")
-            print(f"Writing report to {report_filename}")
-            with open(report_filename, "w", encoding="utf-8") as fh:
-                fh.write(common.make_report(result))
+            if args.no_html:
+                # leave the unrendered per-example htmls out of the results file
+                result.htmls = []
+            else:
+                report_filename = os.path.join(
+                    run_dir, f"{file_stem}{debug_suffix}.html"
+                )
+                print(f"Writing report to {report_filename}")
+                if len(result.htmls) > args.report_page_size:
+                    common.write_paginated_report(
+                        report_filename, result, page_size=args.report_page_size
+                    )
+                else:
+                    common.write_report(report_filename, result)
             assert result.metrics is not None
             metrics = result.metrics | {"score": result.score}
             # Sort metrics by key
@@ -382,18 +550,23 @@ def main():
             full_result_filename = os.path.join(
                 run_dir, f"{file_stem}{debug_suffix}_allresults.json"
             )
-            with open(full_result_filename, "w", encoding="utf-8") as f:
-                result_dict = {
-                    "score": result.score,
-                    "metrics": result.metrics,
-                    "htmls": result.htmls,
-                    "convos": result.convos,
-                    "metadata": result.metadata,
-                }
-                f.write(json.dumps(result_dict, indent=2))
-                print(f"Writing all results to {full_result_filename}")
+            common.write_eval_result_json(full_result_filename, result)
+            print(f"Writing all results to {full_result_filename}")
+            print(f"HTTP client pool: {client_pool.stats()}")
+            write_telemetry(file_stem)
+
+            grade_store = getattr(eval_obj, "grade_store", None)
+            if grade_store is not None:
+                grades_filename = os.path.join(
+                    run_dir, f"{file_stem}{debug_suffix}_grades.npz"
+                )
+                grade_store.save(grades_filename)
+                print(f"Writing rubric grades to {grades_filename}")
 
             mergekey2resultpath[f"{file_stem}"] = result_filename
+    if args.stage == "sample":
+        print(f"Grade the completions with --stage grade --completions-dir {run_dir}")
+        return
     merge_metrics = []
     for eval_model_name, result_filename in mergekey2resultpath.items():
         try:
@@ -0,0 +1,61 @@
+import asyncio
+
+import pytest
+
+from .grader_cache import sampler_identity
+from .sampler.rate_limit import RateLimitController
+from .sampler.telemetry import InstrumentedSampler, RequestTelemetry
+from .types_eval import SamplerBase, SamplerResponse
+
+
+class _FlakySampler(SamplerBase):
+    """
+    Fails the first attempt of every call with a retryable error, then answers with
+    10 input and 3 output tokens. Calls with "boom" in the prompt fail for good.
+    """
+
+    def __init__(self):
+        self.model = "m"
+        self._controller = RateLimitController()
+
+    def __call__(self, message_list):
+        if message_list[0]["content"] == "boom":
+            raise RuntimeError("boom")
+        for trial in range(2):
+            with self._controller.slot():
+                if trial == 0:
+                    self._controller.on_error(ValueError("empty response"), trial)
+                    continue
+        return SamplerResponse(
+            response_text="ok",
+            response_metadata={"usage": {"input_tokens": 10, "output_tokens": 3}},
+            actual_queried_message_list=message_list,
+        )
+
+
+def test_instrumented_sampler_records_calls_retries_and_errors():
+    collector = RequestTelemetry()
+    sampler = InstrumentedSampler(_FlakySampler(), "grader", collector=collector)
+    message_list = [{"role": "user", "content": "hi"}]
+    for _ in range(3):
+        assert sampler(message_list).response_text == "ok"
+    assert asyncio.run(sampler.acall(message_list)).response_text == "ok"
+    with pytest.raises(RuntimeError):
+        sampler([{"role": "user", "content": "boom"}])
+
+    entry = collector.summary()["grader"]["m"]
+    assert entry["calls"] == 5 and entry["failed_calls"] == 1
+    # the retries were reported by the rate limiter, also from the async call
+    assert entry["retries"] == 4
+    assert entry["errors"] == {"ValueError": 4, "RuntimeError": 1}
+    assert entry["input_tokens"] == 40 and entry["output_tokens"] == 12
+    assert 0 <= entry["latency_p50"] <= entry["latency_p95"] <= entry["latency_p99"]
+    assert entry["queue_wait_p99"] >= 0
+
+    metrics = collector.to_openmetrics()
+    assert 'simple_evals_sampler_calls_total{role="grader",model="m"} 5' in metrics
+    assert 'quantile="0.95"' in metrics
+    assert metrics.endswith("# EOF\n")
+
+    # instrumentation does not change what the grader cache keys on
+    assert sampler_identity(sampler) == sampler_identity(_FlakySampler())
@@ -1,3 +1,5 @@
+import asyncio
+from collections.abc import Sequence
 from dataclasses import dataclass, field
 from typing import Any, Literal, overload
 
@@ -27,6 +29,34 @@ class SamplerBase:
     ) -> SamplerResponse:
         raise NotImplementedError
 
+    async def acall(
+        self,
+        message_list: MessageList,
+    ) -> SamplerResponse:
+        """
+        Async counterpart of __call__. Samplers with a native async client should
+        override this; the default runs the blocking call in a worker thread.
+        """
+        return await asyncio.to_thread(self, message_list)
+
+    def with_options(
+        self,
+        *,
+        temperature: float | None = None,
+        json_mode: bool = False,
+        json_schema: dict[str, Any] | None = None,
+        timeout: float | None = None,
+    ) -> "SamplerBase":
+        """
+        A sampler like this one but with the given generation options, e.g. to retry a
+        malformed grader response deterministically or in JSON mode. json_schema is
+        an OpenAI style {"name", "schema", "strict"} structured output format, which
+        takes precedence over JSON mode. timeout bounds each request to the backend,
+        in seconds. Options a sampler does not support are ignored; by default the
+        sampler is returned unchanged.
+        """
+        return self
+
 
 @dataclass
 class EvalResult:
@@ -36,8 +66,9 @@ class EvalResult:
 
     score: float | None  # top-line metric
     metrics: dict[str, float] | None  # other metrics
-    htmls: list[str]  # strings of valid HTML
-    convos: list[MessageList]  # sampled conversations
+    # htmls and convos may be lazy sequences backed by a file on disk for large runs
+    htmls: Sequence[str | None]  # strings of valid HTML
+    convos: Sequence[MessageList | None]  # sampled conversations
     metadata: dict[str, Any] | None  # Extra data such as rubric scores or sollen
 
 
@@ -64,3 +95,9 @@ class Eval:
     def __call__(self, sampler: SamplerBase) -> EvalResult:
         raise NotImplementedError
 
+    async def acall(self, sampler: SamplerBase) -> EvalResult:
+        """
+        Async counterpart of __call__, driven from a single event loop.
+        """
+        return await asyncio.to_thread(self, sampler)
+